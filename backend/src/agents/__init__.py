@@ -1,4 +1,24 @@
-from .base import BaseAgent
-from .events import AgentEvent, AgentEventType
+import importlib
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from .base import BaseAgent
+    from .events import AgentEvent, AgentEventType
 
 __all__ = ["BaseAgent", "AgentEvent", "AgentEventType"]
+
+# Loaded on first use so importing agents.subagents (e.g. from prompts) doesn't pull in
+# BaseAgent and, through it, the context package
+_EXPORTS = {
+    "BaseAgent": ".base",
+    "AgentEvent": ".events",
+    "AgentEventType": ".events",
+}
+
+def __getattr__(name: str) -> Any:
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
@@ -1,49 +1,271 @@
 from __future__ import annotations
+import asyncio
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
 from .events import AgentEventType, AgentEvent
-from llm import LLMClient, StreamEventType
-from typing import AsyncGenerator
+from .coalescing import coalesce_deltas
+from .subagents.executor import SubagentInvocation, executor
+from .subagents.fast_router import fast_router
+from .subagents.subagent_registry import registry
+from config import config
+from llm import LLMClient, StreamEventType, TokenUsage, ToolCall
+from typing import Any, AsyncGenerator
 from context import ContextManager
 
+_DONE = object()
+
+@dataclass
+class _Turn:
+    text: list[str] = field(default_factory=list)
+    calls: list[ToolCall] = field(default_factory=list)
+    # Tool message content by call id, filled in as each invocation finishes
+    outputs: dict[str, str] = field(default_factory=dict)
+    failed: bool = False
+
+
 class BaseAgent:
-    def __init__(self):
+    def __init__(
+        self,
+        coalesce_window: float = config.DELTA_COALESCE_WINDOW,
+        coalesce_max_bytes: int = config.DELTA_COALESCE_MAX_BYTES,
+        context_manager: ContextManager | None = None,
+    ):
         self.client = LLMClient()
-        self._context_manager = ContextManager()
+        # A context handed in (e.g. by a session store) outlives this agent and isn't closed by it
+        self._owns_context = context_manager is None
+        self._context_manager = context_manager or ContextManager()
+        self._coalesce_window = coalesce_window
+        self._coalesce_max_bytes = coalesce_max_bytes
+        # Summed over every model call in the current run
+        self._usage: TokenUsage | None = None
+        # Per-run limits passed to every model call, and when the run's deadline expires
+        self._limits: dict[str, Any] = {}
+        self._expires: float | None = None
 
-    async def run(self, message: str):
+    async def run(
+        self,
+        message: str,
+        max_tokens: int | None = None,
+        stop: list[str] | None = None,
+        deadline: float | None = None,
+    ):
         yield AgentEvent.agent_start(message)
+        self._usage = None
+        self._limits = {"max_tokens": max_tokens, "stop": stop}
+        self._expires = asyncio.get_running_loop().time() + deadline if deadline else None
 
-        self._context_manager.add_user_message(message)
+        # The router sees only this message, so a follow-up that leans on earlier turns goes to the LLM
+        first_message = not self._context_manager.has_history
+        await self._context_manager.add_user_message_async(message)
 
         final_response: str | None = None
-        
-        async for event in self._agentic_loop():
-            yield event
 
-            if event.type == AgentEventType.TEXT_COMPLETE:
-                final_response = event.data.get("content")
-        
-        yield AgentEvent.agent_end(final_response)
+        # Obvious requests go straight to their subagent without an LLM round trip
+        decision = fast_router.route(message) if config.FAST_ROUTER_ENABLED and first_message else None
+        started = time.perf_counter()
+        if decision and decision.subagent:
+            events = self._fast_path(decision.subagent, message)
+        else:
+            events = self._agentic_loop()
+
+        # Closed explicitly so a consumer that stops reading tears down the model stream now
+        async with aclosing(events):
+            async for event in events:
+                yield event
+
+                # Subagents' own completions are tagged; only the agent's answer ends the run
+                if event.type == AgentEventType.TEXT_COMPLETE and "subagent" not in event.data:
+                    final_response = event.data.get("content")
+
+        if decision and not decision.subagent:
+            fast_router.record_fallback(time.perf_counter() - started)
+
+        if final_response:
+            await self._context_manager.add_assistant_message_async(final_response)
+        self._context_manager.schedule_compaction()
+
+        yield AgentEvent.agent_end(final_response, self._usage)
+
+    async def _fast_path(self, subagent: str, message: str) -> AsyncGenerator[AgentEvent, None]:
+        output: str | None = None
+        async with aclosing(executor.run([SubagentInvocation(subagent, {"request": message})])) as events:
+            async for event in events:
+                if event.type == AgentEventType.SUBAGENT_END:
+                    output = event.data.get("output")
+                elif event.type == AgentEventType.TEXT_COMPLETE:
+                    # Its text is the answer, sent once below as the agent's own
+                    continue
+                yield event
+
+        if output:
+            yield AgentEvent.text_complete(output)
 
     async def _agentic_loop(self) -> AsyncGenerator[AgentEvent, None]:
-        response_text = ""
-        
-        async for event in self.client.chat_completion(self._context_manager.get_messages(), True):
-            if event.type == StreamEventType.TEXT_DELTA:
-                if event.text_delta:
-                    content = event.text_delta.content
-                    response_text += content
-                    yield AgentEvent.text_delta(content)
-            elif event.type == StreamEventType.ERROR:
-                yield AgentEvent.agent_error(event.error or "Unknown error occured")
-                
-                
-        if response_text:
-            yield AgentEvent.text_complete(response_text)
+        tools = registry.tools()
+        turn = _Turn()
+
+        for index in range(config.AGENT_MAX_TURNS):
+            if self._expires is not None and asyncio.get_running_loop().time() >= self._expires:
+                yield AgentEvent.agent_error("Run deadline exceeded", {"turns": index})
+                return
+
+            turn = _Turn()
+            # The last turn keeps the tools defined (the history references them) but may not call one
+            last = index + 1 == config.AGENT_MAX_TURNS
+            # The first call decides which subagents to run; later ones answer from their results
+            task = "routing" if index == 0 and tools else "synthesis"
+            async with aclosing(self._turn(turn, tools, "none" if last else None, task)) as events:
+                async for event in events:
+                    yield event
+
+            if turn.failed or not turn.calls:
+                break
+
+            await self._context_manager.add_tool_calls_async("".join(turn.text), turn.calls)
+            for call in turn.calls:
+                output = turn.outputs.get(call.id, "Error: the invocation produced no result")
+                await self._context_manager.add_tool_result_async(call.id, output)
+
+            if config.AGENT_TOKEN_BUDGET and self._usage and self._usage.total_tokens >= config.AGENT_TOKEN_BUDGET:
+                yield AgentEvent.agent_error(
+                    f"Token budget of {config.AGENT_TOKEN_BUDGET} exhausted",
+                    {"turns": index + 1, "total_tokens": self._usage.total_tokens},
+                )
+                return
+
+        if turn.text and not turn.calls:
+            yield AgentEvent.text_complete("".join(turn.text))
+
+    async def _turn(
+        self,
+        turn: _Turn,
+        tools: list[dict[str, Any]],
+        tool_choice: str | None,
+        task: str = "synthesis",
+    ) -> AsyncGenerator[AgentEvent, None]:
+        # The model stream and every tool it starts feed one queue, so tool events interleave
+        # with the tokens still arriving
+        queue: asyncio.Queue = asyncio.Queue()
+        invocations: dict[asyncio.Task, ToolCall] = {}
+        running = 1
+        failure: BaseException | None = None
+        # The turn's calls start one by one as the model streams them, but share one cancel scope
+        # the way the calls of one executor fan-out do: a fatal error cancels the rest, including
+        # calls that arrive after it
+        aborted = False
+
+        async def invoke(call: ToolCall) -> None:
+            try:
+                arguments = call.parse_arguments()
+            except ValueError as e:
+                turn.outputs[call.id] = f"Error: invalid arguments: {e}"
+                queue.put_nowait(AgentEvent.subagent_error(call.name, call.id, f"Invalid arguments: {e}"))
+                return
+
+            invocation = SubagentInvocation(call.name, arguments, call_id=call.id)
+            async with aclosing(executor.run([invocation])) as events:
+                async for event in events:
+                    if event.type == AgentEventType.SUBAGENT_END:
+                        turn.outputs[call.id] = event.data.get("output") or ""
+                    elif event.type == AgentEventType.SUBAGENT_ERROR:
+                        turn.outputs[call.id] = f"Error: {event.data.get('error')}"
+                    queue.put_nowait(event)
+
+        def cancelled(call: ToolCall) -> None:
+            turn.outputs[call.id] = "Error: Cancelled"
+            queue.put_nowait(AgentEvent.subagent_error(call.name, call.id, "Cancelled"))
+
+        def start(call: ToolCall) -> None:
+            nonlocal running
+            if aborted:
+                cancelled(call)
+                return
+            running += 1
+            task = asyncio.create_task(invoke(call))
+            # A callback rather than a finally: a task cancelled before its first step never runs one
+            task.add_done_callback(lambda _: queue.put_nowait(_DONE))
+            invocations[task] = call
+
+        def abort(failed: str | None) -> None:
+            nonlocal aborted
+            aborted = True
+            for task, call in invocations.items():
+                if not task.done() and call.id != failed:
+                    task.cancel()
+                    cancelled(call)
+
+        async def stream() -> None:
+            nonlocal failure
+            deadline = None
+            if self._expires is not None:
+                # What is left of the run's deadline, floored so it never reads as "no deadline"
+                deadline = max(self._expires - asyncio.get_running_loop().time(), 0.001)
+            try:
+                messages = self._context_manager.get_messages()
+                events = coalesce_deltas(
+                    self.client.chat_completion(
+                        messages,
+                        True,
+                        tools=tools,
+                        tool_choice=tool_choice,
+                        deadline=deadline,
+                        task=task,
+                        prompt_tokens=self._context_manager.prompt_tokens,
+                        **self._limits,
+                    ),
+                    self._coalesce_window,
+                    self._coalesce_max_bytes,
+                )
+                async with aclosing(events):
+                    async for event in events:
+                        if event.type == StreamEventType.TOOL_CALL and event.tool_call:
+                            turn.calls.append(event.tool_call)
+                            # Started now, while the model may still be streaming the calls after it
+                            start(event.tool_call)
+                        queue.put_nowait(event)
+            except Exception as e:
+                failure = e
+            finally:
+                queue.put_nowait(_DONE)
+
+        model = asyncio.create_task(stream())
+        try:
+            while running:
+                item = await queue.get()
+                if item is _DONE:
+                    running -= 1
+                elif isinstance(item, AgentEvent):
+                    if item.type == AgentEventType.SUBAGENT_ERROR and item.data.get("fatal"):
+                        abort(item.data.get("call_id"))
+                    yield item
+                elif item.type == StreamEventType.TEXT_DELTA:
+                    if item.text_delta:
+                        content = item.text_delta.content
+                        turn.text.append(content)
+                        yield AgentEvent.text_delta(content)
+                elif item.type == StreamEventType.MESSAGE_COMPLETE:
+                    if item.usage:
+                        self._usage = self._usage + item.usage if self._usage else item.usage
+                elif item.type == StreamEventType.ERROR:
+                    turn.failed = True
+                    yield AgentEvent.agent_error(item.error or "Unknown error occured")
+
+            if failure:
+                raise failure
+        finally:
+            # Reached early only when the consumer stops reading or the run is cancelled
+            pending = [task for task in (model, *invocations) if not task.done()]
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
 
     async def __aenter__(self) -> BaseAgent:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._owns_context:
+            await self._context_manager.close()
         if self.client:
             await self.client.close()
             self.client = None
@@ -0,0 +1,120 @@
+from __future__ import annotations
+import asyncio
+from typing import AsyncGenerator, AsyncIterator
+from llm import StreamEvent, StreamEventType
+
+_QUEUE_SIZE = 1024
+_DONE = object()
+_FLUSH = object()
+
+class _PumpFailure:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+async def coalesce_deltas(
+    events: AsyncIterator[StreamEvent],
+    window: float,
+    max_bytes: int,
+) -> AsyncGenerator[StreamEvent, None]:
+    if window <= 0 and max_bytes <= 0:
+        try:
+            async for event in events:
+                yield event
+        finally:
+            aclose = getattr(events, "aclose", None)
+            if aclose:
+                await aclose()
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(_QUEUE_SIZE)
+
+    # Upstream is read in its own task so a pending batch can be flushed by a timer
+    # when the window expires, even if the provider stalls between tokens
+    async def pump() -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+            await queue.put(_DONE)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as error:
+            await queue.put(_PumpFailure(error))
+        finally:
+            aclose = getattr(events, "aclose", None)
+            if aclose:
+                await aclose()
+
+    def request_flush() -> None:
+        try:
+            queue.put_nowait(_FLUSH)
+        except asyncio.QueueFull:
+            # A full queue means tokens are flowing and the next one flushes the batch
+            pass
+
+    producer = asyncio.create_task(pump())
+    buffer: list[str] = []
+    buffered_bytes = 0
+    deadline = 0.0
+    timer: asyncio.TimerHandle | None = None
+    first_delta = True
+
+    def take_batch() -> StreamEvent:
+        nonlocal buffered_bytes, timer
+        if timer:
+            timer.cancel()
+            timer = None
+        batch = StreamEvent.create_delta("".join(buffer))
+        buffer.clear()
+        buffered_bytes = 0
+        return batch
+
+    try:
+        while True:
+            item = await queue.get()
+
+            if item is _FLUSH:
+                if buffer and loop.time() >= deadline:
+                    yield take_batch()
+                continue
+
+            if item is _DONE or isinstance(item, _PumpFailure):
+                break
+
+            if item.type == StreamEventType.TEXT_DELTA and item.text_delta:
+                # The first token goes out untouched so time-to-first-token is unchanged
+                if first_delta:
+                    first_delta = False
+                    yield item
+                    continue
+
+                content = item.text_delta.content
+                if not buffer and window > 0:
+                    deadline = loop.time() + window
+                    timer = loop.call_at(deadline, request_flush)
+                buffer.append(content)
+                buffered_bytes += len(content.encode())
+
+                if (max_bytes > 0 and buffered_bytes >= max_bytes) or (window > 0 and loop.time() >= deadline):
+                    yield take_batch()
+                continue
+
+            if buffer:
+                yield take_batch()
+            yield item
+
+        if buffer:
+            yield take_batch()
+
+        if isinstance(item, _PumpFailure):
+            raise item.error
+    finally:
+        if timer:
+            timer.cancel()
+        if not producer.done():
+            producer.cancel()
+        try:
+            await producer
+        except asyncio.CancelledError:
+            pass
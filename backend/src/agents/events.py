@@ -14,7 +14,13 @@ class AgentEventType(str, Enum):
     TEXT_DELTA = "text_delta"
     TEXT_COMPLETE = "text_complete"
 
-@dataclass
+    # Subagent fan-out
+    SUBAGENT_START = "subagent_start"
+    SUBAGENT_END = "subagent_end"
+    SUBAGENT_ERROR = "subagent_error"
+
+# Allocated per streamed delta, so it carries no per-instance __dict__
+@dataclass(slots=True)
 class AgentEvent:
     type: AgentEventType
     data: dict[str, Any] = field(default_factory=dict)
@@ -66,4 +72,43 @@ class AgentEvent:
             }
         )
 
-    
\ No newline at end of file
+    @classmethod
+    def subagent_start(cls, name: str, call_id: str, arguments: dict[str, Any]) -> AgentEvent:
+        return cls(
+            type=AgentEventType.SUBAGENT_START,
+            data={
+                "subagent": name,
+                "call_id": call_id,
+                "arguments": arguments,
+            },
+        )
+
+    @classmethod
+    def subagent_end(cls, name: str, call_id: str, output: str | None, elapsed: float) -> AgentEvent:
+        return cls(
+            type=AgentEventType.SUBAGENT_END,
+            data={
+                "subagent": name,
+                "call_id": call_id,
+                "output": output,
+                "elapsed": elapsed,
+            },
+        )
+
+    @classmethod
+    def subagent_error(cls, name: str, call_id: str, error: str, fatal: bool = False) -> AgentEvent:
+        return cls(
+            type=AgentEventType.SUBAGENT_ERROR,
+            data={
+                "subagent": name,
+                "call_id": call_id,
+                "error": error,
+                "fatal": fatal,
+            },
+        )
+
+    def tagged(self, name: str, call_id: str) -> AgentEvent:
+        return AgentEvent(
+            type=self.type,
+            data={**self.data, "subagent": name, "call_id": call_id},
+        )
@@ -1 +1,3 @@
-from .subagent_registry import SubagentInfo, SubagentRegistry, registry
+from .subagent_registry import SubagentHandler, SubagentInfo, SubagentRegistry, registry
+from .executor import SubagentExecutor, SubagentInvocation, executor
+from .fast_router import FastRouter, FastRouterStats, RouteDecision, fast_router
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator
+from config import config
+from ..events import AgentEvent, AgentEventType
+from .subagent_registry import SubagentRegistry, registry
+
+_DONE = object()
+
+@dataclass
+class SubagentInvocation:
+    name: str
+    arguments: dict[str, Any] = field(default_factory=dict)
+    deadline: float | None = None  # seconds; falls back to the executor default
+    call_id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+
+
+class SubagentExecutor:
+    def __init__(
+        self,
+        subagents: SubagentRegistry = registry,
+        max_concurrency: int = config.SUBAGENT_MAX_CONCURRENCY,
+        default_deadline: float = config.SUBAGENT_DEFAULT_DEADLINE,
+    ) -> None:
+        self._registry = subagents
+        # Shared by every fan-out through this executor, so it caps the process as a whole
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._default_deadline = default_deadline
+
+    async def run(self, invocations: list[SubagentInvocation]) -> AsyncGenerator[AgentEvent, None]:
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def supervise() -> None:
+            try:
+                # A fatal error in one invocation cancels its siblings
+                async with asyncio.TaskGroup() as group:
+                    for invocation in invocations:
+                        group.create_task(self._invoke(invocation, queue))
+            except* Exception:
+                # Already reported as fatal subagent_error events
+                pass
+            finally:
+                queue.put_nowait(_DONE)
+
+        supervisor = asyncio.create_task(supervise())
+        try:
+            while True:
+                event = await queue.get()
+                if event is _DONE:
+                    break
+                yield event
+        finally:
+            if not supervisor.done():
+                supervisor.cancel()
+            try:
+                await supervisor
+            except asyncio.CancelledError:
+                pass
+
+    async def _invoke(self, invocation: SubagentInvocation, queue: asyncio.Queue) -> None:
+        name, call_id = invocation.name, invocation.call_id
+        info = self._registry.get(name)
+
+        if info is None or info.handler is None:
+            reason = "is not registered" if info is None else "has no handler"
+            queue.put_nowait(AgentEvent.subagent_error(name, call_id, f"Subagent '{name}' {reason}"))
+            return
+
+        deadline = invocation.deadline if invocation.deadline is not None else self._default_deadline
+        output: str | None = None
+
+        async with self._slots:
+            queue.put_nowait(AgentEvent.subagent_start(name, call_id, invocation.arguments))
+            started = time.perf_counter()
+            try:
+                async with asyncio.timeout(deadline):
+                    async for event in info.handler(invocation.arguments):
+                        if event.type == AgentEventType.TEXT_COMPLETE:
+                            output = event.data.get("content")
+                        queue.put_nowait(event.tagged(name, call_id))
+
+            except TimeoutError:
+                # A missed deadline only fails this invocation
+                queue.put_nowait(AgentEvent.subagent_error(name, call_id, f"Timed out after {deadline:g}s"))
+                return
+
+            except asyncio.CancelledError:
+                queue.put_nowait(AgentEvent.subagent_error(name, call_id, "Cancelled"))
+                raise
+
+            except Exception as e:
+                queue.put_nowait(AgentEvent.subagent_error(name, call_id, str(e) or type(e).__name__, fatal=True))
+                raise
+
+            queue.put_nowait(AgentEvent.subagent_end(name, call_id, output, time.perf_counter() - started))
+
+
+# Global executor instance
+executor = SubagentExecutor()
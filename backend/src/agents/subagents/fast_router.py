@@ -0,0 +1,171 @@
+from __future__ import annotations
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass
+from config import config
+from .subagent_registry import SubagentInfo, SubagentRegistry, registry
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can could do for from has have i in is it me my of on or our please "
+    "should so that the this to up us want we what when with would you your".split()
+)
+# How much a term found in each SubagentInfo field counts towards the document
+_FIELD_WEIGHTS = (("description", 1.0), ("capabilities", 2.0), ("when_to_use", 1.5))
+
+def tokenize(text: str) -> list[str]:
+    terms = []
+    for word in _WORD.findall(text.lower()):
+        if word in _STOPWORDS:
+            continue
+        # Light suffix stripping so "vendors"/"vendor" and "updating"/"update" meet
+        for suffix in ("ing", "es", "ed", "s"):
+            if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                word = word[: -len(suffix)]
+                break
+        terms.append(word)
+    return terms
+
+
+@dataclass
+class RouteDecision:
+    subagent: str | None
+    score: float
+    runner_up: float
+    elapsed_us: float
+
+    @property
+    def confident(self) -> bool:
+        return self.subagent is not None
+
+
+@dataclass
+class FastRouterStats:
+    requests: int = 0
+    hits: int = 0
+    fallbacks: int = 0
+    route_us_total: float = 0.0
+    fallback_seconds_total: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.requests if self.requests else 0.0
+
+    @property
+    def latency_saved_seconds(self) -> float:
+        # Each hit skipped an LLM round trip, priced at what the fallbacks actually cost
+        if not self.fallbacks:
+            return 0.0
+        return self.hits * self.fallback_seconds_total / self.fallbacks
+
+    def to_dict(self) -> dict[str, float | int]:
+        return {
+            **self.__dict__,
+            "hit_rate": round(self.hit_rate, 4),
+            "route_us_avg": round(self.route_us_total / self.requests, 2) if self.requests else 0.0,
+            "latency_saved_seconds": round(self.latency_saved_seconds, 3),
+        }
+
+
+class FastRouter:
+    def __init__(
+        self,
+        subagents: SubagentRegistry = registry,
+        min_score: float = config.FAST_ROUTER_MIN_SCORE,
+        min_margin: float = config.FAST_ROUTER_MIN_MARGIN,
+    ) -> None:
+        self._registry = subagents
+        self._min_score = min_score
+        self._min_margin = min_margin
+        self._indexed_version = -1
+        self._documents: dict[str, SubagentInfo] = {}
+        self._term_weights: dict[str, dict[str, float]] = {}
+        self._postings: dict[str, dict[str, float]] = {}
+        self._norms: dict[str, float] = {}
+        self.stats = FastRouterStats()
+
+    def _sync(self) -> None:
+        if self._indexed_version == self._registry.version:
+            return
+
+        # Only subagents added or replaced since the last sync are re-indexed
+        for name, info in self._registry.get_all().items():
+            if self._documents.get(name) is not info:
+                self._index(name, info)
+        self._indexed_version = self._registry.version
+
+        # IDF moves with the number of documents, so the (few) document norms are refreshed
+        self._norms = {
+            name: math.sqrt(sum((weight * self._idf(term)) ** 2 for term, weight in weights.items())) or 1.0
+            for name, weights in self._term_weights.items()
+        }
+
+    def _index(self, name: str, info: SubagentInfo) -> None:
+        for term in self._term_weights.pop(name, {}):
+            postings = self._postings.get(term)
+            if postings:
+                postings.pop(name, None)
+                if not postings:
+                    del self._postings[term]
+
+        weights: Counter[str] = Counter()
+        for field_name, field_weight in _FIELD_WEIGHTS:
+            value = getattr(info, field_name)
+            text = " ".join(value) if isinstance(value, list) else value
+            for term in tokenize(text):
+                weights[term] += field_weight
+
+        self._documents[name] = info
+        self._term_weights[name] = dict(weights)
+        for term, weight in weights.items():
+            self._postings.setdefault(term, {})[name] = weight
+
+    def _idf(self, term: str) -> float:
+        postings = self._postings.get(term)
+        return math.log(1 + len(self._documents) / len(postings)) if postings else 0.0
+
+    def route(self, message: str) -> RouteDecision:
+        started = time.perf_counter()
+        self._sync()
+
+        query = Counter(tokenize(message))
+        scores: dict[str, float] = {}
+        query_norm = 0.0
+        for term, count in query.items():
+            idf = self._idf(term)
+            if not idf:
+                continue
+            query_norm += (count * idf) ** 2
+            for name, weight in self._postings[term].items():
+                scores[name] = scores.get(name, 0.0) + count * weight * idf * idf
+
+        ranked = sorted(
+            ((score / (self._norms[name] * math.sqrt(query_norm)), name) for name, score in scores.items()),
+            reverse=True,
+        )
+        best, name = ranked[0] if ranked else (0.0, None)
+        runner_up = ranked[1][0] if len(ranked) > 1 else 0.0
+
+        # Ambiguous or weak matches, and subagents that can't be invoked directly, are left to the LLM.
+        # So are subagents with a schema of their own: the fast path only has the request to give them.
+        if best < self._min_score or best - runner_up < self._min_margin:
+            name = None
+        elif self._documents[name].handler is None or self._documents[name].parameters is not None:
+            name = None
+
+        elapsed_us = (time.perf_counter() - started) * 1e6
+        self.stats.requests += 1
+        self.stats.route_us_total += elapsed_us
+        if name is not None:
+            self.stats.hits += 1
+        return RouteDecision(subagent=name, score=best, runner_up=runner_up, elapsed_us=elapsed_us)
+
+    def record_fallback(self, seconds: float) -> None:
+        self.stats.fallbacks += 1
+        self.stats.fallback_seconds_total += seconds
+
+
+# Global router over the global registry
+fast_router = FastRouter()
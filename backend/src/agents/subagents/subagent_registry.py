@@ -1,5 +1,19 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable
+
+if TYPE_CHECKING:
+    from agents.events import AgentEvent
+
+# Runs one subagent invocation and streams its events
+SubagentHandler = Callable[[dict[str, Any]], AsyncIterator["AgentEvent"]]
+
+# What a subagent takes when no schema is given: the request in plain language, as the fast router sends it
+DEFAULT_PARAMETERS: dict[str, Any] = {
+    "type": "object",
+    "properties": {"request": {"type": "string", "description": "What the subagent should do, with all needed details"}},
+    "required": ["request"],
+}
 
 @dataclass
 class SubagentInfo:
@@ -7,6 +21,21 @@ class SubagentInfo:
     description: str
     capabilities: list[str] = field(default_factory=list)
     when_to_use: str = ""
+    handler: SubagentHandler | None = field(default=None, repr=False, compare=False)
+    parameters: dict[str, Any] | None = field(default=None, repr=False)  # JSON schema of the arguments
+
+    def to_tool(self) -> dict[str, Any]:
+        description = self.description
+        if self.when_to_use:
+            description += f" Use when: {self.when_to_use}"
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": description,
+                "parameters": self.parameters or DEFAULT_PARAMETERS,
+            },
+        }
 
     def format_for_prompt(self) -> str:
         lines = [
@@ -19,9 +48,17 @@ class SubagentInfo:
 class SubagentRegistry:
     def __init__(self) -> None:
         self._registry: dict[str, SubagentInfo] = {}
+        self._version = 0
+        self._tools: tuple[int, list[dict[str, Any]]] | None = None
+
+    @property
+    def version(self) -> int:
+        return self._version
 
     def register(self, subagent: SubagentInfo) -> None:
         self._registry[subagent.name] = subagent
+        # Invalidates anything rendered from the registry, such as the system prompt
+        self._version += 1
 
     def get(self, name: str) -> SubagentInfo | None:
         return self._registry.get(name)
@@ -29,6 +66,14 @@ class SubagentRegistry:
     def get_all(self) -> dict[str, SubagentInfo]:
         return self._registry
 
+    def tools(self) -> list[dict[str, Any]]:
+        # Rebuilt only when the registry changes; one list shared by every request keeps the
+        # tools block byte-identical, like the system prompt ahead of it
+        if self._tools is None or self._tools[0] != self._version:
+            invocable = [info.to_tool() for info in self._registry.values() if info.handler is not None]
+            self._tools = (self._version, invocable)
+        return self._tools[1]
+
     def format_for_prompt(self) -> str:
         if not self._registry:
             return "No subagents currently registered."
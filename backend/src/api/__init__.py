@@ -0,0 +1,34 @@
+from .routes import AgentServer, ServerStats, encode_sse, encode_ndjson
+from .encoding import (
+    BINARY_CONTENT_TYPE,
+    BINARY_TYPE_CODES,
+    NDJSON_CONTENT_TYPE,
+    SSE_CONTENT_TYPE,
+    BinaryEncoder,
+    EventEncoder,
+    NdjsonEncoder,
+    SseEncoder,
+    decode_binary,
+    get_encoder,
+    negotiate_encoder,
+    register_encoder,
+)
+
+__all__ = [
+    "AgentServer",
+    "ServerStats",
+    "encode_sse",
+    "encode_ndjson",
+    "BINARY_CONTENT_TYPE",
+    "BINARY_TYPE_CODES",
+    "NDJSON_CONTENT_TYPE",
+    "SSE_CONTENT_TYPE",
+    "BinaryEncoder",
+    "EventEncoder",
+    "NdjsonEncoder",
+    "SseEncoder",
+    "decode_binary",
+    "get_encoder",
+    "negotiate_encoder",
+    "register_encoder",
+]
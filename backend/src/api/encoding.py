@@ -0,0 +1,179 @@
+from __future__ import annotations
+import importlib.util
+import json
+from typing import Any, Callable, Iterator
+from agents import AgentEvent, AgentEventType
+
+SSE_CONTENT_TYPE = "text/event-stream"
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+BINARY_CONTENT_TYPE = "application/x-nexus-events"
+
+# Binary type codes are part of the wire format: a new event type gets the next free code
+# (below 0x80, whose bit marks content-only frames) and existing codes never change
+BINARY_TYPE_CODES: dict[AgentEventType, int] = {
+    AgentEventType.AGENT_START: 0,
+    AgentEventType.AGENT_END: 1,
+    AgentEventType.AGENT_ERROR: 2,
+    AgentEventType.TEXT_DELTA: 3,
+    AgentEventType.TEXT_COMPLETE: 4,
+    AgentEventType.SUBAGENT_START: 5,
+    AgentEventType.SUBAGENT_END: 6,
+    AgentEventType.SUBAGENT_ERROR: 7,
+}
+_unassigned = [event_type.name for event_type in AgentEventType if event_type not in BINARY_TYPE_CODES]
+if _unassigned:
+    raise RuntimeError(f"No binary type code for {', '.join(_unassigned)}; add one to BINARY_TYPE_CODES")
+_CODE_TYPES = {code: event_type for event_type, code in BINARY_TYPE_CODES.items()}
+
+if importlib.util.find_spec("orjson") is not None:
+    import orjson
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=str)
+else:
+    _json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def dumps(value: Any) -> bytes:
+        return _json_encoder.encode(value).encode()
+
+
+_encode_str = json.encoder.encode_basestring
+
+def dumps_str(value: str) -> bytes:
+    # A bare string is the hot case, one per streamed delta, and json's C escaper edges out
+    # orjson's call overhead on strings this short
+    return _encode_str(value).encode()
+
+
+def _is_content_only(event: AgentEvent) -> bool:
+    # Untagged text events: their frame is the template around one JSON string, no dict walk
+    data = event.data
+    return len(data) == 1 and type(data.get("content")) is str
+
+
+class EventEncoder:
+    name = ""
+    content_type = ""
+
+    def encode(self, event: AgentEvent) -> bytes:
+        raise NotImplementedError
+
+
+class _TemplateEncoder(EventEncoder):
+    # Everything around the payload is fixed per event type and built once, at startup
+    def __init__(self, frame: Callable[[str], tuple[bytes, bytes]]) -> None:
+        self._frames = {event_type: frame(event_type.value) for event_type in AgentEventType}
+        self._content = {
+            event_type: (prefix + b'{"content":', b"}" + suffix)
+            for event_type, (prefix, suffix) in self._frames.items()
+        }
+
+    def encode(self, event: AgentEvent) -> bytes:
+        if _is_content_only(event):
+            prefix, suffix = self._content[event.type]
+            return prefix + dumps_str(event.data["content"]) + suffix
+        prefix, suffix = self._frames[event.type]
+        return prefix + dumps(event.data) + suffix
+
+
+class NdjsonEncoder(_TemplateEncoder):
+    name = "ndjson"
+    content_type = NDJSON_CONTENT_TYPE
+
+    def __init__(self) -> None:
+        super().__init__(lambda value: (f'{{"type":"{value}","data":'.encode(), b"}\n"))
+
+
+class SseEncoder(_TemplateEncoder):
+    name = "sse"
+    content_type = SSE_CONTENT_TYPE
+
+    def __init__(self) -> None:
+        # JSON never contains a raw newline, so the payload always fits one data: line
+        super().__init__(lambda value: (f'event: {value}\ndata: {{"type":"{value}","data":'.encode(), b"}\n\n"))
+
+
+def _varint(value: int) -> bytes:
+    if value < 0x80:
+        return bytes((value,))
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+class BinaryEncoder(EventEncoder):
+    # Frame: one type byte, the payload length as a varint, then the payload. A content-only
+    # text event's payload is its raw UTF-8 text; any other event's is its data as JSON. The
+    # type code's high bit tells the two apart.
+    name = "binary"
+    content_type = BINARY_CONTENT_TYPE
+
+    def __init__(self) -> None:
+        self._content_headers = {event_type: code | 0x80 for event_type, code in BINARY_TYPE_CODES.items()}
+        # Short deltas are the common case; their whole header comes from this table
+        self._short = {
+            event_type: [bytes((code, length)) for length in range(0x80)]
+            for event_type, code in self._content_headers.items()
+        }
+
+    def encode(self, event: AgentEvent) -> bytes:
+        if _is_content_only(event):
+            payload = event.data["content"].encode()
+            if len(payload) < 0x80:
+                return self._short[event.type][len(payload)] + payload
+            return bytes((self._content_headers[event.type],)) + _varint(len(payload)) + payload
+        payload = dumps(event.data)
+        return bytes((BINARY_TYPE_CODES[event.type],)) + _varint(len(payload)) + payload
+
+
+def decode_binary(data: bytes) -> Iterator[AgentEvent]:
+    # The client side of BinaryEncoder, for consumers written in Python; tests/test_encoding.py
+    # round-trips every event type through it
+    view = memoryview(data)
+    position = 0
+    while position < len(view):
+        header = view[position]
+        position += 1
+        length = shift = 0
+        while True:
+            byte = view[position]
+            position += 1
+            length |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        payload = bytes(view[position:position + length])
+        position += length
+        event_type = _CODE_TYPES[header & 0x7F]
+        if header & 0x80:
+            yield AgentEvent(event_type, {"content": payload.decode()})
+        else:
+            yield AgentEvent(event_type, json.loads(payload))
+
+
+_encoders: dict[str, EventEncoder] = {}
+
+def register_encoder(encoder: EventEncoder) -> None:
+    _encoders[encoder.name] = encoder
+
+
+def get_encoder(name: str) -> EventEncoder | None:
+    return _encoders.get(name)
+
+
+def negotiate_encoder(requested: str | None, accept: str) -> EventEncoder:
+    # An explicit format wins, then the Accept header, then SSE, which any browser can read
+    if requested and requested in _encoders:
+        return _encoders[requested]
+    for encoder in _encoders.values():
+        if encoder.content_type in accept:
+            return encoder
+    return _encoders["sse"]
+
+
+# Checked in this order against Accept, so a client listing several gets the most compact it can parse
+for _encoder_type in (BinaryEncoder, NdjsonEncoder, SseEncoder):
+    register_encoder(_encoder_type())
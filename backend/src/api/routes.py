@@ -0,0 +1,224 @@
+from __future__ import annotations
+import asyncio
+import uuid
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable
+from agents import AgentEvent, BaseAgent
+from agents.subagents import fast_router
+from config import config
+from context import SessionStore
+from instrumentation import PROMETHEUS_CONTENT_TYPE, get_metrics, render_prometheus
+from llm import (
+    get_circuit_breaker,
+    get_client_pool,
+    get_model_selector,
+    get_model_stats,
+    get_rate_limiter,
+    get_single_flight,
+)
+from .encoding import EventEncoder, get_encoder, negotiate_encoder
+from utils import ChunkedResponse, HttpRequest, read_request, write_json, write_response
+
+@dataclass
+class ServerStats:
+    active: int = 0
+    queued: int = 0
+    completed: int = 0
+    rejected: int = 0
+    disconnects: int = 0
+
+
+def encode_sse(event: AgentEvent) -> bytes:
+    return get_encoder("sse").encode(event)
+
+
+def encode_ndjson(event: AgentEvent) -> bytes:
+    return get_encoder("ndjson").encode(event)
+
+
+def _negotiate_format(request: HttpRequest, body: dict) -> EventEncoder:
+    # "format" in the body or query string ("sse", "ndjson", "binary"), else the Accept header
+    requested = body.get("format") or request.query.get("format")
+    return negotiate_encoder(requested, request.headers.get("accept", ""))
+
+
+def _run_limits(body: dict) -> dict[str, Any] | str:
+    # Optional per-request limits that end generation early; a string is the validation error
+    max_tokens = body.get("max_tokens")
+    if max_tokens is not None and (not isinstance(max_tokens, int) or isinstance(max_tokens, bool) or max_tokens < 1):
+        return "'max_tokens' must be a positive integer"
+    stop = body.get("stop")
+    if isinstance(stop, str):
+        stop = [stop]
+    if stop is not None and (not isinstance(stop, list) or not all(isinstance(item, str) and item for item in stop)):
+        return "'stop' must be a string or a list of strings"
+    deadline = body.get("deadline")
+    if deadline is not None and (not isinstance(deadline, (int, float)) or isinstance(deadline, bool) or deadline <= 0):
+        return "'deadline' must be a positive number of seconds"
+    return {"max_tokens": max_tokens, "stop": stop, "deadline": deadline}
+
+
+class AgentServer:
+    def __init__(
+        self,
+        max_concurrent: int = config.SERVER_MAX_CONCURRENT_SESSIONS,
+        max_queued: int = config.SERVER_MAX_QUEUED_REQUESTS,
+        session_store: SessionStore | None = None,
+    ) -> None:
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._max_queued = max_queued
+        self._store = session_store or SessionStore()
+        # Per session: the lock and how many turns hold it or wait on it
+        self._session_locks: dict[str, tuple[asyncio.Lock, int]] = {}
+        self.stats = ServerStats()
+        self._routes: dict[tuple[str, str], Callable[[HttpRequest, asyncio.StreamWriter], Awaitable[bool]]] = {
+            ("POST", "/v1/agent/run"): self._handle_run,
+            ("GET", "/health"): self._handle_health,
+            ("GET", "/metrics"): self._handle_metrics,
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+
+                handler = self._routes.get((request.method, request.path))
+                if handler is None:
+                    await write_json(writer, 404, {"error": f"Unknown route {request.method} {request.path}"})
+                    keep_alive = True
+                else:
+                    keep_alive = await handler(request, writer)
+
+                if not keep_alive or not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_health(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        flights = get_single_flight()
+        selector = get_model_selector()
+        await write_json(
+            writer,
+            200,
+            {
+                "status": "ok",
+                "server": self.stats.__dict__,
+                "sessions": {**self._store.stats.__dict__, "restore_ms_avg": self._store.stats.restore_ms_avg},
+                "pool": get_client_pool().stats().__dict__,
+                "rate_limiter": get_rate_limiter().stats().__dict__,
+                "circuit_breaker": get_circuit_breaker().stats().__dict__,
+                "single_flight": flights.stats().__dict__ if flights else None,
+                "models": get_model_stats().snapshot(),
+                "selection": selector.snapshot() if selector else None,
+                "latency": get_metrics().snapshot(),
+                "router": fast_router.stats.to_dict(),
+            },
+        )
+        return True
+
+    async def _handle_metrics(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        await write_response(writer, 200, render_prometheus().encode(), PROMETHEUS_CONTENT_TYPE)
+        return True
+
+    async def _handle_run(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        try:
+            body = request.json()
+        except ValueError:
+            await write_json(writer, 400, {"error": "Request body must be JSON"})
+            return True
+        if not isinstance(body, dict):
+            await write_json(writer, 400, {"error": "Request body must be a JSON object"})
+            return True
+
+        message = body.get("message")
+        if not isinstance(message, str) or not message:
+            await write_json(writer, 400, {"error": "'message' is required"})
+            return True
+        for field in ("session_id", "format"):
+            if body.get(field) is not None and not isinstance(body[field], str):
+                await write_json(writer, 400, {"error": f"'{field}' must be a string"})
+                return True
+
+        limits = _run_limits(body)
+        if isinstance(limits, str):
+            await write_json(writer, 400, {"error": limits})
+            return True
+
+        # Shed load instead of letting the wait queue grow without bound
+        if self._slots.locked() and self.stats.queued >= self._max_queued:
+            self.stats.rejected += 1
+            await write_json(writer, 503, {"error": "Server is at capacity"}, headers={"Retry-After": "1"})
+            return True
+
+        session_id = body.get("session_id") or uuid.uuid4().hex
+        encoder = _negotiate_format(request, body)
+
+        self.stats.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.stats.queued -= 1
+
+        self.stats.active += 1
+        try:
+            return await self._stream_session(writer, session_id, message, encoder, limits)
+        finally:
+            self.stats.active -= 1
+            self._slots.release()
+
+    async def _stream_session(
+        self,
+        writer: asyncio.StreamWriter,
+        session_id: str,
+        message: str,
+        encoder: EventEncoder,
+        limits: dict[str, Any],
+    ) -> bool:
+        encode = encoder.encode
+        content_type = encoder.content_type
+        response = ChunkedResponse(writer)
+
+        # Turns within one session run one at a time so the history stays ordered
+        async with self._session_lock(session_id):
+            context = await self._store.acquire(session_id)
+            try:
+                async with BaseAgent(context_manager=context) as agent:
+                    await response.start(200, content_type, headers={"X-Session-Id": session_id})
+                    async with aclosing(agent.run(message, **limits)) as events:
+                        async for event in events:
+                            await response.write(encode(event))
+                    await response.end()
+            except ConnectionError:
+                # Closing the generator above stops the upstream stream for a gone client
+                self.stats.disconnects += 1
+                return False
+            finally:
+                await self._store.release(session_id)
+
+        self.stats.completed += 1
+        return True
+
+    @asynccontextmanager
+    async def _session_lock(self, session_id: str) -> AsyncIterator[None]:
+        # Orders turns within this worker; the store's lease keeps other workers out of the session
+        lock, users = self._session_locks.get(session_id) or (asyncio.Lock(), 0)
+        self._session_locks[session_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            # The last turn out drops the entry, so the map only holds sessions in use
+            lock, users = self._session_locks[session_id]
+            if users == 1:
+                del self._session_locks[session_id]
+            else:
+                self._session_locks[session_id] = (lock, users - 1)
+
+    async def close(self) -> None:
+        self._session_locks.clear()
+        await self._store.close()
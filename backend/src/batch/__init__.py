@@ -0,0 +1,3 @@
+from .runner import BatchItem, BatchResult, BatchRunner, BatchStats, load_checkpoint, read_items
+
+__all__ = ["BatchItem", "BatchResult", "BatchRunner", "BatchStats", "load_checkpoint", "read_items"]
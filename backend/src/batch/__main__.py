@@ -0,0 +1,42 @@
+import argparse
+import asyncio
+import sys
+from config import config
+from llm import close_client_pools, prewarm_client_pool
+from .runner import BatchRunner, BatchStats
+
+def _report(stats: BatchStats) -> None:
+    print(
+        f"completed={stats.completed} failed={stats.failed} skipped={stats.skipped} "
+        f"items/s={stats.items_per_second:.2f} prompt_tokens={stats.usage.prompt_tokens} "
+        f"completion_tokens={stats.usage.completion_tokens} elapsed={stats.elapsed:.1f}s",
+        file=sys.stderr,
+    )
+
+
+async def _run(args: argparse.Namespace) -> None:
+    await prewarm_client_pool()
+    runner = BatchRunner(args.concurrency, retry_failed=args.retry_failed, on_progress=_report)
+    try:
+        stats = await runner.run(args.input, args.output)
+    finally:
+        await close_client_pools()
+    _report(stats)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through BaseAgent")
+    parser.add_argument("input", help='JSONL with one {"id": ..., "prompt": ...} per line')
+    parser.add_argument("output", help="JSONL results; also the checkpoint an interrupted run resumes from")
+    parser.add_argument("--concurrency", type=int, default=config.BATCH_CONCURRENCY)
+    parser.add_argument("--retry-failed", action="store_true", help="Run items that previously failed again")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(_run(args))
+    except KeyboardInterrupt:
+        print("Interrupted; rerun with the same output file to resume", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator
+from agents import AgentEventType, BaseAgent
+from config import config
+from llm import TokenUsage
+
+@dataclass
+class BatchItem:
+    id: str
+    message: str | None
+    error: str | None = None
+
+
+@dataclass
+class BatchResult:
+    id: str
+    response: str | None = None
+    usage: TokenUsage | None = None
+    error: str | None = None
+    elapsed: float = 0.0
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "id": self.id,
+                "response": self.response,
+                "usage": self.usage.__dict__ if self.usage else None,
+                "error": self.error,
+                "elapsed": round(self.elapsed, 4),
+            },
+            ensure_ascii=False,
+        )
+
+
+@dataclass
+class BatchStats:
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    usage: TokenUsage = field(default_factory=TokenUsage)
+    elapsed: float = 0.0
+
+    @property
+    def items_per_second(self) -> float:
+        return (self.completed + self.failed) / self.elapsed if self.elapsed else 0.0
+
+
+def read_items(path: str) -> Iterator[BatchItem]:
+    # One line at a time, so input size never matters
+    with open(path, encoding="utf-8") as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield BatchItem(id=str(line_number), message=None, error=f"Invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield BatchItem(id=str(line_number), message=None, error="Each line must be a JSON object")
+                continue
+
+            item_id = str(record.get("id", line_number))
+            message = record.get("prompt") or record.get("message")
+            if not isinstance(message, str) or not message:
+                yield BatchItem(id=item_id, message=None, error="'prompt' is required")
+            else:
+                yield BatchItem(id=item_id, message=message)
+
+
+def load_checkpoint(path: str, retry_failed: bool = False) -> set[str]:
+    # The output file is the checkpoint: every line is one finished item
+    if not os.path.exists(path):
+        return set()
+
+    done: set[str] = set()
+    with open(path, "rb+") as file:
+        complete_bytes = 0
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            complete_bytes += len(line)
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            # Not one of ours; the item it might stand for is simply run again
+            if not isinstance(record, dict) or "id" not in record:
+                continue
+            if not (retry_failed and record.get("error")):
+                done.add(str(record["id"]))
+
+        # Drop a line cut off by a killed run so appended results start on a fresh line
+        file.truncate(complete_bytes)
+    return done
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        concurrency: int = config.BATCH_CONCURRENCY,
+        retry_failed: bool = False,
+        agent_factory: Callable[[], BaseAgent] = BaseAgent,
+        on_progress: Callable[[BatchStats], None] | None = None,
+    ) -> None:
+        self._concurrency = max(1, concurrency)
+        self._retry_failed = retry_failed
+        self._agent_factory = agent_factory
+        self._on_progress = on_progress
+
+    async def run(self, input_path: str, output_path: str) -> BatchStats:
+        stats = BatchStats()
+        started = time.perf_counter()
+        done = await asyncio.to_thread(load_checkpoint, output_path, self._retry_failed)
+        # Bounded so reading the input never runs far ahead of the workers
+        queue: asyncio.Queue[BatchItem | None] = asyncio.Queue(self._concurrency * 2)
+
+        async def produce() -> None:
+            for item in read_items(input_path):
+                if item.id in done:
+                    stats.skipped += 1
+                    continue
+                done.add(item.id)
+                await queue.put(item)
+            for _ in range(self._concurrency):
+                await queue.put(None)
+
+        with open(output_path, "a", encoding="utf-8") as output:
+
+            async def work() -> None:
+                while (item := await queue.get()) is not None:
+                    result = await self._run_item(item)
+                    # Flushed per line so a killed run loses at most the items in flight
+                    output.write(result.to_json() + "\n")
+                    output.flush()
+
+                    if result.error:
+                        stats.failed += 1
+                    else:
+                        stats.completed += 1
+                    if result.usage:
+                        stats.usage = stats.usage + result.usage
+                    if self._on_progress and (stats.completed + stats.failed) % config.BATCH_PROGRESS_INTERVAL == 0:
+                        stats.elapsed = time.perf_counter() - started
+                        self._on_progress(stats)
+
+            async with asyncio.TaskGroup() as group:
+                group.create_task(produce())
+                for _ in range(self._concurrency):
+                    group.create_task(work())
+
+        stats.elapsed = time.perf_counter() - started
+        return stats
+
+    async def _run_item(self, item: BatchItem) -> BatchResult:
+        result = BatchResult(id=item.id, error=item.error)
+        if item.message is None:
+            return result
+
+        started = time.perf_counter()
+        try:
+            # Each item gets a fresh context; the LLM client underneath is the shared pool
+            async with self._agent_factory() as agent:
+                async for event in agent.run(item.message):
+                    if event.type == AgentEventType.AGENT_ERROR:
+                        result.error = event.data.get("error")
+                    elif event.type == AgentEventType.AGENT_END:
+                        result.response = event.data.get("response")
+                        usage: dict[str, Any] | None = event.data.get("usage")
+                        result.usage = TokenUsage(**usage) if usage else None
+        except Exception as e:
+            result.error = str(e) or type(e).__name__
+
+        result.elapsed = time.perf_counter() - started
+        return result
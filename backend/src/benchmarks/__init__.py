@@ -0,0 +1,13 @@
+from .mock_server import MockLLMServer, MockResponseSettings, MockServerStats
+from .llm_bench import BenchmarkResult, run_benchmark, save_results, load_results, compare_results
+
+__all__ = [
+    "MockLLMServer",
+    "MockResponseSettings",
+    "MockServerStats",
+    "BenchmarkResult",
+    "run_benchmark",
+    "save_results",
+    "load_results",
+    "compare_results",
+]
@@ -0,0 +1,194 @@
+import argparse
+import asyncio
+from config import config
+from llm import close_client_pools, get_circuit_breaker, get_client_pool, get_rate_limiter, prewarm_client_pool
+from .mock_server import MockLLMServer, MockResponseSettings
+from .delta_bench import format_delta_results, run_delta_benchmark
+from .alloc_bench import format_alloc_results, run_alloc_benchmark
+from .loop_lag_bench import format_loop_lag_results, run_loop_lag_benchmark
+from .slack_bench import format_slack_results, run_slack_benchmark
+from .single_flight_bench import format_single_flight_results, run_single_flight_benchmark
+from .session_memory_bench import format_session_memory_results, run_session_memory_benchmark
+from .selection_bench import format_selection_results, run_selection_benchmark
+from .encoding_bench import format_encoding_results, run_encoding_benchmark
+from .startup_bench import format_startup_results, run_startup_benchmark
+from .llm_bench import (
+    compare_results,
+    format_results,
+    load_results,
+    point_config_at,
+    run_benchmark,
+    save_results,
+)
+
+def _add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ttft", type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="0 disables pacing")
+    parser.add_argument("--chunk-tokens", type=int, default=1)
+    parser.add_argument("--completion-tokens", type=int, default=64)
+    parser.add_argument("--cached-tokens", type=int, default=0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--connection-error-rate", type=float, default=0.0)
+
+
+def _mock_settings(args: argparse.Namespace) -> MockResponseSettings:
+    return MockResponseSettings(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        chunk_tokens=args.chunk_tokens,
+        completion_tokens=args.completion_tokens,
+        cached_tokens=args.cached_tokens,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        connection_error_rate=args.connection_error_rate,
+    )
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    async with MockLLMServer(_mock_settings(args), port=args.port) as server:
+        print(f"Mock LLM server listening on {server.url}")
+        await asyncio.Event().wait()
+
+
+async def _run(args: argparse.Namespace) -> None:
+    levels = [int(level) for level in args.concurrency.split(",")]
+    targets = args.targets.split(",")
+
+    async with MockLLMServer(_mock_settings(args), seed=args.seed) as server:
+        point_config_at(server.url)
+        if args.prewarm:
+            await prewarm_client_pool()
+        results = await run_benchmark(targets, levels, args.requests)
+        pool_stats = get_client_pool().stats()
+        limiter_stats = get_rate_limiter().stats()
+        breaker_stats = get_circuit_breaker().stats()
+        await close_client_pools()
+
+    print("\n".join(format_results(results)))
+    print(
+        f"pool: hits={pool_stats.hits} creates={pool_stats.creates} waits={pool_stats.waits} "
+        f"open_connections={pool_stats.open_connections} http2={pool_stats.http2} "
+        f"upstream_connections={server.stats.connections}"
+    )
+    print(
+        f"rate limiter: limit={limiter_stats.concurrency_limit} rate_limited={limiter_stats.rate_limited} "
+        f"throttled={limiter_stats.throttled} throttled_seconds={limiter_stats.throttled_seconds:.2f} "
+        f"circuit={breaker_stats.state} opens={breaker_stats.opens} rejected={breaker_stats.rejected}"
+    )
+    if args.save is not None:
+        path = save_results(results, args.save or None, metadata=vars(args))
+        print(f"Saved results to {path}")
+
+
+async def _deltas(args: argparse.Namespace) -> None:
+    results = await run_delta_benchmark(args.tokens, args.window, args.max_bytes, args.tokens_per_second)
+    print("\n".join(format_delta_results(results)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Nexus v2 latency/throughput benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run the mock OpenAI-compatible server")
+    serve.add_argument("--port", type=int, default=8900)
+    _add_mock_arguments(serve)
+
+    run = commands.add_parser("run", help="Benchmark LLMClient/BaseAgent against the mock server")
+    run.add_argument("--targets", default="llm,agent", help="Comma separated: llm, agent")
+    run.add_argument("--concurrency", default="1,8,32", help="Comma separated concurrency levels")
+    run.add_argument("--requests", type=int, default=4, help="Requests per session")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--prewarm", action="store_true", help="Pre-warm the shared HTTP pool before measuring")
+    run.add_argument("--save", nargs="?", const="", default=None, help="Save results (optional label, defaults to commit)")
+    _add_mock_arguments(run)
+
+    deltas = commands.add_parser("deltas", help="Measure agent-loop delta handling per streamed response")
+    deltas.add_argument("--tokens", type=int, default=100_000)
+    deltas.add_argument("--window", type=float, default=0.02, help="Coalescing window in seconds")
+    deltas.add_argument("--max-bytes", type=int, default=1024)
+    deltas.add_argument("--tokens-per-second", type=float, default=0.0, help="0 streams without pacing")
+
+    allocs = commands.add_parser("allocs", help="Measure memory per streamed delta and per history turn")
+    allocs.add_argument("--deltas", type=int, default=100_000)
+    allocs.add_argument("--messages", type=int, default=10_000)
+    allocs.add_argument("--turns", type=int, default=20)
+
+    startup = commands.add_parser("startup", help="Measure import time and spawn-to-first-token")
+    startup.add_argument("--runs", type=int, default=5)
+
+    lag = commands.add_parser("lag", help="Measure event-loop lag while sessions count large messages")
+    lag.add_argument("--sessions", type=int, default=8)
+    lag.add_argument("--chars", type=int, default=200_000)
+    lag.add_argument("--encoding-file", default=config.TOKENIZER_ENCODING_FILE, help="Local .tiktoken file")
+
+    slack = commands.add_parser("slack", help="Measure Slack posting and streamed edits against a mock Slack API")
+    slack.add_argument("--channels", type=int, default=50)
+    slack.add_argument("--messages", type=int, default=3, help="Messages posted to every channel")
+    slack.add_argument("--deltas", type=int, default=1000)
+    slack.add_argument("--tokens-per-second", type=float, default=200.0)
+    slack.add_argument("--interval", type=float, default=config.SLACK_UPDATE_INTERVAL, help="Seconds between edits")
+    slack.add_argument("--latency", type=float, default=0.02, help="Mock API latency in seconds")
+
+    flight = commands.add_parser("flight", help="Measure single-flight sharing of identical concurrent requests")
+    flight.add_argument("--requests", type=int, default=100, help="Identical requests made at once")
+    flight.add_argument("--completion-tokens", type=int, default=200)
+    flight.add_argument("--tokens-per-second", type=float, default=200.0)
+
+    sessions = commands.add_parser("sessions", help="Measure resident memory per session and per message")
+    sessions.add_argument("--sessions", type=int, default=10_000)
+    sessions.add_argument("--messages", type=int, default=20, help="Messages per session")
+    sessions.add_argument("--shared-ratio", type=float, default=0.3, help="Share of messages with text other sessions also have")
+
+    select = commands.add_parser("select", help="Compare per-request model selection with a single pinned model")
+    select.add_argument("--requests", type=int, default=400)
+    select.add_argument("--concurrency", type=int, default=16)
+    select.add_argument("--seed", type=int, default=0)
+
+    encode = commands.add_parser("encode", help="Measure wire encoding cost and size of streamed agent events")
+    encode.add_argument("--deltas", type=int, default=10_000, help="Text deltas in the encoded response")
+    encode.add_argument("--repeats", type=int, default=5)
+
+    compare = commands.add_parser("compare", help="Diff two saved result files")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        asyncio.run(_serve(args))
+    elif args.command == "run":
+        asyncio.run(_run(args))
+    elif args.command == "deltas":
+        asyncio.run(_deltas(args))
+    elif args.command == "allocs":
+        print("\n".join(format_alloc_results(run_alloc_benchmark(args.deltas, args.messages, args.turns))))
+    elif args.command == "startup":
+        print("\n".join(format_startup_results(asyncio.run(run_startup_benchmark(args.runs)))))
+    elif args.command == "lag":
+        results = asyncio.run(run_loop_lag_benchmark(args.sessions, args.chars, args.encoding_file))
+        print("\n".join(format_loop_lag_results(results)))
+    elif args.command == "slack":
+        results = asyncio.run(
+            run_slack_benchmark(
+                args.channels, args.messages, args.deltas, args.tokens_per_second, args.interval, args.latency
+            )
+        )
+        print("\n".join(format_slack_results(results)))
+    elif args.command == "flight":
+        results = asyncio.run(run_single_flight_benchmark(args.requests, args.completion_tokens, args.tokens_per_second))
+        print("\n".join(format_single_flight_results(results)))
+    elif args.command == "sessions":
+        results = run_session_memory_benchmark(args.sessions, args.messages, args.shared_ratio)
+        print("\n".join(format_session_memory_results(results)))
+    elif args.command == "select":
+        results = asyncio.run(run_selection_benchmark(args.requests, args.concurrency, args.seed))
+        print("\n".join(format_selection_results(results)))
+    elif args.command == "encode":
+        print("\n".join(format_encoding_results(run_encoding_benchmark(args.deltas, args.repeats))))
+    else:
+        print("\n".join(compare_results(load_results(args.baseline), load_results(args.candidate))))
+
+
+if __name__ == "__main__":
+    main()
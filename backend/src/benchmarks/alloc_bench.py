@@ -0,0 +1,141 @@
+from __future__ import annotations
+import gc
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable
+from agents import AgentEvent
+from context import ContextManager, MessageItem
+from llm import StreamEvent, StreamEventType, TokenUsage
+
+@dataclass
+class AllocBenchmarkResult:
+    scenario: str
+    mode: str
+    items: int
+    bytes_per_item: float
+    blocks_per_item: float
+    us_per_op: float
+
+
+# Dict-backed copies of the representations before they moved to __slots__, kept for comparison
+@dataclass
+class _LegacyTextDelta:
+    content: str
+
+
+@dataclass
+class _LegacyStreamEvent:
+    type: str
+    text_delta: _LegacyTextDelta | None = None
+    error: str | None = None
+    finish_reason: str | None = None
+    usage: TokenUsage | None = None
+
+
+@dataclass
+class _LegacyAgentEvent:
+    type: str
+    data: dict[str, Any]
+
+
+@dataclass
+class _LegacyMessageItem:
+    role: str
+    content: str
+    token_count: int | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"role": self.role, "content": self.content}
+
+
+def _legacy_delta(content: str) -> tuple[_LegacyStreamEvent, _LegacyAgentEvent]:
+    event = _LegacyStreamEvent(type=StreamEventType.TEXT_DELTA, text_delta=_LegacyTextDelta(content))
+    return event, _LegacyAgentEvent(type="text_delta", data={"content": event.text_delta.content})
+
+
+def _current_delta(content: str) -> tuple[StreamEvent, AgentEvent]:
+    event = StreamEvent.create_delta(content)
+    return event, AgentEvent.text_delta(event.text_delta.content)
+
+
+def _retained(build: Callable[[], list[Any]]) -> tuple[list[Any], int, int, float]:
+    # Everything built stays referenced, so the deltas measure what each item keeps alive
+    gc.collect()
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    started = time.perf_counter()
+    items = build()
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    blocks = sys.getallocatedblocks() - blocks_before
+    tracemalloc.stop()
+    return items, size, blocks, elapsed
+
+
+def bench_deltas(count: int) -> list[AllocBenchmarkResult]:
+    # Distinct strings per token, as a real stream would produce
+    texts = [f" tok{index}" for index in range(count)]
+    results = []
+    for mode, make in (("legacy", _legacy_delta), ("slots", _current_delta)):
+        items, size, blocks, elapsed = _retained(lambda: [make(text) for text in texts])
+        results.append(
+            AllocBenchmarkResult("deltas", mode, count, size / count, blocks / count, elapsed / count * 1e6)
+        )
+        del items
+    return results
+
+
+def _legacy_turns(history: list[_LegacyMessageItem], turns: int) -> list[list[dict[str, Any]]]:
+    system = {"role": "system", "content": "system"}
+    return [[system, *(item.to_dict() for item in history)] for _ in range(turns)]
+
+
+def _current_turns(context: ContextManager, turns: int) -> list[list[dict[str, Any]]]:
+    sent = []
+    for turn in range(turns):
+        context.add_user_message(f"follow-up {turn}")
+        sent.append(context.get_messages())
+    return sent
+
+
+def bench_history(messages: int, turns: int) -> list[AllocBenchmarkResult]:
+    contents = [f"message {index} " + "lorem ipsum " * 8 for index in range(messages)]
+    results = []
+
+    history, size, blocks, elapsed = _retained(
+        lambda: [_LegacyMessageItem("user" if index % 2 == 0 else "assistant", text, 30) for index, text in enumerate(contents)]
+    )
+    results.append(AllocBenchmarkResult("history", "legacy", messages, size / messages, blocks / messages, elapsed / messages * 1e6))
+    _, size, blocks, elapsed = _retained(lambda: _legacy_turns(history, turns))
+    results.append(AllocBenchmarkResult("turn", "legacy", turns, size / turns, blocks / turns, elapsed / turns * 1e6))
+    del history
+
+    slotted, size, blocks, elapsed = _retained(
+        lambda: [MessageItem("user" if index % 2 == 0 else "assistant", text, 30) for index, text in enumerate(contents)]
+    )
+    results.append(AllocBenchmarkResult("history", "slots", messages, size / messages, blocks / messages, elapsed / messages * 1e6))
+
+    context = ContextManager()
+    # Large enough that the whole history stays in the window, like the legacy path
+    context._context_budget = sys.maxsize
+    context.restore_messages(slotted)
+    context.get_messages()
+    _, size, blocks, elapsed = _retained(lambda: _current_turns(context, turns))
+    results.append(AllocBenchmarkResult("turn", "slots", turns, size / turns, blocks / turns, elapsed / turns * 1e6))
+    return results
+
+
+def run_alloc_benchmark(deltas: int = 100_000, messages: int = 10_000, turns: int = 20) -> list[AllocBenchmarkResult]:
+    return [*bench_deltas(deltas), *bench_history(messages, turns)]
+
+
+def format_alloc_results(results: list[AllocBenchmarkResult]) -> list[str]:
+    lines = [f"{'scenario':<9} {'mode':<7} {'items':>7} {'bytes/item':>11} {'blocks/item':>12} {'us/op':>9}"]
+    for result in results:
+        lines.append(
+            f"{result.scenario:<9} {result.mode:<7} {result.items:>7} {result.bytes_per_item:>11.1f} "
+            f"{result.blocks_per_item:>12.2f} {result.us_per_op:>9.2f}"
+        )
+    return lines
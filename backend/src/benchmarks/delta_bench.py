@@ -0,0 +1,111 @@
+from __future__ import annotations
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncGenerator
+from agents import AgentEvent, AgentEventType, BaseAgent
+from llm import StreamEvent, StreamEventType
+
+@dataclass
+class DeltaBenchmarkResult:
+    mode: str
+    tokens: int
+    events: int
+    wall_ms: float
+    cpu_ms: float
+    events_per_sec: float
+    cpu_ms_per_100k_tokens: float
+
+
+class SyntheticClient:
+    # Stands in for LLMClient so the benchmark measures the agent loop, not the network
+    def __init__(self, tokens: int, token_text: str = " tok", tokens_per_second: float = 0.0) -> None:
+        self._tokens = tokens
+        self._token_text = token_text
+        self._interval = 1 / tokens_per_second if tokens_per_second else 0.0
+
+    async def chat_completion(
+        self,
+        messages: list[dict[str, Any]],
+        stream: bool,
+        model: str | None = None,
+        tools: list[dict[str, Any]] | None = None,
+        tool_choice: str | None = None,
+        max_tokens: int | None = None,
+        stop: list[str] | None = None,
+        deadline: float | None = None,
+        task: str = "synthesis",
+        prompt_tokens: int | None = None,
+        policy: Any = None,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        for _ in range(self._tokens):
+            yield StreamEvent.create_delta(self._token_text)
+            if self._interval:
+                await asyncio.sleep(self._interval)
+        yield StreamEvent.create_msg_complete("stop")
+
+    async def close(self) -> None:
+        pass
+
+
+async def _legacy_loop(client: SyntheticClient) -> AsyncGenerator[AgentEvent, None]:
+    # The pre-coalescing loop: one AgentEvent per chunk and repeated string concatenation
+    response_text = ""
+    async for event in client.chat_completion([], True):
+        if event.type == StreamEventType.TEXT_DELTA and event.text_delta:
+            content = event.text_delta.content
+            response_text += content
+            yield AgentEvent.text_delta(content)
+    if response_text:
+        yield AgentEvent.text_complete(response_text)
+
+
+async def _measure(mode: str, tokens: int, events: AsyncGenerator[AgentEvent, None]) -> DeltaBenchmarkResult:
+    count = 0
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    # Each event is serialized like a transport would, so per-event downstream cost counts
+    async for event in events:
+        if event.type == AgentEventType.TEXT_DELTA:
+            count += 1
+            json.dumps(event.data)
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    return DeltaBenchmarkResult(
+        mode=mode,
+        tokens=tokens,
+        events=count,
+        wall_ms=wall * 1000,
+        cpu_ms=cpu * 1000,
+        events_per_sec=count / wall if wall else 0.0,
+        cpu_ms_per_100k_tokens=cpu * 1000 * 100_000 / tokens,
+    )
+
+
+async def run_delta_benchmark(
+    tokens: int = 100_000,
+    window: float = 0.02,
+    max_bytes: int = 1024,
+    tokens_per_second: float = 0.0,
+) -> list[DeltaBenchmarkResult]:
+    results = [await _measure("legacy", tokens, _legacy_loop(SyntheticClient(tokens, tokens_per_second=tokens_per_second)))]
+
+    for mode, mode_window, mode_bytes in (("uncoalesced", 0.0, 0), ("coalesced", window, max_bytes)):
+        agent = BaseAgent(coalesce_window=mode_window, coalesce_max_bytes=mode_bytes)
+        agent.client = SyntheticClient(tokens, tokens_per_second=tokens_per_second)
+        results.append(await _measure(mode, tokens, agent._agentic_loop()))
+
+    return results
+
+
+def format_delta_results(results: list[DeltaBenchmarkResult]) -> list[str]:
+    lines = [f"{'mode':<13}{'tokens':>9}{'events':>9}{'wall ms':>10}{'cpu ms':>10}{'events/s':>12}{'cpu ms/100k':>13}"]
+    for r in results:
+        lines.append(
+            f"{r.mode:<13}{r.tokens:>9}{r.events:>9}{r.wall_ms:>10.1f}{r.cpu_ms:>10.1f}"
+            f"{r.events_per_sec:>12.0f}{r.cpu_ms_per_100k_tokens:>13.1f}"
+        )
+    return lines
@@ -0,0 +1,102 @@
+from __future__ import annotations
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Callable
+from agents import AgentEvent
+from api import decode_binary, encoding, get_encoder
+from llm import TokenUsage
+
+@dataclass
+class EncodingResult:
+    encoder: str
+    events: int
+    ns_per_event: float
+    ns_per_delta: float
+    bytes_per_event: float
+    bytes_per_delta: float
+    total_kb: float
+
+
+_WORDS = ("the", "venue", "holds", "200", "guests", "and", "catering", "starts", "at", "noon", "café", "—", "\n")
+
+def _response(deltas: int, seed: int) -> list[AgentEvent]:
+    # What one streamed run sends: a start, token-sized deltas, the full text and the end
+    rng = random.Random(seed)
+    tokens = [" " + rng.choice(_WORDS) for _ in range(deltas)]
+    text = "".join(tokens)
+    return [
+        AgentEvent.agent_start("Plan the launch event"),
+        *(AgentEvent.text_delta(token) for token in tokens),
+        AgentEvent.text_complete(text),
+        AgentEvent.agent_end(text, TokenUsage(prompt_tokens=1200, completion_tokens=deltas, total_tokens=1200 + deltas)),
+    ]
+
+
+def _legacy_sse(event: AgentEvent) -> bytes:
+    # The encoders before the templates: a nested dict through json.dumps for every frame
+    payload = json.dumps({"type": event.type.value, "data": event.data})
+    return f"event: {event.type.value}\ndata: {payload}\n\n".encode()
+
+
+def _legacy_ndjson(event: AgentEvent) -> bytes:
+    return json.dumps({"type": event.type.value, "data": event.data}).encode() + b"\n"
+
+
+def _time_ns(encode: Callable[[AgentEvent], bytes], events: list[AgentEvent], repeats: int) -> int:
+    best = None
+    for _ in range(repeats):
+        started = time.perf_counter_ns()
+        for event in events:
+            encode(event)
+        elapsed = time.perf_counter_ns() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_encoding_benchmark(deltas: int = 10_000, repeats: int = 5, seed: int = 0) -> list[EncodingResult]:
+    events = _response(deltas, seed)
+    delta_events = events[1:-2]
+    candidates = [
+        ("legacy-sse", _legacy_sse),
+        ("legacy-ndjson", _legacy_ndjson),
+        ("sse", get_encoder("sse").encode),
+        ("ndjson", get_encoder("ndjson").encode),
+        ("binary", get_encoder("binary").encode),
+    ]
+
+    # Every encoder has to carry the same response, whatever its framing
+    frames = b"".join(get_encoder("binary").encode(event) for event in events)
+    decoded = [(event.type, event.data) for event in decode_binary(frames)]
+    assert decoded == [(event.type, json.loads(json.dumps(event.data))) for event in events]
+
+    results = []
+    for name, encode in candidates:
+        total_bytes = sum(len(encode(event)) for event in events)
+        delta_bytes = sum(len(encode(event)) for event in delta_events)
+        results.append(
+            EncodingResult(
+                encoder=name,
+                events=len(events),
+                ns_per_event=_time_ns(encode, events, repeats) / len(events),
+                ns_per_delta=_time_ns(encode, delta_events, repeats) / len(delta_events),
+                bytes_per_event=total_bytes / len(events),
+                bytes_per_delta=delta_bytes / len(delta_events),
+                total_kb=total_bytes / 1024,
+            )
+        )
+    return results
+
+
+def format_encoding_results(results: list[EncodingResult]) -> list[str]:
+    lines = [
+        f"{'encoder':<14} {'events':>7} {'ns/event':>9} {'ns/delta':>9} {'bytes/event':>12} {'bytes/delta':>12} {'total KB':>9}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.encoder:<14} {result.events:>7} {result.ns_per_event:>9.0f} {result.ns_per_delta:>9.0f} "
+            f"{result.bytes_per_event:>12.1f} {result.bytes_per_delta:>12.1f} {result.total_kb:>9.1f}"
+        )
+    lines.append(f"json: {'orjson' if 'orjson' in vars(encoding) else 'stdlib'}")
+    return lines
@@ -0,0 +1,242 @@
+from __future__ import annotations
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+from config import config
+from agents import AgentEventType, BaseAgent
+from llm import LLMClient, StreamEventType
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+@dataclass
+class LatencySummary:
+    p50: float = 0.0
+    p99: float = 0.0
+    mean: float = 0.0
+
+    @classmethod
+    def from_samples(cls, samples: list[float]) -> LatencySummary:
+        if not samples:
+            return cls()
+        ordered = sorted(samples)
+        return cls(
+            p50=percentile(ordered, 50),
+            p99=percentile(ordered, 99),
+            mean=sum(ordered) / len(ordered),
+        )
+
+
+@dataclass
+class BenchmarkResult:
+    target: str
+    concurrency: int
+    requests: int
+    errors: int
+    ttft_ms: LatencySummary
+    inter_token_ms: LatencySummary
+    e2e_ms: LatencySummary
+    events_per_sec: float
+    peak_rss_kb: int
+
+
+@dataclass
+class _RequestSample:
+    ttft: float | None = None
+    e2e: float = 0.0
+    events: int = 0
+    error: bool = False
+    gaps: list[float] = field(default_factory=list)
+
+
+def percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def peak_rss_kb() -> int:
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if platform.system() == "Darwin" else usage
+
+
+def point_config_at(base_url: str) -> None:
+    config.BASE_URL = base_url
+    config.OPENROUTER_API_KEY = "mock-key"
+
+
+async def _run_llm_request(prompt: str) -> _RequestSample:
+    sample = _RequestSample()
+    client = LLMClient()
+    messages = [{"role": "user", "content": prompt}]
+    start = last = time.perf_counter()
+
+    try:
+        async for event in client.chat_completion(messages, True):
+            now = time.perf_counter()
+            sample.events += 1
+
+            if event.type == StreamEventType.TEXT_DELTA:
+                if sample.ttft is None:
+                    sample.ttft = now - start
+                else:
+                    sample.gaps.append(now - last)
+                last = now
+            elif event.type == StreamEventType.ERROR:
+                sample.error = True
+    finally:
+        await client.close()
+
+    sample.e2e = time.perf_counter() - start
+    return sample
+
+
+async def _run_agent_request(prompt: str) -> _RequestSample:
+    sample = _RequestSample()
+    start = last = time.perf_counter()
+
+    async with BaseAgent() as agent:
+        async for event in agent.run(prompt):
+            now = time.perf_counter()
+            sample.events += 1
+
+            if event.type == AgentEventType.TEXT_DELTA:
+                if sample.ttft is None:
+                    sample.ttft = now - start
+                else:
+                    sample.gaps.append(now - last)
+                last = now
+            elif event.type == AgentEventType.AGENT_ERROR:
+                sample.error = True
+
+    sample.e2e = time.perf_counter() - start
+    return sample
+
+
+async def run_level(target: str, concurrency: int, requests_per_session: int, prompt: str) -> BenchmarkResult:
+    run_request = _run_agent_request if target == "agent" else _run_llm_request
+
+    async def session(index: int) -> list[_RequestSample]:
+        # Distinct per session, or single-flight would collapse concurrent sessions into one stream
+        session_prompt = f"{prompt} ({index})"
+        return [await run_request(session_prompt) for _ in range(requests_per_session)]
+
+    started = time.perf_counter()
+    sessions = await asyncio.gather(*(session(index) for index in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for session_samples in sessions for sample in session_samples]
+    ok_samples = [sample for sample in samples if not sample.error]
+
+    return BenchmarkResult(
+        target=target,
+        concurrency=concurrency,
+        requests=len(samples),
+        errors=len(samples) - len(ok_samples),
+        ttft_ms=LatencySummary.from_samples([s.ttft * 1000 for s in ok_samples if s.ttft is not None]),
+        inter_token_ms=LatencySummary.from_samples([gap * 1000 for s in ok_samples for gap in s.gaps]),
+        e2e_ms=LatencySummary.from_samples([s.e2e * 1000 for s in ok_samples]),
+        events_per_sec=sum(s.events for s in samples) / elapsed if elapsed else 0.0,
+        peak_rss_kb=peak_rss_kb(),
+    )
+
+
+async def run_benchmark(
+    targets: list[str],
+    levels: list[int],
+    requests_per_session: int = 1,
+    prompt: str = config.DEFAULT_PROMPT,
+) -> list[BenchmarkResult]:
+    results = []
+    for target in targets:
+        for concurrency in levels:
+            results.append(await run_level(target, concurrency, requests_per_session, prompt))
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=Path(__file__).parent,
+            check=True,
+        )
+        return output.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(
+    results: list[BenchmarkResult],
+    label: str | None = None,
+    metadata: dict[str, Any] | None = None,
+) -> Path:
+    commit = _git_commit()
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{label or commit or int(time.time())}.json"
+
+    payload = {
+        "commit": commit,
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "metadata": metadata or {},
+        "results": [asdict(result) for result in results],
+    }
+    path.write_text(json.dumps(payload, indent=2))
+    return path
+
+
+def load_results(path: str | Path) -> dict[str, Any]:
+    return json.loads(Path(path).read_text())
+
+
+COMPARED_METRICS = [
+    ("ttft_ms", "p50"),
+    ("ttft_ms", "p99"),
+    ("inter_token_ms", "p50"),
+    ("e2e_ms", "p50"),
+    ("e2e_ms", "p99"),
+    ("events_per_sec", None),
+    ("peak_rss_kb", None),
+]
+
+def compare_results(baseline: dict[str, Any], candidate: dict[str, Any]) -> list[str]:
+    baseline_rows = {(row["target"], row["concurrency"]): row for row in baseline["results"]}
+    lines = [f"{'target':<8}{'conc':>6}  {'metric':<22}{'baseline':>12}{'candidate':>12}{'change':>10}"]
+
+    for row in candidate["results"]:
+        base_row = baseline_rows.get((row["target"], row["concurrency"]))
+        if base_row is None:
+            continue
+
+        for metric, stat in COMPARED_METRICS:
+            old = base_row[metric][stat] if stat else base_row[metric]
+            new = row[metric][stat] if stat else row[metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            name = f"{metric}.{stat}" if stat else metric
+            lines.append(f"{row['target']:<8}{row['concurrency']:>6}  {name:<22}{old:>12.2f}{new:>12.2f}{change:>10}")
+
+    return lines
+
+
+def format_results(results: list[BenchmarkResult]) -> list[str]:
+    lines = [
+        f"{'target':<8}{'conc':>6}{'reqs':>6}{'err':>5}{'ttft p50':>10}{'ttft p99':>10}"
+        f"{'itl p50':>9}{'e2e p50':>10}{'e2e p99':>10}{'events/s':>11}{'rss MB':>8}"
+    ]
+    for r in results:
+        lines.append(
+            f"{r.target:<8}{r.concurrency:>6}{r.requests:>6}{r.errors:>5}"
+            f"{r.ttft_ms.p50:>10.1f}{r.ttft_ms.p99:>10.1f}{r.inter_token_ms.p50:>9.2f}"
+            f"{r.e2e_ms.p50:>10.1f}{r.e2e_ms.p99:>10.1f}{r.events_per_sec:>11.0f}{r.peak_rss_kb / 1024:>8.1f}"
+        )
+    return lines
@@ -0,0 +1,104 @@
+from __future__ import annotations
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+from config import config
+from context import ContextManager
+from utils import get_encoding, warm_up_tokenizer
+
+TICK_INTERVAL = 0.001
+
+@dataclass
+class LoopLagResult:
+    mode: str
+    sessions: int
+    chars: int
+    elapsed_ms: float
+    lag_p50_ms: float
+    lag_p99_ms: float
+    lag_max_ms: float
+
+
+async def _ticker(lags: list[float], stop: asyncio.Event) -> None:
+    # Stands in for another session's stream: how late does each 1 ms tick fire?
+    while not stop.is_set():
+        expected = time.perf_counter() + TICK_INTERVAL
+        await asyncio.sleep(TICK_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+def _add_sync(context: ContextManager, text: str) -> Awaitable[None]:
+    async def add() -> None:
+        context.add_user_message(text)
+    return add()
+
+
+def _add_async(context: ContextManager, text: str) -> Awaitable[None]:
+    return context.add_user_message_async(text)
+
+
+async def _measure(
+    mode: str,
+    add: Callable[[ContextManager, str], Awaitable[None]],
+    sessions: int,
+    text: str,
+) -> LoopLagResult:
+    contexts = [ContextManager() for _ in range(sessions)]
+    # Distinct per session so the token count memo can't serve them
+    texts = [f"{index} {text}" for index in range(sessions)]
+
+    lags: list[float] = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+    await asyncio.sleep(TICK_INTERVAL * 5)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(add(context, text) for context, text in zip(contexts, texts)))
+    elapsed = time.perf_counter() - started
+
+    await asyncio.sleep(TICK_INTERVAL * 5)
+    stop.set()
+    await ticker
+
+    lags.sort()
+    return LoopLagResult(
+        mode=mode,
+        sessions=sessions,
+        chars=len(text),
+        elapsed_ms=elapsed * 1000,
+        lag_p50_ms=statistics.median(lags) * 1000,
+        lag_p99_ms=lags[int(len(lags) * 0.99)] * 1000,
+        lag_max_ms=lags[-1] * 1000,
+    )
+
+
+async def run_loop_lag_benchmark(
+    sessions: int = 8,
+    chars: int = 200_000,
+    encoding_file: str | None = None,
+) -> list[LoopLagResult]:
+    # Loaded up front so neither mode pays for the BPE load
+    warm_up_tokenizer(config.DEFAULT_AI_MODEL, encoding_file)
+
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "lorem", "ipsum", "dolor", "sit", "amet"]
+    text = " ".join(words[index % len(words)] + str(index % 97) for index in range(chars // 4))[:chars]
+
+    results = []
+    for mode, add in (("sync", _add_sync), ("offload", _add_async)):
+        results.append(await _measure(mode, add, sessions, text))
+    return results
+
+
+def format_loop_lag_results(results: list[LoopLagResult]) -> list[str]:
+    lines = []
+    if get_encoding(config.DEFAULT_AI_MODEL) is None:
+        lines.append("warning: no BPE ranks available, counts are estimates (pass --encoding-file)")
+    lines.append(f"{'mode':<8} {'sessions':>8} {'chars':>8} {'total ms':>9} {'lag p50':>8} {'lag p99':>8} {'lag max':>8}")
+    for result in results:
+        lines.append(
+            f"{result.mode:<8} {result.sessions:>8} {result.chars:>8} {result.elapsed_ms:>9.1f} "
+            f"{result.lag_p50_ms:>8.2f} {result.lag_p99_ms:>8.2f} {result.lag_max_ms:>8.2f}"
+        )
+    return lines
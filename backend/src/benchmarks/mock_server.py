@@ -0,0 +1,286 @@
+from __future__ import annotations
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any
+from utils.http import ChunkedResponse, HttpRequest, read_request, write_json
+
+@dataclass
+class MockResponseSettings:
+    ttft: float = 0.05
+    tokens_per_second: float = 200.0  # 0 streams as fast as the socket allows
+    chunk_tokens: int = 1
+    completion_tokens: int = 64
+    token_text: str = " tok"
+    prompt_tokens: int | None = None  # None estimates from the request messages
+    cached_tokens: int = 0
+    include_usage: bool = True
+    rate_limit_rate: float = 0.0
+    retry_after: float | None = 1.0
+    connection_error_rate: float = 0.0
+    # Calls ({"name": ..., "arguments": {...}}) made when the request offers tools and the
+    # conversation doesn't already end in tool results
+    tool_calls: list[dict[str, Any]] = field(default_factory=list)
+    tool_call_chunk_chars: int = 16  # argument characters per streamed fragment
+
+
+@dataclass
+class MockServerStats:
+    requests: int = 0
+    streams: int = 0
+    rate_limited: int = 0
+    dropped: int = 0
+    connections: int = 0
+    completion_tokens: int = 0  # actually sent, so streams the client abandoned count only what went out
+    aborted: int = 0  # streams the client closed before they finished
+
+
+class MockLLMServer:
+    def __init__(
+        self,
+        settings: MockResponseSettings | None = None,
+        model_settings: dict[str, MockResponseSettings] | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: int | None = None,
+    ) -> None:
+        self.settings = settings or MockResponseSettings()
+        self.model_settings = model_settings or {}
+        self.stats = MockServerStats()
+        self._host = host
+        self._port = port
+        self._random = random.Random(seed)
+        self._server: asyncio.Server | None = None
+        self._connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self._request_counter = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self._host}:{self._port}/v1"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        self._port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            # Idle keep-alive connections would otherwise outlive the server
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> MockLLMServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.connections += 1
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+
+                keep_alive = await self._dispatch(request, writer)
+                if not keep_alive or not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    async def _dispatch(self, request: HttpRequest, writer: asyncio.StreamWriter) -> bool:
+        if request.method == "GET" and request.path.rstrip("/").endswith("/models"):
+            await write_json(writer, 200, {"object": "list", "data": []})
+            return True
+
+        if request.method != "POST" or not request.path.endswith("/chat/completions"):
+            await write_json(writer, 404, {"error": {"message": f"Unknown route {request.path}"}})
+            return True
+
+        self.stats.requests += 1
+        body = request.json()
+        settings = self.model_settings.get(body.get("model", ""), self.settings)
+
+        if self._random.random() < settings.connection_error_rate:
+            # Drop the socket mid-request so the client sees a connection error
+            self.stats.dropped += 1
+            return False
+
+        if self._random.random() < settings.rate_limit_rate:
+            self.stats.rate_limited += 1
+            headers = {"Retry-After": str(settings.retry_after)} if settings.retry_after is not None else {}
+            await write_json(
+                writer,
+                429,
+                {"error": {"message": "Rate limit exceeded (mock)", "type": "rate_limit_error"}},
+                headers=headers,
+            )
+            return True
+
+        max_tokens = body.get("max_tokens") or body.get("max_completion_tokens")
+        truncated = bool(max_tokens) and int(max_tokens) < settings.completion_tokens
+        if truncated:
+            settings = replace(settings, completion_tokens=int(max_tokens))
+
+        self._request_counter += 1
+        completion_id = f"chatcmpl-mock-{self._request_counter}"
+        messages = body.get("messages") or [{}]
+        if not body.get("tools") or body.get("tool_choice") == "none" or messages[-1].get("role") == "tool":
+            settings = replace(settings, tool_calls=[])
+
+        finish_reason = "tool_calls" if settings.tool_calls else "length" if truncated else "stop"
+        if body.get("stream"):
+            self.stats.streams += 1
+            try:
+                await self._stream_completion(writer, completion_id, body, settings, finish_reason)
+            except ConnectionError:
+                self.stats.aborted += 1
+                raise
+        else:
+            await asyncio.sleep(settings.ttft + self._generation_time(settings))
+            await write_json(writer, 200, self._completion_payload(completion_id, body, settings, finish_reason))
+            self.stats.completion_tokens += settings.completion_tokens
+        return True
+
+    async def _stream_completion(
+        self,
+        writer: asyncio.StreamWriter,
+        completion_id: str,
+        body: dict[str, Any],
+        settings: MockResponseSettings,
+        finish_reason: str,
+    ) -> None:
+        response = ChunkedResponse(writer)
+        await response.start(200, "text/event-stream")
+
+        model = body.get("model", "mock")
+        include_usage = settings.include_usage and (body.get("stream_options") or {}).get("include_usage", True)
+        interval = settings.chunk_tokens / settings.tokens_per_second if settings.tokens_per_second else 0.0
+
+        await asyncio.sleep(settings.ttft)
+        next_send = time.perf_counter()
+        remaining = 0 if settings.tool_calls else settings.completion_tokens
+
+        for index, call in enumerate(settings.tool_calls):
+            arguments = json.dumps(call.get("arguments", {}))
+            fragments = [
+                arguments[start:start + settings.tool_call_chunk_chars]
+                for start in range(0, len(arguments), settings.tool_call_chunk_chars)
+            ]
+            head = {"index": index, "id": f"call_{completion_id}_{index}", "type": "function"}
+            for position, fragment in enumerate(fragments):
+                function = {"arguments": fragment}
+                if position == 0:
+                    function["name"] = call["name"]
+                delta_call = {**head, "function": function} if position == 0 else {"index": index, "function": function}
+                await response.write(self._sse(self._chunk(completion_id, model, {"tool_calls": [delta_call]})))
+                if interval:
+                    next_send += interval
+                    await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+        while remaining > 0:
+            tokens = min(settings.chunk_tokens, remaining)
+            remaining -= tokens
+            delta = {"content": settings.token_text * tokens}
+            await response.write(self._sse(self._chunk(completion_id, model, delta)))
+            self.stats.completion_tokens += tokens
+
+            if interval:
+                next_send += interval
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+        await response.write(self._sse(self._chunk(completion_id, model, {}, finish_reason=finish_reason)))
+
+        if include_usage:
+            usage_chunk = self._chunk(completion_id, model, None)
+            usage_chunk["usage"] = self._usage(body, settings)
+            await response.write(self._sse(usage_chunk))
+
+        await response.end(b"data: [DONE]\n\n")
+
+    def _generation_time(self, settings: MockResponseSettings) -> float:
+        if not settings.tokens_per_second:
+            return 0.0
+        return settings.completion_tokens / settings.tokens_per_second
+
+    def _chunk(
+        self,
+        completion_id: str,
+        model: str,
+        delta: dict[str, Any] | None,
+        finish_reason: str | None = None,
+    ) -> dict[str, Any]:
+        choices = [] if delta is None else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": choices,
+        }
+
+    def _completion_payload(
+        self,
+        completion_id: str,
+        body: dict[str, Any],
+        settings: MockResponseSettings,
+        finish_reason: str,
+    ) -> dict[str, Any]:
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": self._message(completion_id, settings),
+                    "finish_reason": finish_reason,
+                }
+            ],
+            "usage": self._usage(body, settings),
+        }
+
+    def _message(self, completion_id: str, settings: MockResponseSettings) -> dict[str, Any]:
+        if not settings.tool_calls:
+            return {"role": "assistant", "content": settings.token_text * settings.completion_tokens}
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{completion_id}_{index}",
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))},
+                }
+                for index, call in enumerate(settings.tool_calls)
+            ],
+        }
+
+    def _usage(self, body: dict[str, Any], settings: MockResponseSettings) -> dict[str, Any]:
+        prompt_tokens = settings.prompt_tokens
+        if prompt_tokens is None:
+            prompt_chars = sum(len(str(message.get("content") or "")) for message in body.get("messages", []))
+            prompt_tokens = max(1, prompt_chars // 4)
+
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": settings.completion_tokens,
+            "total_tokens": prompt_tokens + settings.completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": min(settings.cached_tokens, prompt_tokens)},
+        }
+
+    @staticmethod
+    def _sse(payload: dict[str, Any]) -> bytes:
+        return b"data: " + json.dumps(payload).encode() + b"\n\n"
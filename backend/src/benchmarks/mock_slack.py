@@ -0,0 +1,150 @@
+from __future__ import annotations
+import asyncio
+import time
+from dataclasses import dataclass, field
+from config import config
+from llm.rate_limiter import TokenBucket
+from utils.http import HttpRequest, read_request, write_json
+
+@dataclass
+class MockSlackSettings:
+    token: str = "xoxb-mock"
+    latency: float = 0.02
+    channel_messages_per_second: float = 1.0  # chat.postMessage per channel
+    channel_burst: int = 2  # posts a channel tolerates back to back before the per-second limit applies
+    method_tiers: dict[str, int] = field(default_factory=lambda: dict(config.SLACK_METHOD_TIERS))
+    retry_after: int = 1
+
+
+@dataclass
+class MockSlackStats:
+    requests: int = 0
+    posts: int = 0
+    updates: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+    connections: int = 0
+
+
+class MockSlackServer:
+    def __init__(self, settings: MockSlackSettings | None = None, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.settings = settings or MockSlackSettings()
+        self.stats = MockSlackStats()
+        # Final text of every message, by channel then ts
+        self.messages: dict[str, dict[str, str]] = {}
+        self._host = host
+        self._port = port
+        self._server: asyncio.Server | None = None
+        self._connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+        self._channel_buckets: dict[str, TokenBucket] = {}
+        self._method_buckets: dict[str, TokenBucket] = {}
+        self._ts_counter = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://{self._host}:{self._port}/api"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self._host, self._port)
+        self._port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*self._connections.values(), return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> MockSlackServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.stop()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats.connections += 1
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                await self._dispatch(request, writer)
+                if not request.keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+
+    def _over_limit(self, method: str, channel: str | None) -> bool:
+        # Checked on arrival, like Slack: a rejected call still doesn't count against the budget
+        buckets = []
+        tier = self.settings.method_tiers.get(method)
+        if tier is not None:
+            bucket = self._method_buckets.get(method)
+            if bucket is None:
+                per_minute = config.SLACK_TIER_LIMITS[tier]
+                bucket = self._method_buckets[method] = TokenBucket(per_minute, 60 / per_minute * 2)
+            buckets.append(bucket)
+        if method == "chat.postMessage" and channel and self.settings.channel_messages_per_second:
+            rate = self.settings.channel_messages_per_second
+            bucket = self._channel_buckets.get(channel)
+            if bucket is None:
+                bucket = self._channel_buckets[channel] = TokenBucket(rate * 60, self.settings.channel_burst / rate)
+            buckets.append(bucket)
+
+        if any(bucket.delay(1) > 0 for bucket in buckets):
+            return True
+        for bucket in buckets:
+            bucket.consume(1)
+        return False
+
+    async def _dispatch(self, request: HttpRequest, writer: asyncio.StreamWriter) -> None:
+        self.stats.requests += 1
+        method = request.path.rsplit("/", 1)[-1]
+
+        if request.headers.get("authorization") != f"Bearer {self.settings.token}":
+            self.stats.errors += 1
+            await write_json(writer, 200, {"ok": False, "error": "invalid_auth"})
+            return
+
+        body = request.json()
+        channel = body.get("channel")
+        if self._over_limit(method, channel):
+            self.stats.rate_limited += 1
+            await write_json(
+                writer,
+                429,
+                {"ok": False, "error": "ratelimited"},
+                headers={"Retry-After": str(self.settings.retry_after)},
+            )
+            return
+
+        await asyncio.sleep(self.settings.latency)
+
+        if method == "chat.postMessage":
+            if not channel or "text" not in body:
+                self.stats.errors += 1
+                await write_json(writer, 200, {"ok": False, "error": "invalid_arguments"})
+                return
+            self._ts_counter += 1
+            ts = f"{int(time.time())}.{self._ts_counter:06d}"
+            self.messages.setdefault(channel, {})[ts] = body["text"]
+            self.stats.posts += 1
+            await write_json(writer, 200, {"ok": True, "channel": channel, "ts": ts})
+        elif method == "chat.update":
+            messages = self.messages.get(channel, {})
+            if body.get("ts") not in messages:
+                self.stats.errors += 1
+                await write_json(writer, 200, {"ok": False, "error": "message_not_found"})
+                return
+            messages[body["ts"]] = body.get("text", "")
+            self.stats.updates += 1
+            await write_json(writer, 200, {"ok": True, "channel": channel, "ts": body["ts"]})
+        else:
+            await write_json(writer, 200, {"ok": False, "error": "unknown_method"})
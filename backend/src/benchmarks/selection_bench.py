@@ -0,0 +1,146 @@
+from __future__ import annotations
+import asyncio
+import random
+import statistics
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from llm import (
+    AdaptiveRateLimiter,
+    LLMClient,
+    ModelLatencyTracker,
+    ModelSelector,
+    StreamEventType,
+    close_client_pools,
+    prewarm_client_pool,
+)
+from .llm_bench import point_config_at
+from .mock_server import MockLLMServer, MockResponseSettings
+
+FAST_MODEL = "mock/fast"
+STRONG_MODEL = "mock/strong"
+
+POOL = {
+    FAST_MODEL: {"tier": "fast", "prompt_cost": 0.1, "completion_cost": 0.4, "context": 8000},
+    STRONG_MODEL: {"tier": "strong", "prompt_cost": 3.0, "completion_cost": 15.0, "context": 128000},
+}
+
+# (task, prompt tokens, share of requests)
+WORKLOAD = (
+    ("routing", 600, 0.4),
+    ("synthesis", 400, 0.2),
+    ("synthesis", 3000, 0.2),
+    ("summarization", 6000, 0.2),
+)
+
+@dataclass
+class SelectionResult:
+    scenario: str
+    mode: str
+    requests: int
+    errors: int
+    ttft_p50_ms: float
+    e2e_p50_ms: float
+    e2e_p95_ms: float
+    cost_usd: float
+    fast_share: float  # requests served by the fast model
+
+
+def _model_settings(degraded: bool) -> dict[str, MockResponseSettings]:
+    # Several tokens per chunk keep the mock and the client, sharing one process, off the CPU ceiling
+    return {
+        # A degraded fast model answers late, which only its rolling TTFT reveals
+        FAST_MODEL: MockResponseSettings(
+            ttft=1.0 if degraded else 0.03, tokens_per_second=400.0, chunk_tokens=8, completion_tokens=48
+        ),
+        STRONG_MODEL: MockResponseSettings(ttft=0.2, tokens_per_second=150.0, chunk_tokens=8, completion_tokens=48),
+    }
+
+
+def _requests(count: int, seed: int) -> list[tuple[str, int]]:
+    rng = random.Random(seed)
+    tasks = [(task, tokens) for task, tokens, _ in WORKLOAD]
+    weights = [share for _, _, share in WORKLOAD]
+    return rng.choices(tasks, weights, k=count)
+
+
+async def _request(
+    client: LLMClient,
+    index: int,
+    task: str,
+    prompt_tokens: int,
+    model: str | None,
+) -> tuple[float | None, float, bool]:
+    # Distinct prompts so single-flight never merges two of them
+    messages = [{"role": "user", "content": f"request {index} " + "word " * (prompt_tokens * 4 // 5)}]
+    ttft = None
+    failed = False
+    started = time.perf_counter()
+    async with aclosing(client.chat_completion(messages, True, model=model, task=task)) as events:
+        async for event in events:
+            if ttft is None and event.type == StreamEventType.TEXT_DELTA:
+                ttft = time.perf_counter() - started
+            elif event.type == StreamEventType.ERROR:
+                failed = True
+    return ttft, time.perf_counter() - started, failed
+
+
+async def _scenario(scenario: str, pinned: bool, requests: int, concurrency: int, seed: int) -> SelectionResult:
+    # A fresh tracker per run, so each one learns the models' latency from scratch
+    tracker = ModelLatencyTracker()
+    selector = ModelSelector(pool=POOL, tracker=tracker)
+    # Unthrottled, so the runs compare model choice rather than the shared request budget
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, initial_concurrency=concurrency)
+    client = LLMClient(limiter=limiter, model_stats=tracker, selector=selector)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int, task: str, prompt_tokens: int) -> tuple[float | None, float, bool]:
+        async with semaphore:
+            return await _request(client, index, task, prompt_tokens, STRONG_MODEL if pinned else None)
+
+    async with MockLLMServer(model_settings=_model_settings(scenario == "degraded"), seed=seed) as server:
+        point_config_at(server.url)
+        await prewarm_client_pool()
+        samples = await asyncio.gather(
+            *(limited(index, task, tokens) for index, (task, tokens) in enumerate(_requests(requests, seed)))
+        )
+        await client.close()
+        await close_client_pools()
+
+    decisions = selector.decisions()
+    ttfts = [sample[0] for sample in samples if sample[0] is not None]
+    e2e = sorted(sample[1] for sample in samples)
+    return SelectionResult(
+        scenario=scenario,
+        mode="pinned" if pinned else "selected",
+        requests=requests,
+        errors=sum(sample[2] for sample in samples),
+        ttft_p50_ms=statistics.median(ttfts) * 1000 if ttfts else 0.0,
+        e2e_p50_ms=statistics.median(e2e) * 1000,
+        e2e_p95_ms=e2e[min(len(e2e) - 1, int(len(e2e) * 0.95))] * 1000,
+        cost_usd=sum(decision.cost or 0.0 for decision in decisions),
+        fast_share=sum(decision.model == FAST_MODEL for decision in decisions) / len(decisions) if decisions else 0.0,
+    )
+
+
+async def run_selection_benchmark(requests: int = 400, concurrency: int = 16, seed: int = 0) -> list[SelectionResult]:
+    results = []
+    for scenario in ("normal", "degraded"):
+        for pinned in (True, False):
+            results.append(await _scenario(scenario, pinned, requests, concurrency, seed))
+    return results
+
+
+def format_selection_results(results: list[SelectionResult]) -> list[str]:
+    lines = [
+        f"{'scenario':<9} {'mode':<9} {'reqs':>5} {'errors':>6} {'ttft p50':>9} "
+        f"{'e2e p50':>9} {'e2e p95':>9} {'cost $':>9} {'fast':>5}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.scenario:<9} {result.mode:<9} {result.requests:>5} {result.errors:>6} "
+            f"{result.ttft_p50_ms:>9.1f} {result.e2e_p50_ms:>9.1f} {result.e2e_p95_ms:>9.1f} "
+            f"{result.cost_usd:>9.4f} {result.fast_share:>5.0%}"
+        )
+    lines.append(f"pinned: every request on {STRONG_MODEL}; selected: picked per request from {', '.join(POOL)}")
+    return lines
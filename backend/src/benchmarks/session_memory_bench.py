@@ -0,0 +1,132 @@
+from __future__ import annotations
+import gc
+import random
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable
+from config import config
+from context import MessageItem, MessageLog, StringPool
+
+@dataclass
+class SessionMemoryResult:
+    mode: str
+    sessions: int
+    messages: int
+    bytes_per_session: float
+    bytes_per_message: float
+    build_ms: float
+    rebuild_us: float  # building one session's wire list from its storage, as the next turn would
+
+
+_WORDS = ("event", "venue", "schedule", "guest", "catering", "budget", "stage", "ticket", "sponsor", "vendor")
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(_WORDS) + str(rng.randrange(1000)) for _ in range(words))
+
+
+def _histories(sessions: int, messages: int, shared_ratio: float, seed: int) -> list[list[tuple[str, str, int]]]:
+    rng = random.Random(seed)
+    # Templated questions and broadcast answers every session sees, next to text of its own
+    questions = [_text(rng, 20) for _ in range(50)]
+    answers = [_text(rng, 300) for _ in range(10)]
+    histories = []
+    for _ in range(sessions):
+        history = []
+        for index in range(messages):
+            role = "user" if index % 2 == 0 else "assistant"
+            if rng.random() < shared_ratio:
+                text = rng.choice(questions if role == "user" else answers)
+            else:
+                text = _text(rng, 20 if role == "user" else 200)
+            history.append((role, text, len(text) // 4))
+        histories.append(history)
+    return histories
+
+
+def _copy(text: str) -> str:
+    # A fresh object with equal content, as separate responses and requests produce
+    return "".join([text[:1], text[1:]])
+
+
+def _legacy(histories: list[list[tuple[str, str, int]]]) -> list[Any]:
+    # What a resident session held before: a MessageItem per message and its cached wire dict
+    sessions = []
+    for history in histories:
+        items = [MessageItem(role, _copy(text), tokens) for role, text, tokens in history]
+        sessions.append((items, [item.to_dict() for item in items]))
+    return sessions
+
+
+def _columns(histories: list[list[tuple[str, str, int]]], compress: bool) -> list[Any]:
+    pool = StringPool()
+    sessions = [pool]
+    for history in histories:
+        log = MessageLog(pool)
+        for role, text, tokens in history:
+            log.append(MessageItem(role, _copy(text), tokens))
+        # Parked: an idle session keeps no wire list
+        if compress:
+            log.compress()
+        sessions.append(log)
+    return sessions
+
+
+def _measure(build: Callable[[], list[Any]]) -> tuple[list[Any], int, float]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    built = build()
+    elapsed = time.perf_counter() - started
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, size, elapsed
+
+
+def _timed_us(build_wire: Callable[[Any], Any], sessions: list[Any], samples: int = 200) -> float:
+    sample = sessions[:samples]
+    # Collections over hundreds of thousands of live objects would otherwise dominate
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for session in sample:
+            build_wire(session)
+        return (time.perf_counter() - started) / len(sample) * 1e6
+    finally:
+        gc.enable()
+
+
+def run_session_memory_benchmark(
+    sessions: int = 10_000,
+    messages: int = 20,
+    shared_ratio: float = 0.3,
+    seed: int = 0,
+) -> list[SessionMemoryResult]:
+    histories = _histories(sessions, messages, shared_ratio, seed)
+    total = sessions * messages
+    results = []
+
+    built, size, elapsed = _measure(lambda: _legacy(histories))
+    rebuild = _timed_us(lambda session: [item.to_dict() for item in session[0]], built)
+    results.append(SessionMemoryResult("legacy", sessions, messages, size / sessions, size / total, elapsed * 1000, rebuild))
+    del built
+
+    for mode, compress in (("columns", False), ("compressed", True)):
+        built, size, elapsed = _measure(lambda: _columns(histories, compress))
+        rebuild = _timed_us(lambda log: [log.wire(index) for index in range(len(log))], built[1:])
+        results.append(SessionMemoryResult(mode, sessions, messages, size / sessions, size / total, elapsed * 1000, rebuild))
+        del built
+    return results
+
+
+def format_session_memory_results(results: list[SessionMemoryResult]) -> list[str]:
+    lines = [
+        f"{'mode':<11} {'sessions':>8} {'msgs':>5} {'bytes/session':>14} {'bytes/msg':>10} {'build ms':>9} {'rebuild us':>11}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.mode:<11} {result.sessions:>8} {result.messages:>5} {result.bytes_per_session:>14.0f} "
+            f"{result.bytes_per_message:>10.1f} {result.build_ms:>9.1f} {result.rebuild_us:>11.1f}"
+        )
+    lines.append(f"compression: level {config.CONTEXT_COMPRESSION_LEVEL}, bodies of {config.CONTEXT_COMPRESS_MIN_CHARS}+ chars")
+    return lines
@@ -0,0 +1,129 @@
+from __future__ import annotations
+import asyncio
+import statistics
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
+from config import config
+from llm import LLMClient, StreamEventType, close_client_pools, get_single_flight, prewarm_client_pool
+from .llm_bench import point_config_at
+from .mock_server import MockLLMServer, MockResponseSettings
+
+@dataclass
+class SingleFlightResult:
+    scenario: str
+    mode: str
+    requests: int
+    upstream_streams: int
+    completion_tokens: int
+    ttft_p50_ms: float
+    e2e_p50_ms: float
+    complete: int  # requests that read their whole response
+    correct: bool  # every complete response matched what one upstream stream produces
+
+
+async def _request(prompt: str, start_after: float, stop_after: int | None) -> tuple[float, float, str, bool]:
+    await asyncio.sleep(start_after)
+    client = LLMClient()
+    parts: list[str] = []
+    ttft = 0.0
+    finished = False
+    started = time.perf_counter()
+    try:
+        async with aclosing(client.chat_completion([{"role": "user", "content": prompt}], True)) as events:
+            async for event in events:
+                if event.type == StreamEventType.TEXT_DELTA and event.text_delta:
+                    if not parts:
+                        ttft = time.perf_counter() - started
+                    parts.append(event.text_delta.content)
+                    if stop_after is not None and len(parts) >= stop_after:
+                        break
+                elif event.type == StreamEventType.MESSAGE_COMPLETE:
+                    finished = True
+    finally:
+        await client.close()
+    return ttft, time.perf_counter() - started, "".join(parts), finished
+
+
+async def _scenario(
+    scenario: str,
+    shared: bool,
+    requests: int,
+    settings: MockResponseSettings,
+    stagger: float,
+    cancel_every: int,
+) -> SingleFlightResult:
+    config.SINGLE_FLIGHT_ENABLED = shared
+    async with MockLLMServer(settings) as server:
+        point_config_at(server.url)
+        await prewarm_client_pool()
+        generation = settings.completion_tokens / settings.tokens_per_second if settings.tokens_per_second else 0.0
+        samples = await asyncio.gather(
+            *(
+                _request(
+                    "Summarize today's announcement",
+                    # Late joiners arrive spread over the first half of the generation
+                    stagger * generation * index / requests,
+                    # Some subscribers walk away partway through; the rest must be unaffected
+                    settings.completion_tokens // 4 if cancel_every and index % cancel_every == 1 else None,
+                )
+                for index in range(requests)
+            )
+        )
+        await close_client_pools()
+
+    expected = settings.token_text * settings.completion_tokens
+    complete = [sample for sample in samples if sample[3]]
+    return SingleFlightResult(
+        scenario=scenario,
+        mode="shared" if shared else "separate",
+        requests=requests,
+        upstream_streams=server.stats.streams,
+        completion_tokens=server.stats.completion_tokens,
+        ttft_p50_ms=statistics.median(sample[0] for sample in samples) * 1000,
+        e2e_p50_ms=statistics.median(sample[1] for sample in samples) * 1000,
+        complete=len(complete),
+        correct=all(sample[2] == expected for sample in complete),
+    )
+
+
+async def run_single_flight_benchmark(
+    requests: int = 100,
+    completion_tokens: int = 200,
+    tokens_per_second: float = 200.0,
+) -> list[SingleFlightResult]:
+    settings = MockResponseSettings(ttft=0.05, tokens_per_second=tokens_per_second, completion_tokens=completion_tokens)
+    enabled = config.SINGLE_FLIGHT_ENABLED
+    cache_enabled = config.RESPONSE_CACHE_ENABLED
+    # Measures sharing of in-flight streams only, not replays of finished ones
+    config.RESPONSE_CACHE_ENABLED = False
+    results = []
+    try:
+        for scenario, stagger, cancel_every in (("burst", 0.0, 0), ("late", 0.5, 0), ("cancel", 0.0, 2)):
+            for shared in (False, True):
+                results.append(await _scenario(scenario, shared, requests, settings, stagger, cancel_every))
+    finally:
+        config.SINGLE_FLIGHT_ENABLED = enabled
+        config.RESPONSE_CACHE_ENABLED = cache_enabled
+    return results
+
+
+def format_single_flight_results(results: list[SingleFlightResult]) -> list[str]:
+    lines = [
+        f"{'scenario':<8} {'mode':<9} {'reqs':>5} {'streams':>7} {'tokens':>7} "
+        f"{'ttft p50':>9} {'e2e p50':>9} {'complete':>8} {'correct':>7}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.scenario:<8} {result.mode:<9} {result.requests:>5} {result.upstream_streams:>7} "
+            f"{result.completion_tokens:>7} {result.ttft_p50_ms:>9.1f} {result.e2e_p50_ms:>9.1f} "
+            f"{result.complete:>8} {str(result.correct):>7}"
+        )
+    flights = get_single_flight()
+    if flights:
+        stats = flights.stats()
+        lines.append(
+            f"single-flight: started={stats.started} joined={stats.joined} caught_up={stats.caught_up} "
+            f"overflows={stats.overflows} abandoned={stats.abandoned}"
+        )
+    return lines
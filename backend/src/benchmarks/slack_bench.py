@@ -0,0 +1,117 @@
+from __future__ import annotations
+import asyncio
+import time
+from dataclasses import dataclass
+from tools.slack import SlackClient, SlackMessage
+from .mock_slack import MockSlackServer, MockSlackSettings
+
+@dataclass
+class SlackBenchmarkResult:
+    scenario: str
+    mode: str
+    calls: int
+    delivered: int
+    failed: int
+    elapsed: float
+    rate_limited: int
+    retries: int
+    correct: bool
+
+    @property
+    def per_second(self) -> float:
+        return self.delivered / self.elapsed if self.elapsed else 0.0
+
+
+def _client(server: MockSlackServer, limited: bool) -> SlackClient:
+    # Unlimited mode is what calling the API directly looks like: only Retry-After slows it down
+    return SlackClient(
+        token=server.settings.token,
+        base_url=server.url,
+        channel_messages_per_second=server.settings.channel_messages_per_second if limited else 0.0,
+        method_tiers=None if limited else {},
+    )
+
+
+async def bench_bulk(channels: int, messages: int, limited: bool, settings: MockSlackSettings) -> SlackBenchmarkResult:
+    names = [f"C{index:05d}" for index in range(channels)]
+    async with MockSlackServer(settings) as server:
+        client = _client(server, limited)
+        started = time.perf_counter()
+        rounds = await asyncio.gather(*(client.post_many(names, f"message {index}") for index in range(messages)))
+        elapsed = time.perf_counter() - started
+        await client.close()
+
+    results = [result for round_results in rounds for result in round_results]
+    delivered = sum(isinstance(result, SlackMessage) for result in results)
+    # Per-channel order is kept by each channel's queue when limited
+    correct = all(
+        list(server.messages.get(name, {}).values()) == [f"message {index}" for index in range(messages)]
+        for name in names
+    )
+    stats = client.stats()
+    return SlackBenchmarkResult(
+        "bulk", "limited" if limited else "unlimited", len(results), delivered, len(results) - delivered,
+        elapsed, server.stats.rate_limited, stats.retries, correct,
+    )
+
+
+async def bench_stream(
+    deltas: int,
+    tokens_per_second: float,
+    interval: float,
+    limited: bool,
+    settings: MockSlackSettings,
+) -> SlackBenchmarkResult:
+    async with MockSlackServer(settings) as server:
+        client = _client(server, limited)
+        pieces = [f" tok{index}" for index in range(deltas)]
+        failed = 0
+        started = time.perf_counter()
+        stream = client.stream("C-stream", interval=interval if limited else 0.0)
+        try:
+            async with stream:
+                for piece in pieces:
+                    stream.write(piece)
+                    await asyncio.sleep(1 / tokens_per_second)
+        except Exception:
+            failed = 1
+        elapsed = time.perf_counter() - started
+        await client.close()
+
+    stats = client.stats()
+    posted = "".join(server.messages.get("C-stream", {}).values())
+    return SlackBenchmarkResult(
+        "stream", "throttled" if limited else "unthrottled", stats.posted + stats.updated, stats.posted + stats.updated,
+        failed, elapsed, server.stats.rate_limited, stats.retries, posted == "".join(pieces),
+    )
+
+
+async def run_slack_benchmark(
+    channels: int = 50,
+    messages: int = 3,
+    deltas: int = 1000,
+    tokens_per_second: float = 200.0,
+    interval: float = 1.5,
+    latency: float = 0.02,
+) -> list[SlackBenchmarkResult]:
+    settings = MockSlackSettings(latency=latency)
+    results = []
+    for limited in (False, True):
+        results.append(await bench_bulk(channels, messages, limited, settings))
+    for limited in (False, True):
+        results.append(await bench_stream(deltas, tokens_per_second, interval, limited, settings))
+    return results
+
+
+def format_slack_results(results: list[SlackBenchmarkResult]) -> list[str]:
+    lines = [
+        f"{'scenario':<8} {'mode':<10} {'calls':>6} {'ok':>6} {'failed':>6} {'secs':>7} "
+        f"{'ok/s':>7} {'429s':>5} {'retries':>7} {'correct':>7}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result.scenario:<8} {result.mode:<10} {result.calls:>6} {result.delivered:>6} {result.failed:>6} "
+            f"{result.elapsed:>7.2f} {result.per_second:>7.1f} {result.rate_limited:>5} {result.retries:>7} "
+            f"{str(result.correct):>7}"
+        )
+    return lines
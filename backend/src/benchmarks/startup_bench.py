@@ -0,0 +1,111 @@
+from __future__ import annotations
+import asyncio
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from .mock_server import MockLLMServer, MockResponseSettings
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@dataclass
+class StartupResult:
+    metric: str
+    runs: int
+    p50_ms: float
+    min_ms: float
+    max_ms: float
+
+
+_IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import {module}
+print((time.perf_counter() - started) * 1000)
+"""
+
+_TOKENIZER_SCRIPT = """
+import time
+from config import config
+from utils import count_tokens
+started = time.perf_counter()
+count_tokens("How many tokens is this?", config.DEFAULT_AI_MODEL)
+print((time.perf_counter() - started) * 1000)
+"""
+
+_FIRST_TOKEN_SCRIPT = """
+import asyncio, sys
+from config import config
+config.BASE_URL = sys.argv[1]
+config.OPENROUTER_API_KEY = "mock-key"
+from agents import AgentEventType, BaseAgent
+
+async def main():
+    if sys.argv[2] == "warm":
+        from main import warm_up
+        await warm_up()
+    async with BaseAgent() as agent:
+        async for event in agent.run("Hello"):
+            if event.type == AgentEventType.TEXT_DELTA:
+                print("first", flush=True)
+                return
+
+asyncio.run(main())
+"""
+
+async def _spawn(script: str, *args: str) -> asyncio.subprocess.Process:
+    return await asyncio.create_subprocess_exec(
+        sys.executable, "-c", script, *args,
+        cwd=SRC_DIR,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+
+
+async def _reported_ms(script: str) -> float:
+    process = await _spawn(script)
+    stdout, _ = await process.communicate()
+    return float(stdout.decode().strip().splitlines()[-1])
+
+
+async def _first_token_ms(url: str, mode: str) -> float:
+    # Measured from spawn, so interpreter start, imports and warm-up all count
+    started = time.perf_counter()
+    process = await _spawn(_FIRST_TOKEN_SCRIPT, url, mode)
+    await process.stdout.readline()
+    elapsed = (time.perf_counter() - started) * 1000
+    await process.wait()
+    return elapsed
+
+
+def _summarize(metric: str, samples: list[float]) -> StartupResult:
+    return StartupResult(metric, len(samples), statistics.median(samples), min(samples), max(samples))
+
+
+async def run_startup_benchmark(
+    runs: int = 5,
+    modules: tuple[str, ...] = ("agents", "llm", "context", "api", "main"),
+) -> list[StartupResult]:
+    results = []
+    for module in modules:
+        samples = [await _reported_ms(_IMPORT_SCRIPT.format(module=module)) for _ in range(runs)]
+        results.append(_summarize(f"import {module}", samples))
+
+    samples = [await _reported_ms(_TOKENIZER_SCRIPT) for _ in range(runs)]
+    results.append(_summarize("first count_tokens", samples))
+
+    async with MockLLMServer(MockResponseSettings(ttft=0.0, tokens_per_second=0)) as server:
+        for mode in ("cold", "warm"):
+            samples = [await _first_token_ms(server.url, mode) for _ in range(runs)]
+            results.append(_summarize(f"first token ({mode})", samples))
+    return results
+
+
+def format_startup_results(results: list[StartupResult]) -> list[str]:
+    lines = [f"{'metric':<22} {'runs':>5} {'p50 ms':>9} {'min ms':>9} {'max ms':>9}"]
+    for result in results:
+        lines.append(
+            f"{result.metric:<22} {result.runs:>5} {result.p50_ms:>9.1f} {result.min_ms:>9.1f} {result.max_ms:>9.1f}"
+        )
+    return lines
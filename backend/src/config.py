@@ -11,6 +11,161 @@ class Config:
     MAX_RETRIES = 3
     DEFAULT_PROMPT = "Hello, tell me a short joke."
 
+    # shared http client pool
+    HTTP_MAX_CONNECTIONS = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+    HTTP_KEEPALIVE_EXPIRY = 30.0  # seconds an idle connection stays open
+    HTTP_POOL_TIMEOUT = 10.0  # seconds to wait for a free connection
+    HTTP_TIMEOUT = 600.0
+    HTTP2_ENABLED = True
+    HTTP_PREWARM_CONNECTIONS = 2
+
+    # token counting
+    TOKEN_COUNT_CACHE_SIZE = 4096
+    TOKEN_COUNT_CACHE_MAX_CHARS = 2048  # longer texts are counted without memoizing
+    TOKEN_COUNT_INLINE_MAX_CHARS = 4096  # longer texts are counted on a worker thread, off the event loop
+    TOKEN_COUNT_WORKERS = min(4, os.cpu_count() or 1)  # tiktoken releases the GIL, so threads run in parallel
+    TOKENIZER_ENCODING_FILE: str | None = os.getenv("TOKENIZER_ENCODING_FILE")  # local .tiktoken file for offline starts
+
+    # context window
+    DEFAULT_CONTEXT_BUDGET = 16000  # prompt tokens sent per request
+    MODEL_CONTEXT_BUDGETS = {
+        "liquid/lfm-2.5-1.2b-thinking:free": 24000,
+    }
+    COMPACTION_TRIGGER_RATIO = 0.75  # compact once history exceeds this share of the budget
+    COMPACTION_KEEP_RATIO = 0.4  # share of the budget kept verbatim after compaction
+    CONTEXT_WINDOW_SLACK_RATIO = 0.2  # extra history dropped when truncating so the sent prefix stays stable
+
+    # response cache (opt-in)
+    RESPONSE_CACHE_ENABLED = False
+    RESPONSE_CACHE_MAX_ENTRIES = 1024
+    RESPONSE_CACHE_TTL = 3600.0  # seconds
+    RESPONSE_CACHE_PATH: str | None = None  # sqlite file for the on-disk tier
+
+    # single-flight
+    SINGLE_FLIGHT_ENABLED = True  # concurrent identical requests share one upstream stream
+    SINGLE_FLIGHT_BUFFER = 256  # events queued per subscriber before it falls back to replaying the prefix
+
+    # agent streaming
+    DELTA_COALESCE_WINDOW = 0.02  # seconds a text batch may wait before it is flushed; 0 disables
+    DELTA_COALESCE_MAX_BYTES = 1024  # flush once a batch reaches this size; 0 disables
+
+    # http server
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = 8000
+    SERVER_WORKERS = 1  # worker processes sharing the listening socket
+    SERVER_MAX_CONCURRENT_SESSIONS = 64  # agent runs streaming at once per worker
+    SERVER_MAX_QUEUED_REQUESTS = 256  # runs waiting for a slot before new ones get a 503
+
+    # session store
+    SESSION_STORE_PATH = "nexus_sessions.db"
+    SESSION_MAX_RESIDENT = 1000  # sessions kept in memory before LRU eviction
+    SESSION_IDLE_TTL = 900.0  # seconds before an idle session is evicted from memory
+    SESSION_LEASE_TTL = 600.0  # seconds a turn's hold on a session outlives a worker that died mid-turn
+    SESSION_LEASE_POLL_INTERVAL = 0.05  # seconds between checks while another worker runs the session's turn
+
+    # session memory
+    STRING_POOL_MAX_ENTRIES = 8192  # distinct message bodies shared between sessions; 0 disables interning
+    STRING_POOL_MAX_CHARS = 4096  # longer bodies are never pooled
+    CONTEXT_MAX_MESSAGES = 10_000  # resident messages per session; older ones remain only in the session store
+    CONTEXT_COMPRESSION_ENABLED = False  # zlib long message bodies while a session sits idle
+    CONTEXT_COMPRESS_MIN_CHARS = 512
+    CONTEXT_COMPRESSION_LEVEL = 1
+
+    # subagent execution
+    SUBAGENT_MAX_CONCURRENCY = 8  # subagent invocations running at once per process, across all fan-outs
+    SUBAGENT_DEFAULT_DEADLINE = 60.0  # seconds before an invocation is cancelled
+    FAST_ROUTER_ENABLED = True  # route obvious requests to a subagent without an LLM call
+    FAST_ROUTER_MIN_SCORE = 0.35  # cosine similarity the best subagent needs
+    FAST_ROUTER_MIN_MARGIN = 0.15  # lead over the runner-up needed to skip the LLM
+
+    # agent loop
+    AGENT_MAX_TURNS = 8  # model calls per run; the last is made with tools disabled so it has to answer
+    AGENT_TOKEN_BUDGET = 200_000  # total tokens one run may spend across its model calls; 0 disables
+
+    # rate limiting
+    RATE_LIMIT_REQUESTS_PER_MINUTE = 0  # request budget until headers report the key's real one; 0 leaves it unmetered until then
+    RATE_LIMIT_TOKENS_PER_MINUTE = 0  # starting token budget until headers report the real one; 0 disables
+    RATE_LIMIT_BURST_SECONDS = 10.0  # how much of the per-minute budget may be spent at once
+    RATE_LIMIT_INITIAL_CONCURRENCY = 16  # requests awaiting response headers per process before AIMD adjusts it; open streams don't count
+    RATE_LIMIT_MIN_CONCURRENCY = 1
+    RATE_LIMIT_MAX_CONCURRENCY = 256
+    RATE_LIMIT_DECREASE_FACTOR = 0.5  # concurrency multiplier applied on a 429
+    RATE_LIMIT_DECREASE_COOLDOWN = 1.0  # seconds; a burst of 429s only halves concurrency once
+    RETRY_BASE_DELAY = 0.5  # seconds; full-jitter backoff when no Retry-After is given
+    RETRY_MAX_DELAY = 30.0
+
+    # circuit breaker
+    CIRCUIT_FAILURE_THRESHOLD = 5  # consecutive provider failures before failing fast
+    CIRCUIT_RESET_TIMEOUT = 30.0  # seconds before a single probe request is let through
+
+    # hedging and fallback
+    LLM_FALLBACK_MODELS: list[str] = []  # tried in order when a model fails before its first token
+    LLM_HEDGING_ENABLED = False
+    LLM_HEDGE_MODELS: list[str] = []  # secondary models raced against a slow first token
+    LLM_HEDGE_TTFT_QUANTILE = 0.95  # hedge once a request is slower than this share of recent ones
+    LLM_HEDGE_DEFAULT_DELAY = 3.0  # seconds, used until a model has enough TTFT samples
+    LLM_HEDGE_MIN_DELAY = 0.25
+    LLM_HEDGE_MAX_DELAY = 10.0
+    LLM_HEDGE_MIN_SAMPLES = 20
+    LLM_TTFT_WINDOW = 256  # recent TTFT samples kept per model
+    LLM_REQUEST_DEADLINE = 0.0  # seconds a model call may run before its stream is cut off; 0 disables
+
+    # model selection
+    # Models a request may be routed to, e.g.
+    # {"vendor/small": {"tier": "fast", "prompt_cost": 0.1, "completion_cost": 0.4, "context": 32000}};
+    # costs are USD per million tokens. Empty sends every request to DEFAULT_AI_MODEL.
+    LLM_MODEL_POOL: dict[str, dict[str, str | float]] = {}
+    # Per task class, rows tried in order: the first whose max_prompt_tokens fits (None fits any)
+    # names the tiers to choose from and how long a response to expect
+    LLM_SELECTION_POLICY: dict[str, list[dict[str, object]]] = {
+        "routing": [
+            {"max_prompt_tokens": None, "tiers": ["fast", "strong"], "completion_tokens": 64},
+        ],
+        "synthesis": [
+            {"max_prompt_tokens": 1000, "tiers": ["fast", "strong"], "completion_tokens": 400},
+            {"max_prompt_tokens": None, "tiers": ["strong"], "completion_tokens": 400},
+        ],
+        "summarization": [
+            {"max_prompt_tokens": None, "tiers": ["fast"], "completion_tokens": 300},
+        ],
+    }
+    LLM_SELECTION_COST_WEIGHT = 100.0  # seconds of expected latency one dollar of expected cost is worth
+    LLM_SELECTION_ERROR_PENALTY = 4.0  # expected latency multiplier per unit of recent error rate
+    LLM_SELECTION_MAX_ERROR_RATE = 0.5  # candidates failing more often are ranked last while any other remains
+    LLM_SELECTION_MIN_SAMPLES = 5  # below this, a model is scored on the defaults so it gets tried
+    LLM_SELECTION_DEFAULT_TTFT = 1.0  # seconds
+    LLM_SELECTION_DEFAULT_TOKENS_PER_SECOND = 50.0
+    LLM_SELECTION_LOG_SIZE = 1000  # recent decisions kept with their outcomes
+
+    # instrumentation
+    METRICS_ENABLED = True  # when off, requests skip all timing and aggregation
+
+    # batch runs
+    BATCH_CONCURRENCY = 8  # prompts running through BaseAgent at once
+    BATCH_PROGRESS_INTERVAL = 100  # completed items between progress lines
+
+    # slack
+    SLACK_BOT_TOKEN: str | None = os.getenv("SLACK_BOT_TOKEN")
+    SLACK_API_URL = "https://slack.com/api"
+    SLACK_MAX_CONNECTIONS = 16
+    SLACK_TIMEOUT = 10.0
+    SLACK_MAX_RETRIES = 3  # attempts after a 429 or 5xx before the call fails
+    SLACK_CHANNEL_MESSAGES_PER_SECOND = 1.0  # Slack's chat.postMessage limit per channel; 0 disables
+    SLACK_CHANNEL_QUEUE_SIZE = 1000  # pending calls per channel before callers wait
+    SLACK_CHANNEL_IDLE_TIMEOUT = 60.0  # seconds before an idle channel's sender exits
+    SLACK_TIER_LIMITS = {1: 1, 2: 20, 3: 50, 4: 100}  # calls per minute per method and workspace
+    SLACK_METHOD_TIERS = {
+        "chat.update": 3,
+        "chat.delete": 3,
+        "chat.getPermalink": 4,
+        "conversations.info": 3,
+        "conversations.list": 2,
+        "users.info": 4,
+    }
+    SLACK_UPDATE_INTERVAL = 1.5  # seconds between chat.update edits of one streamed message
+    SLACK_MAX_MESSAGE_CHARS = 3900  # streamed output continues in a new message past this
+
 
     
 config = Config()
\ No newline at end of file
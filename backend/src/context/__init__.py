@@ -1,3 +1,20 @@
 from .context_manager import ContextManager
+from .compaction import ContextStats
+from .message_item import MessageItem, JournalEntry
+from .message_log import MessageLog, StringPool, StringPoolStats, get_string_pool
+from .session_store import SessionStore, SessionStoreStats, SqliteSessionBackend, StoredSession
 
-__all__ = ["ContextManager"]
+__all__ = [
+    "ContextManager",
+    "ContextStats",
+    "MessageItem",
+    "JournalEntry",
+    "MessageLog",
+    "StringPool",
+    "StringPoolStats",
+    "get_string_pool",
+    "SessionStore",
+    "SessionStoreStats",
+    "SqliteSessionBackend",
+    "StoredSession",
+]
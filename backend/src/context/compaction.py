@@ -0,0 +1,59 @@
+from __future__ import annotations
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from llm import StreamEventType
+from prompts import get_compaction_prompt
+from .message_item import MessageItem
+
+if TYPE_CHECKING:
+    from llm import LLMClient
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+@dataclass
+class ContextStats:
+    requests: int = 0
+    tokens_sent: int = 0
+    tokens_saved: int = 0
+    truncated_messages: int = 0  # left out of the last window sent
+    compactions: int = 0
+    compacted_messages: int = 0
+    compaction_failures: int = 0
+    trimmed_messages: int = 0  # dropped from memory past CONTEXT_MAX_MESSAGES
+    compressed_messages: int = 0
+
+
+def _format_transcript(items: list[MessageItem], previous_summary: MessageItem | None) -> str:
+    parts = []
+    if previous_summary:
+        parts.append(f"Previous summary:\n{previous_summary.content.removeprefix(SUMMARY_PREFIX)}")
+
+    parts.append("New messages:")
+    for item in items:
+        content = item.content
+        for call in item.tool_calls or []:
+            content += f"\n[called {call['function']['name']}({call['function']['arguments']})]"
+        parts.append(f"{item.role.capitalize()}: {content}")
+    return "\n\n".join(parts)
+
+
+async def summarize_messages(
+    client: LLMClient,
+    items: list[MessageItem],
+    previous_summary: MessageItem | None = None,
+) -> str | None:
+    messages = [
+        {"role": "system", "content": get_compaction_prompt()},
+        {"role": "user", "content": _format_transcript(items, previous_summary)},
+    ]
+
+    # Returning mid-iteration leaves the stream open; aclosing runs its cleanup right away
+    async with aclosing(client.chat_completion(messages, False, task="summarization")) as events:
+        async for event in events:
+            if event.type == StreamEventType.MESSAGE_COMPLETE and event.text_delta:
+                return SUMMARY_PREFIX + event.text_delta.content
+            if event.type == StreamEventType.ERROR:
+                return None
+
+    return None
@@ -1,44 +1,319 @@
 from __future__ import annotations
-from prompts import get_system_prompt
-from .message_item import MessageItem
+import asyncio
+from prompts import get_shared_system_prompt
+from .message_item import JournalEntry, MessageItem
+from .message_log import MessageLog
+from .compaction import ContextStats, summarize_messages
 from config import config
-from typing import Any, List
-from utils import count_tokens
+from typing import Any, Iterable, List
+from llm import LLMClient, ToolCall
+from utils import count_tokens, count_tokens_async, count_tokens_batch, count_tokens_batch_async
 
 class ContextManager:
     def __init__(self) -> None:
-        self._system_prompt = get_system_prompt()
         self._model_name = config.DEFAULT_AI_MODEL
-        self._messages: List[MessageItem] = []
+        # Rendered and counted once per registry version, then shared by every session
+        self._system_prompt = get_shared_system_prompt(self._model_name)
+        self._messages = MessageLog()
+        self._summary: MessageItem | None = None
+        self._system_prompt_tokens = self._system_prompt.token_count
+        # Running total including the system prompt, kept current on every append
+        self._total_tokens = self._system_prompt_tokens
+        # What the total would be without compaction, used to report tokens saved
+        self._uncompacted_tokens = self._system_prompt_tokens
+        self._context_budget = config.MODEL_CONTEXT_BUDGETS.get(self._model_name, config.DEFAULT_CONTEXT_BUDGET)
+        self._compaction_task: asyncio.Task | None = None
+        # Messages trimmed since the running compaction took its prefix
+        self._trimmed_while_compacting = 0
+        # Oldest message index sent; only moves forward so consecutive requests share a prefix
+        self._window_floor = 0
+        # Wire form of the last window sent, see get_messages
+        self._wire: List[dict[str, Any]] | None = None
+        self._wire_start = 0
+        self._wire_end = 0
+        self._wire_summary: MessageItem | None = None
+        self._wire_tokens = 0
+        # Index the next appended message gets within the whole session
+        self._next_seq = 0
+        # Appends and compactions not yet handed to a session store
+        self._journal: List[JournalEntry] = []
+        self.stats = ContextStats()
+
+    @property
+    def token_count(self) -> int:
+        return self._total_tokens
+
+    @property
+    def system_prompt_tokens(self) -> int:
+        return self._system_prompt_tokens
+
+    @property
+    def prompt_tokens(self) -> int:
+        # Tokens in the list the last get_messages returned
+        return self._wire_tokens
+
+    @property
+    def has_history(self) -> bool:
+        # Anything said earlier in the session, kept verbatim or only in the summary
+        return len(self._messages) > 0 or self._summary is not None
+
+    @property
+    def context_budget(self) -> int:
+        return self._context_budget
 
     def add_user_message(self, content: str) -> None:
-        item = MessageItem(
-            role="user",
-            content=content,
-            token_count=count_tokens(content, self._model_name)
+        self._append(
+            MessageItem(
+                role="user",
+                content=content,
+                token_count=count_tokens(content, self._model_name)
+            )
         )
-        self._messages.append(item)
 
     def add_assistant_message(self, content: str) -> None:
-        item = MessageItem(
-            role="assistant",
-            content=content,
-            token_count=count_tokens(content, self._model_name)
+        self._append(
+            MessageItem(
+                role="assistant",
+                content=content,
+                token_count=count_tokens(content, self._model_name)
+            )
+        )
+
+    # Async variants count long messages on a worker thread; the agent loop uses these so
+    # a pasted document doesn't stall other sessions' streams while it is tokenized
+    async def add_user_message_async(self, content: str) -> None:
+        self._append(
+            MessageItem(
+                role="user",
+                content=content,
+                token_count=await count_tokens_async(content, self._model_name)
+            )
         )
+
+    async def add_assistant_message_async(self, content: str) -> None:
+        self._append(
+            MessageItem(
+                role="assistant",
+                content=content,
+                token_count=await count_tokens_async(content, self._model_name)
+            )
+        )
+
+    async def add_tool_calls_async(self, content: str, calls: list[ToolCall]) -> None:
+        counted = content + "".join(call.name + call.arguments for call in calls)
+        self._append(
+            MessageItem(
+                role="assistant",
+                content=content,
+                token_count=await count_tokens_async(counted, self._model_name),
+                tool_calls=[call.to_dict() for call in calls],
+            )
+        )
+
+    async def add_tool_result_async(self, call_id: str, content: str) -> None:
+        self._append(
+            MessageItem(
+                role="tool",
+                content=content,
+                token_count=await count_tokens_async(content, self._model_name),
+                tool_call_id=call_id,
+            )
+        )
+
+    async def restore_session_async(
+        self,
+        items: Iterable[MessageItem],
+        summary: MessageItem | None = None,
+        first_seq: int = 0,
+    ) -> None:
+        items = list(items)
+        uncounted = [item for item in items if item.token_count is None]
+        if uncounted:
+            counts = await count_tokens_batch_async([item.content for item in uncounted], self._model_name)
+            for item, token_count in zip(uncounted, counts):
+                item.token_count = token_count
+        self.restore_session(items, summary, first_seq)
+
+    def restore_session(
+        self,
+        items: Iterable[MessageItem],
+        summary: MessageItem | None = None,
+        first_seq: int = 0,
+    ) -> None:
+        self._next_seq = first_seq
+        if summary:
+            self._summary = summary
+            self._total_tokens += summary.token_count or 0
+            self._uncompacted_tokens += summary.token_count or 0
+        self.restore_messages(items)
+
+    def restore_messages(self, items: Iterable[MessageItem]) -> None:
+        items = list(items)
+
+        # Count everything that arrives without a stored count in one batch
+        uncounted = [item for item in items if item.token_count is None]
+        if uncounted:
+            counts = count_tokens_batch([item.content for item in uncounted], self._model_name)
+            for item, token_count in zip(uncounted, counts):
+                item.token_count = token_count
+
+        for item in items:
+            self._append(item, journal=False)
+
+    def take_journal(self) -> List[JournalEntry]:
+        journal, self._journal = self._journal, []
+        return journal
+
+    def _append(self, item: MessageItem, journal: bool = True) -> None:
+        if journal:
+            self._journal.append(JournalEntry("message", self._next_seq, item))
+        self._next_seq += 1
         self._messages.append(item)
+        self._total_tokens += item.token_count or 0
+        self._uncompacted_tokens += item.token_count or 0
+        if len(self._messages) > config.CONTEXT_MAX_MESSAGES:
+            self._trim(len(self._messages) - config.CONTEXT_MAX_MESSAGES)
+
+    def _trim(self, count: int) -> None:
+        # A running compaction removes its prefix by position when it lands, so it is told how
+        # much of that prefix is already gone
+        if self._compaction_task and not self._compaction_task.done():
+            self._trimmed_while_compacting += count
+        self._total_tokens -= self._messages.tokens(0, count)
+        self._messages.drop_prefix(count)
+        self._window_floor = max(0, self._window_floor - count)
+        self._wire = None
+        self.stats.trimmed_messages += count
+
+    def park(self) -> None:
+        # Called while the session sits idle: the wire list is rebuilt by the next
+        # get_messages, and long bodies can be compressed until then
+        self._wire = None
+        if config.CONTEXT_COMPRESSION_ENABLED:
+            self.stats.compressed_messages += self._messages.compress()
+
+    def _window_start(self, budget: int) -> int:
+        summary_tokens = (self._summary.token_count or 0) if self._summary else 0
+        if self._total_tokens - self._system_prompt_tokens - summary_tokens <= budget:
+            # The running total already says the whole history fits, so skip the walk
+            start = 0
+        else:
+            # Walk back from the newest message; the latest one is always sent
+            start = len(self._messages)
+            used = 0
+            for index in range(len(self._messages) - 1, -1, -1):
+                tokens = self._messages.token_count(index)
+                if used + tokens > budget and start < len(self._messages):
+                    break
+                used += tokens
+                start = index
+
+        # Don't open the window on an assistant reply whose question was cut off, or on tool
+        # results whose call was cut off (providers reject those outright)
+        while start < len(self._messages) - 1 and self._messages.role(start) in ("assistant", "tool"):
+            start += 1
+        return start
 
     def get_messages(self) -> List[dict[str, Any]]:
-        messages = []
-
-        if self._system_prompt:
-            messages.append(
-                {
-                    "role": "system",
-                    "content": self._system_prompt,
-                }
-            )
-        
-        for item in self._messages:
-            messages.append(item.to_dict())
+        # The wire list is kept and extended by later calls; callers get their own copy of it,
+        # so a list already handed to a request never changes underneath it
+        summary_tokens = (self._summary.token_count or 0) if self._summary else 0
+
+        budget = self._context_budget - self._system_prompt_tokens - summary_tokens
+        start = self._window_start(budget)
+        if start > self._window_floor:
+            # Drop a little more than needed so the next few requests open on the same
+            # message and the provider's prompt cache keeps matching the prefix
+            slack_budget = int(budget * (1 - config.CONTEXT_WINDOW_SLACK_RATIO))
+            self._window_floor = max(start, self._window_start(slack_budget))
+        start = max(start, self._window_floor)
+
+        # Between turns messages are only appended, so the previous wire list is extended
+        # in place unless the window moved or a compaction replaced the summary
+        if self._wire is None or self._wire_start != start or self._wire_summary is not self._summary:
+            self._wire = []
+            if self._system_prompt.content:
+                self._wire.append(self._system_prompt.message)
+            if self._summary:
+                self._wire.append(self._summary.to_dict())
+            self._wire_start = self._wire_end = start
+            self._wire_summary = self._summary
+            self._wire_tokens = self._system_prompt_tokens + summary_tokens
+
+        # Compressed bodies are decoded here, for the window only
+        for index in range(self._wire_end, len(self._messages)):
+            self._wire.append(self._messages.wire(index))
+            self._wire_tokens += self._messages.token_count(index)
+        self._wire_end = len(self._messages)
+
+        sent_tokens = self._wire_tokens
+        self.stats.requests += 1
+        self.stats.tokens_sent += sent_tokens
+        self.stats.tokens_saved += max(0, self._uncompacted_tokens - sent_tokens)
+        self.stats.truncated_messages = start
+
+        return list(self._wire)
+
+    def schedule_compaction(self) -> asyncio.Task | None:
+        if self._compaction_task and not self._compaction_task.done():
+            return None
+
+        if self._total_tokens <= self._context_budget * config.COMPACTION_TRIGGER_RATIO:
+            return None
+
+        keep_budget = int(self._context_budget * config.COMPACTION_KEEP_RATIO)
+        split = self._window_start(keep_budget - self._system_prompt_tokens)
+        if split == 0:
+            return None
+
+        # Runs in the background so the user's next turn never waits on the summary
+        self._trimmed_while_compacting = 0
+        self._compaction_task = asyncio.create_task(self._compact(self._messages.items(0, split)))
+        return self._compaction_task
+
+    async def _compact(self, items: list[MessageItem]) -> None:
+        # Uses its own pooled client so it can outlive the turn that scheduled it
+        client = LLMClient()
+        try:
+            content = await summarize_messages(client, items, self._summary)
+        finally:
+            await client.close()
+
+        if content is None:
+            self.stats.compaction_failures += 1
+            return
+
+        summary = MessageItem(
+            role="system",
+            content=content,
+            token_count=await count_tokens_async(content, self._model_name),
+        )
+
+        # Messages appended while summarizing sit after the compacted prefix and are kept;
+        # the part of the prefix trimmed meanwhile has already left the log and the total
+        trimmed = min(len(items), self._trimmed_while_compacting)
+        remaining = items[trimmed:]
+        self._messages.drop_prefix(len(remaining))
+        self._window_floor = max(0, self._window_floor - len(remaining))
+        removed_tokens = sum(item.token_count or 0 for item in remaining)
+        if self._summary:
+            removed_tokens += self._summary.token_count or 0
+
+        self._summary = summary
+        self._total_tokens += (summary.token_count or 0) - removed_tokens
+        self._journal.append(JournalEntry("summary", self._next_seq - len(self._messages), summary))
+        self.stats.compactions += 1
+        self.stats.compacted_messages += len(items)
+
+    async def wait_for_compaction(self) -> None:
+        if self._compaction_task:
+            await asyncio.shield(self._compaction_task)
 
-        return messages
\ No newline at end of file
+    async def close(self) -> None:
+        if self._compaction_task and not self._compaction_task.done():
+            self._compaction_task.cancel()
+            try:
+                await self._compaction_task
+            except asyncio.CancelledError:
+                pass
+        self._compaction_task = None
@@ -1,14 +1,31 @@
 from typing import Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
-@dataclass
+@dataclass(slots=True)
 class MessageItem:
     role: str
     content: str
     token_count: int | None = None
+    tool_calls: list[dict[str, Any]] | None = None  # assistant turns that invoked tools
+    tool_call_id: str | None = None  # tool results, paired with the call they answer
+    _wire: dict[str, Any] | None = field(default=None, init=False, repr=False, compare=False)
 
     def to_dict(self) -> dict[str, Any]:
-        return {
-            "role": self.role,
-            "content": self.content
-        }
\ No newline at end of file
+        # Built once and reused by every request that sends this message; treat it as read-only
+        wire = self._wire
+        if wire is None:
+            wire = self._wire = {
+                "role": self.role,
+                "content": self.content
+            }
+            if self.tool_calls:
+                wire["tool_calls"] = self.tool_calls
+            if self.tool_call_id:
+                wire["tool_call_id"] = self.tool_call_id
+        return wire
+
+@dataclass(slots=True)
+class JournalEntry:
+    kind: str  # "message" or "summary"
+    seq: int  # message index; for summaries, the first message index they do not cover
+    item: MessageItem
@@ -0,0 +1,149 @@
+from __future__ import annotations
+import zlib
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from config import config
+from .message_item import MessageItem
+
+ROLES = ("system", "user", "assistant", "tool")
+_ROLE_CODES = {role: code for code, role in enumerate(ROLES)}
+
+@dataclass
+class StringPoolStats:
+    lookups: int = 0
+    hits: int = 0
+    entries: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.lookups if self.lookups else 0.0
+
+
+class StringPool:
+    # Equal message bodies across sessions (templated questions, broadcast answers, canned tool
+    # output) end up as one string. An LRU rather than sys.intern, which would keep every
+    # unique body alive for the life of the process.
+    def __init__(
+        self,
+        max_entries: int = config.STRING_POOL_MAX_ENTRIES,
+        max_chars: int = config.STRING_POOL_MAX_CHARS,
+    ) -> None:
+        self._max_entries = max_entries
+        self._max_chars = max_chars
+        self._strings: OrderedDict[str, str] = OrderedDict()
+        # Bodies looked up more than once, i.e. actually held by several messages
+        self._shared: set[str] = set()
+        self.stats = StringPoolStats()
+
+    def intern(self, text: str) -> str:
+        if not text or len(text) > self._max_chars or not self._max_entries:
+            return text
+        self.stats.lookups += 1
+        shared = self._strings.get(text)
+        if shared is not None:
+            self._strings.move_to_end(text)
+            self._shared.add(shared)
+            self.stats.hits += 1
+            return shared
+        self._strings[text] = text
+        if len(self._strings) > self._max_entries:
+            evicted, _ = self._strings.popitem(last=False)
+            self._shared.discard(evicted)
+            self.stats.evictions += 1
+        self.stats.entries = len(self._strings)
+        return text
+
+    def is_shared(self, text: str) -> bool:
+        return text in self._shared and self._strings.get(text) is text
+
+
+class MessageLog:
+    # A session's history as columns instead of one object per message: roles and token counts
+    # in typed arrays, bodies in a list as interned strings or, once cold, zlib-compressed bytes
+    __slots__ = ("_roles", "_tokens", "_bodies", "_extras", "_pool", "_checked")
+
+    def __init__(self, pool: StringPool | None = None) -> None:
+        self._roles = array("B")
+        self._tokens = array("I")
+        self._bodies: list[str | bytes] = []
+        # (tool_calls, tool_call_id) for tool traffic; None for every other message
+        self._extras: list[tuple[list[dict[str, Any]] | None, str | None] | None] = []
+        self._pool = pool or get_string_pool()
+        # Bodies before this index were already considered for compression
+        self._checked = 0
+
+    def __len__(self) -> int:
+        return len(self._bodies)
+
+    def append(self, item: MessageItem) -> None:
+        self._roles.append(_ROLE_CODES[item.role])
+        self._tokens.append(item.token_count or 0)
+        self._bodies.append(self._pool.intern(item.content))
+        self._extras.append((item.tool_calls, item.tool_call_id) if item.tool_calls or item.tool_call_id else None)
+
+    def role(self, index: int) -> str:
+        return ROLES[self._roles[index]]
+
+    def token_count(self, index: int) -> int:
+        return self._tokens[index]
+
+    def tokens(self, start: int = 0, end: int | None = None) -> int:
+        return sum(self._tokens[start:end])
+
+    def content(self, index: int) -> str:
+        body = self._bodies[index]
+        # Decoded on every read and never stored back, so a cold body stays compressed
+        return zlib.decompress(body).decode() if isinstance(body, bytes) else body
+
+    def item(self, index: int) -> MessageItem:
+        extras = self._extras[index]
+        tool_calls, tool_call_id = extras if extras else (None, None)
+        return MessageItem(self.role(index), self.content(index), self._tokens[index], tool_calls, tool_call_id)
+
+    def items(self, start: int = 0, end: int | None = None) -> list[MessageItem]:
+        return [self.item(index) for index in range(start, len(self) if end is None else end)]
+
+    def wire(self, index: int) -> dict[str, Any]:
+        wire = {"role": ROLES[self._roles[index]], "content": self.content(index)}
+        extras = self._extras[index]
+        if extras:
+            tool_calls, tool_call_id = extras
+            if tool_calls:
+                wire["tool_calls"] = tool_calls
+            if tool_call_id:
+                wire["tool_call_id"] = tool_call_id
+        return wire
+
+    def drop_prefix(self, count: int) -> None:
+        del self._roles[:count]
+        del self._tokens[:count]
+        del self._bodies[:count]
+        del self._extras[:count]
+        self._checked = max(0, self._checked - count)
+
+    def compress(self, min_chars: int = config.CONTEXT_COMPRESS_MIN_CHARS) -> int:
+        compressed = 0
+        for index in range(self._checked, len(self._bodies)):
+            body = self._bodies[index]
+            # A body shared with other messages costs nothing extra; a private compressed copy would
+            if isinstance(body, bytes) or len(body) < min_chars or self._pool.is_shared(body):
+                continue
+            data = body.encode()
+            packed = zlib.compress(data, config.CONTEXT_COMPRESSION_LEVEL)
+            if len(packed) < len(data) * 0.9:
+                self._bodies[index] = packed
+                compressed += 1
+        self._checked = len(self._bodies)
+        return compressed
+
+
+_string_pool: StringPool | None = None
+
+def get_string_pool() -> StringPool:
+    global _string_pool
+    if _string_pool is None:
+        _string_pool = StringPool()
+    return _string_pool
@@ -0,0 +1,339 @@
+from __future__ import annotations
+import asyncio
+import json
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Protocol
+from config import config
+from .context_manager import ContextManager
+from .message_item import JournalEntry, MessageItem
+
+@dataclass
+class StoredSession:
+    messages: list[MessageItem] = field(default_factory=list)
+    summary: MessageItem | None = None
+    first_seq: int = 0
+    last_entry_id: int = 0
+
+
+@dataclass
+class SessionStoreStats:
+    resident: int = 0
+    hits: int = 0
+    restores: int = 0
+    restore_ms_total: float = 0.0
+    restore_ms_max: float = 0.0
+    stale_reloads: int = 0
+    lease_waits: int = 0
+    evictions: int = 0
+    persisted_entries: int = 0
+
+    @property
+    def restore_ms_avg(self) -> float:
+        return self.restore_ms_total / self.restores if self.restores else 0.0
+
+
+class SessionBackend(Protocol):
+    def append(self, session_id: str, entries: list[JournalEntry]) -> int: ...
+
+    def last_entry_id(self, session_id: str) -> int: ...
+
+    def load(self, session_id: str) -> StoredSession: ...
+
+    def try_lease(self, session_id: str, owner: str, ttl: float) -> bool: ...
+
+    def end_lease(self, session_id: str, owner: str) -> None: ...
+
+    def close(self) -> None: ...
+
+
+def _dump_tool_data(item: MessageItem) -> str | None:
+    if item.tool_calls:
+        return json.dumps({"tool_calls": item.tool_calls})
+    if item.tool_call_id:
+        return json.dumps({"tool_call_id": item.tool_call_id})
+    return None
+
+
+class SqliteSessionBackend:
+    def __init__(self, path: str = config.SESSION_STORE_PATH) -> None:
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # WAL lets worker processes read sessions while another one appends
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                token_count INTEGER,
+                created_at REAL NOT NULL,
+                tool_data TEXT
+            )
+            """
+        )
+        # Logs written before tool calls were stored lack the column
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(session_log)")}
+        if "tool_data" not in columns:
+            self._connection.execute("ALTER TABLE session_log ADD COLUMN tool_data TEXT")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS session_log_session ON session_log (session_id, id)")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS session_lease (session_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._connection.commit()
+
+    def append(self, session_id: str, entries: list[JournalEntry]) -> int:
+        now = time.time()
+        with self._connection:
+            self._connection.executemany(
+                "INSERT INTO session_log (session_id, kind, seq, role, content, token_count, created_at, tool_data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        session_id,
+                        entry.kind,
+                        entry.seq,
+                        entry.item.role,
+                        entry.item.content,
+                        entry.item.token_count,
+                        now,
+                        _dump_tool_data(entry.item),
+                    )
+                    for entry in entries
+                ],
+            )
+        return self.last_entry_id(session_id)
+
+    def last_entry_id(self, session_id: str) -> int:
+        row = self._connection.execute(
+            "SELECT MAX(id) FROM session_log WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        return row[0] or 0
+
+    def load(self, session_id: str) -> StoredSession:
+        summary_row = self._connection.execute(
+            "SELECT seq, role, content, token_count FROM session_log "
+            "WHERE session_id = ? AND kind = 'summary' ORDER BY id DESC LIMIT 1",
+            (session_id,),
+        ).fetchone()
+
+        session = StoredSession()
+        if summary_row:
+            session.first_seq = summary_row[0]
+            session.summary = MessageItem(role=summary_row[1], content=summary_row[2], token_count=summary_row[3])
+
+        # Stored token counts are reused as-is so restoring never re-tokenizes
+        rows = self._connection.execute(
+            "SELECT id, seq, role, content, token_count, tool_data FROM session_log "
+            "WHERE session_id = ? AND kind = 'message' AND seq >= ? ORDER BY id",
+            (session_id, session.first_seq),
+        ).fetchall()
+        session.messages = [
+            MessageItem(row[2], row[3], row[4], **json.loads(row[5])) if row[5] else MessageItem(row[2], row[3], row[4])
+            for row in rows
+        ]
+        if rows:
+            session.first_seq = rows[0][1]
+        session.last_entry_id = self.last_entry_id(session_id)
+        return session
+
+    def try_lease(self, session_id: str, owner: str, ttl: float) -> bool:
+        # Taken, renewed or reclaimed from a dead holder in one statement, so two workers can't both win
+        now = time.time()
+        with self._connection:
+            cursor = self._connection.execute(
+                "INSERT INTO session_lease (session_id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE session_lease.owner = excluded.owner OR session_lease.expires_at < ?",
+                (session_id, owner, now + ttl, now),
+            )
+        return cursor.rowcount == 1
+
+    def end_lease(self, session_id: str, owner: str) -> None:
+        with self._connection:
+            self._connection.execute(
+                "DELETE FROM session_lease WHERE session_id = ? AND owner = ?", (session_id, owner)
+            )
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+@dataclass
+class _ResidentSession:
+    session_id: str
+    context: ContextManager
+    last_entry_id: int = 0
+    leases: int = 0
+    last_used: float = 0.0
+
+
+class SessionStore:
+    def __init__(
+        self,
+        backend: SessionBackend | None = None,
+        max_resident: int = config.SESSION_MAX_RESIDENT,
+        idle_ttl: float = config.SESSION_IDLE_TTL,
+    ) -> None:
+        self._backend = backend or SqliteSessionBackend()
+        self._max_resident = max_resident
+        self._idle_ttl = idle_ttl
+        self._resident: OrderedDict[str, _ResidentSession] = OrderedDict()
+        # Worker processes share the backend, so turns are leased there and not just locked in memory
+        self._owner = uuid.uuid4().hex
+        self._turns: dict[str, int] = {}
+        # sqlite3 connections are not safe for concurrent use from worker threads
+        self._backend_lock = asyncio.Lock()
+        self.stats = SessionStoreStats()
+
+    async def _call_backend(self, method: Callable[..., Any], *args: Any) -> Any:
+        async with self._backend_lock:
+            return await asyncio.to_thread(method, *args)
+
+    async def acquire(self, session_id: str) -> ContextManager:
+        # Leased before the stale check below, so another worker's turn has been flushed by then
+        await self._lease(session_id)
+        try:
+            return await self._checkout(session_id)
+        except BaseException:
+            await self._end_turn(session_id)
+            raise
+
+    async def _lease(self, session_id: str) -> None:
+        self._turns[session_id] = self._turns.get(session_id, 0) + 1
+        try:
+            # Re-entrant for this store, whose callers order their own turns
+            waited = False
+            while not await self._call_backend(
+                self._backend.try_lease, session_id, self._owner, config.SESSION_LEASE_TTL
+            ):
+                if not waited:
+                    waited = True
+                    self.stats.lease_waits += 1
+                await asyncio.sleep(config.SESSION_LEASE_POLL_INTERVAL)
+        except BaseException:
+            await self._end_turn(session_id)
+            raise
+
+    async def _end_turn(self, session_id: str) -> None:
+        turns = self._turns.get(session_id, 0) - 1
+        if turns > 0:
+            self._turns[session_id] = turns
+            return
+        self._turns.pop(session_id, None)
+        await self._call_backend(self._backend.end_lease, session_id, self._owner)
+
+    async def _checkout(self, session_id: str) -> ContextManager:
+        session = self._resident.get(session_id)
+
+        if session is not None:
+            # Leased before the first await, so a release of another session can't evict it meanwhile
+            self._resident.move_to_end(session_id)
+            session.leases += 1
+            # Another worker may have appended to this session since we loaded it
+            last_entry_id = await self._call_backend(self._backend.last_entry_id, session_id)
+            if self._resident.get(session_id) is not session:
+                # Dropped by an eviction that was already under way
+                session = None
+            elif last_entry_id != session.last_entry_id and session.leases == 1:
+                self.stats.stale_reloads += 1
+                session.leases = 0
+                await self._drop(session_id)
+                session = None
+            else:
+                self.stats.hits += 1
+
+        if session is None:
+            session = await self._restore(session_id)
+            self._resident.move_to_end(session_id)
+            session.leases += 1
+
+        session.last_used = time.monotonic()
+        return session.context
+
+    async def release(self, session_id: str) -> None:
+        session = self._resident.get(session_id)
+        if session is None:
+            await self._end_turn(session_id)
+            return
+
+        session.leases = max(0, session.leases - 1)
+        session.last_used = time.monotonic()
+        try:
+            # Flushed before the lease ends, so the next worker to take it sees this turn
+            await self._flush(session)
+        finally:
+            await self._end_turn(session_id)
+        if session.leases == 0:
+            session.context.park()
+        await self.evict_idle()
+
+    async def _restore(self, session_id: str) -> _ResidentSession:
+        started = time.perf_counter()
+        stored = await self._call_backend(self._backend.load, session_id)
+
+        context = ContextManager()
+        await context.restore_session_async(stored.messages, stored.summary, stored.first_seq)
+        session = _ResidentSession(session_id=session_id, context=context, last_entry_id=stored.last_entry_id)
+        self._resident[session_id] = session
+
+        if stored.last_entry_id:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.stats.restores += 1
+            self.stats.restore_ms_total += elapsed_ms
+            self.stats.restore_ms_max = max(self.stats.restore_ms_max, elapsed_ms)
+        self.stats.resident = len(self._resident)
+        return session
+
+    async def _flush(self, session: _ResidentSession) -> None:
+        entries = session.context.take_journal()
+        if entries:
+            session.last_entry_id = await self._call_backend(self._backend.append, session.session_id, entries)
+            self.stats.persisted_entries += len(entries)
+
+    async def evict_idle(self) -> None:
+        now = time.monotonic()
+        idle = [
+            session_id
+            for session_id, session in self._resident.items()
+            if session.leases == 0
+            and (len(self._resident) > self._max_resident or now - session.last_used > self._idle_ttl)
+        ]
+
+        # Least recently used first, stopping once we are back under the cap
+        for session_id in idle:
+            session = self._resident.get(session_id)
+            # Each drop awaits, so a session may have been acquired or dropped since the scan
+            if session is None or session.leases:
+                continue
+            if len(self._resident) <= self._max_resident and now - session.last_used <= self._idle_ttl:
+                break
+            await self._drop(session_id)
+            self.stats.evictions += 1
+
+    async def _drop(self, session_id: str) -> None:
+        session = self._resident[session_id]
+        # Let a running compaction finish so its summary is persisted instead of lost
+        try:
+            await session.context.wait_for_compaction()
+        except Exception:
+            pass
+        await self._flush(session)
+        await session.context.close()
+        self._resident.pop(session_id, None)
+        self.stats.resident = len(self._resident)
+
+    async def close(self) -> None:
+        for session_id in list(self._resident):
+            await self._drop(session_id)
+        for session_id in list(self._turns):
+            self._backend.end_lease(session_id, self._owner)
+        self._turns.clear()
+        self._backend.close()
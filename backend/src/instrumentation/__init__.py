@@ -0,0 +1,14 @@
+from .metrics import Histogram, Metrics, MetricsHook, ModelMetrics, RequestRecord, RequestTimer, get_metrics
+from .prometheus import PROMETHEUS_CONTENT_TYPE, render_prometheus
+
+__all__ = [
+    "Histogram",
+    "Metrics",
+    "MetricsHook",
+    "ModelMetrics",
+    "RequestRecord",
+    "RequestTimer",
+    "get_metrics",
+    "PROMETHEUS_CONTENT_TYPE",
+    "render_prometheus",
+]
@@ -0,0 +1,241 @@
+from __future__ import annotations
+import bisect
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable
+from config import config
+
+if TYPE_CHECKING:
+    from llm import TokenUsage
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+INTER_TOKEN_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+TOKENS_PER_SECOND_BUCKETS = (1.0, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0)
+RETRY_BUCKETS = (0.0, 1.0, 2.0, 3.0, 5.0)
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow; cumulated only when exported
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[float, int]]:
+        total = 0
+        result = []
+        for bound, count in zip((*self.buckets, float("inf")), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, quantile: float) -> float | None:
+        # Upper bound of the bucket holding the quantile, as Prometheus would estimate it
+        if not self.count:
+            return None
+        rank = quantile * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound
+        return float("inf")
+
+
+@dataclass
+class ModelMetrics:
+    ttft: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS))
+    inter_token: Histogram = field(default_factory=lambda: Histogram(INTER_TOKEN_BUCKETS))
+    total: Histogram = field(default_factory=lambda: Histogram(LATENCY_BUCKETS))
+    tokens_per_second: Histogram = field(default_factory=lambda: Histogram(TOKENS_PER_SECOND_BUCKETS))
+    retries: Histogram = field(default_factory=lambda: Histogram(RETRY_BUCKETS))
+    requests: int = 0
+    errors: int = 0
+    usage: TokenUsage | None = None
+    # Requests ended early, by reason, and what finishing them would have cost
+    early_stops: dict[str, int] = field(default_factory=dict)
+    tokens_saved: int = 0
+    seconds_saved: float = 0.0
+    # Requests that ran to their natural end: the baseline an early stop is measured against
+    finished: int = 0
+    finished_tokens: int = 0
+    finished_seconds: float = 0.0
+
+    def expected_tokens(self, max_tokens: int | None = None) -> int | None:
+        if not self.finished:
+            return max_tokens
+        average = self.finished_tokens // self.finished
+        return min(average, max_tokens) if max_tokens else average
+
+    @property
+    def average_tokens_per_second(self) -> float | None:
+        return self.finished_tokens / self.finished_seconds if self.finished_seconds > 0 else None
+
+
+@dataclass
+class RequestRecord:
+    model: str
+    ttft: float | None
+    total: float
+    tokens: int
+    retries: int
+    error: str | None = None
+    usage: TokenUsage | None = None
+    stop_reason: str | None = None  # set when the request was ended before its natural finish
+    tokens_saved: int = 0
+    seconds_saved: float = 0.0
+
+    @property
+    def tokens_per_second(self) -> float | None:
+        if self.ttft is None or self.tokens < 2:
+            return None
+        generating = self.total - self.ttft
+        return self.tokens / generating if generating > 0 else None
+
+
+MetricsHook = Callable[[RequestRecord], None]
+
+class RequestTimer:
+    __slots__ = ("_metrics", "_model", "_stats", "_started", "_first", "_last", "_tokens", "_retries")
+
+    def __init__(self, metrics: Metrics, model: str) -> None:
+        self._metrics = metrics
+        self._model = model
+        self._stats = metrics.model(model)
+        self._started = time.perf_counter()
+        self._first: float | None = None
+        self._last = 0.0
+        self._tokens = 0
+        self._retries = 0
+
+    def token(self) -> None:
+        now = time.perf_counter()
+        if self._first is None:
+            self._first = now
+            self._stats.ttft.observe(now - self._started)
+        else:
+            self._stats.inter_token.observe(now - self._last)
+        self._last = now
+        self._tokens += 1
+
+    def retry(self) -> None:
+        self._retries += 1
+
+    def finish(
+        self,
+        usage: TokenUsage | None = None,
+        error: str | None = None,
+        stop_reason: str | None = None,
+        max_tokens: int | None = None,
+    ) -> RequestRecord:
+        record = RequestRecord(
+            model=self._model,
+            ttft=self._first - self._started if self._first is not None else None,
+            total=time.perf_counter() - self._started,
+            # Provider-reported counts are preferred over the number of streamed chunks
+            tokens=usage.completion_tokens if usage and usage.completion_tokens else self._tokens,
+            retries=self._retries,
+            error=error,
+            usage=usage,
+            stop_reason=stop_reason,
+        )
+        if stop_reason:
+            # A request cut off at max_tokens would otherwise have run to the usual length;
+            # anything else stopped short of whatever the caller allowed it
+            expected = self._stats.expected_tokens(None if stop_reason == "max_tokens" else max_tokens)
+            if expected:
+                record.tokens_saved = max(0, expected - record.tokens)
+                rate = record.tokens_per_second or self._stats.average_tokens_per_second
+                if rate:
+                    record.seconds_saved = record.tokens_saved / rate
+        self._metrics.record(record)
+        return record
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._models: dict[str, ModelMetrics] = {}
+        self._hooks: list[MetricsHook] = []
+
+    def model(self, model: str) -> ModelMetrics:
+        stats = self._models.get(model)
+        if stats is None:
+            stats = self._models[model] = ModelMetrics()
+        return stats
+
+    def models(self) -> dict[str, ModelMetrics]:
+        return dict(self._models)
+
+    def start_request(self, model: str) -> RequestTimer | None:
+        # A disabled surface costs callers a single None check per event
+        if not config.METRICS_ENABLED:
+            return None
+        return RequestTimer(self, model)
+
+    def record(self, record: RequestRecord) -> None:
+        stats = self.model(record.model)
+        stats.requests += 1
+        stats.total.observe(record.total)
+        stats.retries.observe(record.retries)
+        if record.error:
+            stats.errors += 1
+        if record.usage:
+            stats.usage = stats.usage + record.usage if stats.usage else record.usage
+        if record.stop_reason:
+            stats.early_stops[record.stop_reason] = stats.early_stops.get(record.stop_reason, 0) + 1
+            stats.tokens_saved += record.tokens_saved
+            stats.seconds_saved += record.seconds_saved
+        elif not record.error and record.ttft is not None:
+            stats.finished += 1
+            stats.finished_tokens += record.tokens
+            stats.finished_seconds += record.total - record.ttft
+        tokens_per_second = record.tokens_per_second
+        if tokens_per_second is not None:
+            stats.tokens_per_second.observe(tokens_per_second)
+
+        for hook in self._hooks:
+            try:
+                hook(record)
+            except Exception:
+                # An exporter failing must never break the request it is observing
+                pass
+
+    def add_hook(self, hook: MetricsHook) -> None:
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: MetricsHook) -> None:
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def snapshot(self) -> dict[str, dict[str, float | int | None]]:
+        return {
+            model: {
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "ttft_p50": stats.ttft.quantile(0.5),
+                "ttft_p99": stats.ttft.quantile(0.99),
+                "inter_token_p50": stats.inter_token.quantile(0.5),
+                "inter_token_p99": stats.inter_token.quantile(0.99),
+                "total_p50": stats.total.quantile(0.5),
+                "total_p99": stats.total.quantile(0.99),
+                "tokens_per_second_p50": stats.tokens_per_second.quantile(0.5),
+                "retries": stats.retries.sum,
+                "early_stops": dict(stats.early_stops),
+                "tokens_saved": stats.tokens_saved,
+                "seconds_saved": round(stats.seconds_saved, 3),
+                "usage": stats.usage.__dict__ if stats.usage else None,
+            }
+            for model, stats in self._models.items()
+        }
+
+
+_metrics: Metrics | None = None
+
+def get_metrics() -> Metrics:
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
@@ -0,0 +1,79 @@
+from __future__ import annotations
+from .metrics import Histogram, Metrics, get_metrics
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_HISTOGRAMS = (
+    ("ttft", "nexus_llm_time_to_first_token_seconds", "Time from sending a request to its first streamed token"),
+    ("inter_token", "nexus_llm_inter_token_seconds", "Time between consecutive streamed tokens"),
+    ("total", "nexus_llm_request_seconds", "Total request latency including retries"),
+    ("tokens_per_second", "nexus_llm_tokens_per_second", "Completion tokens per second after the first token"),
+    ("retries", "nexus_llm_retries", "Retries needed per request"),
+)
+
+_USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _histogram_lines(name: str, model: str, histogram: Histogram) -> list[str]:
+    labels = f'model="{_escape(model)}"'
+    lines = [
+        f'{name}_bucket{{{labels},le="{_format_bound(bound)}"}} {count}'
+        for bound, count in histogram.cumulative()
+    ]
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def render_prometheus(metrics: Metrics | None = None) -> str:
+    models = (metrics or get_metrics()).models()
+    lines: list[str] = []
+
+    for attribute, name, description in _HISTOGRAMS:
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} histogram")
+        for model, stats in models.items():
+            lines.extend(_histogram_lines(name, model, getattr(stats, attribute)))
+
+    lines.append("# HELP nexus_llm_requests_total Completed LLM requests")
+    lines.append("# TYPE nexus_llm_requests_total counter")
+    for model, stats in models.items():
+        lines.append(f'nexus_llm_requests_total{{model="{_escape(model)}"}} {stats.requests}')
+
+    lines.append("# HELP nexus_llm_errors_total LLM requests that ended in an error")
+    lines.append("# TYPE nexus_llm_errors_total counter")
+    for model, stats in models.items():
+        lines.append(f'nexus_llm_errors_total{{model="{_escape(model)}"}} {stats.errors}')
+
+    lines.append("# HELP nexus_llm_early_stops_total LLM requests ended before their natural finish")
+    lines.append("# TYPE nexus_llm_early_stops_total counter")
+    for model, stats in models.items():
+        for reason, count in stats.early_stops.items():
+            lines.append(f'nexus_llm_early_stops_total{{model="{_escape(model)}",reason="{_escape(reason)}"}} {count}')
+
+    lines.append("# HELP nexus_llm_tokens_saved_total Estimated completion tokens not generated because of early stops")
+    lines.append("# TYPE nexus_llm_tokens_saved_total counter")
+    for model, stats in models.items():
+        lines.append(f'nexus_llm_tokens_saved_total{{model="{_escape(model)}"}} {stats.tokens_saved}')
+
+    lines.append("# HELP nexus_llm_seconds_saved_total Estimated generation time not spent because of early stops")
+    lines.append("# TYPE nexus_llm_seconds_saved_total counter")
+    for model, stats in models.items():
+        lines.append(f'nexus_llm_seconds_saved_total{{model="{_escape(model)}"}} {stats.seconds_saved}')
+
+    lines.append("# HELP nexus_llm_tokens_total Provider-reported token usage")
+    lines.append("# TYPE nexus_llm_tokens_total counter")
+    for model, stats in models.items():
+        if stats.usage:
+            for kind in _USAGE_FIELDS:
+                value = getattr(stats.usage, kind)
+                lines.append(f'nexus_llm_tokens_total{{model="{_escape(model)}",kind="{kind.removesuffix("_tokens")}"}} {value}')
+
+    return "\n".join(lines) + "\n"
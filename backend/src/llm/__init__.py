@@ -1,4 +1,63 @@
 from .llm_client import LLMClient
-from .response import StreamEvent, StreamEventType, TokenUsage, TextDelta
+from .response import DEADLINE_FINISH_REASON, StreamEvent, StreamEventType, TokenUsage, TextDelta, ToolCall
+from .tool_calls import ToolCallAssembler
+from .client_pool import ClientPool, PoolStats, get_client_pool, prewarm_client_pool, close_client_pools
+from .response_cache import ResponseCache, CacheStats, get_response_cache, make_cache_key
+from .single_flight import SingleFlight, SingleFlightStats, get_single_flight
+from .rate_limiter import (
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    CircuitBreakerStats,
+    RateLimiterStats,
+    get_circuit_breaker,
+    get_rate_limiter,
+)
+from .model_stats import ModelLatencyTracker, ModelStats, get_model_stats
+from .model_selector import (
+    TASK_CLASSES,
+    ModelPolicy,
+    ModelSelector,
+    PolicyRule,
+    SelectionDecision,
+    SelectionStats,
+    get_model_selector,
+)
 
-__all__ = ["LLMClient", "StreamEvent", "StreamEventType", "TokenUsage", "TextDelta"]
+__all__ = [
+    "LLMClient",
+    "DEADLINE_FINISH_REASON",
+    "StreamEvent",
+    "StreamEventType",
+    "TokenUsage",
+    "TextDelta",
+    "ToolCall",
+    "ToolCallAssembler",
+    "ClientPool",
+    "PoolStats",
+    "get_client_pool",
+    "prewarm_client_pool",
+    "close_client_pools",
+    "ResponseCache",
+    "CacheStats",
+    "get_response_cache",
+    "make_cache_key",
+    "SingleFlight",
+    "SingleFlightStats",
+    "get_single_flight",
+    "AdaptiveRateLimiter",
+    "CircuitBreaker",
+    "CircuitBreakerStats",
+    "RateLimiterStats",
+    "get_circuit_breaker",
+    "get_rate_limiter",
+    "ModelLatencyTracker",
+    "ModelStats",
+    "get_model_stats",
+    "TASK_CLASSES",
+    "ModelPolicy",
+    "ModelSelector",
+    "PolicyRule",
+    "SelectionDecision",
+    "SelectionStats",
+    "get_model_selector",
+]
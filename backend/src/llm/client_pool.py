@@ -0,0 +1,128 @@
+from __future__ import annotations
+import asyncio
+import importlib.util
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING
+from config import config
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from .transport import TrackingTransport
+
+@dataclass
+class PoolStats:
+    acquires: int = 0
+    hits: int = 0
+    creates: int = 0
+    waits: int = 0
+    requests: int = 0
+    in_flight: int = 0
+    references: int = 0
+    open_connections: int = 0
+    http2: bool = False
+
+
+class ClientPool:
+    def __init__(
+        self,
+        base_url: str | None = None,
+        api_key: str | None = None,
+        max_connections: int = config.HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = config.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = config.HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = config.HTTP2_ENABLED,
+    ) -> None:
+        self.base_url = base_url or config.BASE_URL
+        self.api_key = api_key or config.OPENROUTER_API_KEY
+        self._max_keepalive_connections = max_keepalive_connections
+        self._keepalive_expiry = keepalive_expiry
+        self._max_connections = max_connections
+        # HTTP/2 needs the optional h2 package; fall back to pooled HTTP/1.1 without it
+        self._http2 = http2 and importlib.util.find_spec("h2") is not None
+        self._stats = PoolStats(http2=self._http2)
+        self._transport: TrackingTransport | None = None
+        self._client: AsyncOpenAI | None = None
+
+    def acquire(self) -> AsyncOpenAI:
+        self._stats.acquires += 1
+        self._stats.references += 1
+
+        if self._client is None:
+            # openai and httpx are only imported once a client is actually needed
+            import httpx
+            from openai import AsyncOpenAI
+            from .transport import TrackingTransport
+
+            self._stats.creates += 1
+            self._transport = TrackingTransport(
+                self._stats,
+                self._max_connections,
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_keepalive_connections,
+                    keepalive_expiry=self._keepalive_expiry,
+                ),
+                http2=self._http2,
+            )
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                # LLMClient retries through the shared rate limiter; SDK retries would bypass it
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    transport=self._transport,
+                    timeout=httpx.Timeout(config.HTTP_TIMEOUT, pool=config.HTTP_POOL_TIMEOUT),
+                ),
+            )
+        else:
+            self._stats.hits += 1
+
+        return self._client
+
+    def release(self) -> None:
+        self._stats.references = max(0, self._stats.references - 1)
+
+    async def prewarm(self, connections: int = config.HTTP_PREWARM_CONNECTIONS) -> None:
+        client = self.acquire()
+        try:
+            # The SDK imports its resource modules on first attribute access; pay for that here too
+            client.chat.completions
+            # A multiplexed HTTP/2 connection only needs one handshake
+            count = 1 if self._http2 else max(1, connections)
+            await asyncio.gather(
+                *(client.models.with_raw_response.list() for _ in range(count)),
+                return_exceptions=True,
+            )
+        finally:
+            self.release()
+
+    def stats(self) -> PoolStats:
+        self._stats.open_connections = self._transport.open_connections if self._transport else 0
+        return replace(self._stats)
+
+    async def close(self) -> None:
+        if self._client:
+            await self._client.close()
+            self._client = None
+            self._transport = None
+
+
+# Process-wide pools, one per (base_url, api_key) so overriding config still works
+_pools: dict[tuple[str, str | None], ClientPool] = {}
+
+def get_client_pool() -> ClientPool:
+    key = (config.BASE_URL, config.OPENROUTER_API_KEY)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = ClientPool(*key)
+    return pool
+
+
+async def prewarm_client_pool(connections: int = config.HTTP_PREWARM_CONNECTIONS) -> None:
+    await get_client_pool().prewarm(connections)
+
+
+async def close_client_pools() -> None:
+    pools = list(_pools.values())
+    _pools.clear()
+    await asyncio.gather(*(pool.close() for pool in pools))
@@ -1,110 +1,532 @@
+from __future__ import annotations
 import asyncio
-
-from openai import RateLimitError, APIConnectionError, APIError
-from .response import TokenUsage, StreamEvent
-from typing import AsyncGenerator
+import time
+from contextlib import aclosing
+from .response import DEADLINE_FINISH_REASON, TokenUsage, StreamEvent, StreamEventType, ToolCall
+from .tool_calls import ToolCallAssembler
+from .client_pool import ClientPool, get_client_pool
+from .response_cache import ResponseCache, get_response_cache, is_cacheable, make_cache_key
+from .single_flight import SingleFlight, get_single_flight
+from .rate_limiter import (
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    backoff_delay,
+    get_circuit_breaker,
+    get_rate_limiter,
+    parse_retry_after,
+)
+from .model_stats import ModelLatencyTracker, get_model_stats
+from .model_selector import ModelPolicy, ModelSelector, SelectionDecision, get_model_selector
+from typing import TYPE_CHECKING, AsyncGenerator, AsyncIterator, Awaitable, Callable
 from typing import Any
-from openai import AsyncOpenAI
 from config import config
+from instrumentation import RequestTimer, get_metrics
+from utils.text import estimate_tokens
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+_DONE = object()
+
+def _cached_tokens(usage: Any) -> int:
+    # Providers without prefix caching omit the details block entirely
+    details = getattr(usage, "prompt_tokens_details", None)
+    return (details.cached_tokens or 0) if details else 0
+
+
+def _stop_reason(event: StreamEvent, max_tokens: int | None) -> str | None:
+    if event.finish_reason == DEADLINE_FINISH_REASON:
+        return "deadline"
+    # "length" without a max_tokens of our own is the context window running out, not a stop
+    if event.finish_reason == "length" and max_tokens:
+        return "max_tokens"
+    return None
+
+
+async def _until(chunks: AsyncIterator[Any], expires: float) -> AsyncGenerator[Any, None]:
+    # Each read is bounded separately: a timeout around the yields would fire in the consumer
+    iterator = aiter(chunks)
+    while True:
+        try:
+            async with asyncio.timeout_at(expires):
+                chunk = await anext(iterator)
+        except StopAsyncIteration:
+            return
+        yield chunk
+
 
 class LLMClient:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        pool: ClientPool | None = None,
+        cache: ResponseCache | None = None,
+        limiter: AdaptiveRateLimiter | None = None,
+        breaker: CircuitBreaker | None = None,
+        model_stats: ModelLatencyTracker | None = None,
+        flights: SingleFlight | None = None,
+        selector: ModelSelector | None = None,
+    ) -> None:
         self.client : AsyncOpenAI | None = None
+        self._pool = pool
+        self._cache = cache if cache is not None else get_response_cache()
+        self._flights = flights if flights is not None else get_single_flight()
+        # Shared across the process so concurrent sessions back off together
+        self._limiter = limiter or get_rate_limiter()
+        self._breaker = breaker or get_circuit_breaker()
+        self._model_stats = model_stats or get_model_stats()
+        self._selector = selector if selector is not None else get_model_selector()
         self._max_retries: int = config.MAX_RETRIES
 
     def get_client(self) -> AsyncOpenAI:
         if self.client is None:
-            self.client = AsyncOpenAI(
-                api_key=config.OPENROUTER_API_KEY,
-                base_url=config.BASE_URL
-            )
+            # Sessions share one pooled client instead of opening their own connections
+            self._pool = self._pool or get_client_pool()
+            self.client = self._pool.acquire()
         return self.client
 
     async def close(self) -> None:
         if self.client:
-            await self.client.close()
+            self._pool.release()
             self.client = None
 
-    async def chat_completion(self, messages: list[dict[str, Any]], stream: bool) -> AsyncGenerator[StreamEvent, None]:
-        client = self.get_client()
+    async def chat_completion(
+        self,
+        messages: list[dict[str, Any]],
+        stream: bool,
+        model: str | None = None,
+        tools: list[dict[str, Any]] | None = None,
+        tool_choice: str | None = None,
+        max_tokens: int | None = None,
+        stop: list[str] | None = None,
+        deadline: float | None = None,
+        task: str = "synthesis",
+        prompt_tokens: int | None = None,
+        policy: ModelPolicy | None = None,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        # With a model pool configured, the model is picked per request from the task class,
+        # the prompt size and each model's recent latency, throughput and errors
+        decision: SelectionDecision | None = None
+        if self._selector is not None:
+            if prompt_tokens is None:
+                prompt_tokens = sum(estimate_tokens(message.get("content") or "") for message in messages)
+            if model:
+                decision = self._selector.pin(task, prompt_tokens, model)
+            else:
+                decision = self._selector.select(task, prompt_tokens, policy)
+                model = decision.model
 
         kwargs = {
-            "model": config.DEFAULT_AI_MODEL,
-            "messages": messages,
+            "model": model or config.DEFAULT_AI_MODEL,
+            # A snapshot, not the caller's list: the cache key, a shared flight and every retry
+            # and fallback send exactly these messages, whatever the session appends meanwhile
+            "messages": [dict(message) for message in messages],
             "stream": stream
         }
+        if tools:
+            kwargs["tools"] = tools
+            if tool_choice:
+                kwargs["tool_choice"] = tool_choice
+        if max_tokens:
+            kwargs["max_tokens"] = max_tokens
+        if stop:
+            kwargs["stop"] = stop
+        # Seconds from now, covering retries and fallbacks; past it the response ends with
+        # finish_reason "deadline" and whatever was generated so far
+        if deadline is None:
+            deadline = config.LLM_REQUEST_DEADLINE
+        expires = asyncio.get_running_loop().time() + deadline if deadline else None
+        # The other candidates, best first, take over if the chosen model fails
+        fallbacks = decision.fallbacks if decision else []
+
+        if decision is None:
+            async with aclosing(self._complete(kwargs, expires, fallbacks)) as events:
+                async for event in events:
+                    yield event
+            return
+
+        started = time.perf_counter()
+        ttft: float | None = None
+        usage: TokenUsage | None = None
+        failed = False
+        try:
+            async with aclosing(self._complete(kwargs, expires, fallbacks)) as events:
+                async for event in events:
+                    if ttft is None and event.type in (StreamEventType.TEXT_DELTA, StreamEventType.TOOL_CALL):
+                        ttft = time.perf_counter() - started
+                    elif event.type == StreamEventType.MESSAGE_COMPLETE:
+                        usage = event.usage
+                    elif event.type == StreamEventType.ERROR:
+                        failed = True
+                    yield event
+        finally:
+            self._selector.finish(decision, ttft, time.perf_counter() - started, usage, failed)
+
+    async def _complete(
+        self,
+        kwargs: dict[str, Any],
+        expires: float | None,
+        fallbacks: list[str],
+    ) -> AsyncGenerator[StreamEvent, None]:
+        if self._cache is None and self._flights is None:
+            async with aclosing(self._request_with_fallback(kwargs, expires, fallbacks)) as events:
+                async for event in events:
+                    yield event
+            return
+
+        key = make_cache_key(kwargs)
+        if self._cache is not None:
+            cached_events = await self._cache.get(key)
+            if cached_events is not None:
+                # Replay the recorded sequence so streaming consumers can't tell the difference
+                for event in cached_events:
+                    yield event
+                return
+
+        if self._flights is None:
+            upstream = self._fetch(kwargs, key, expires, fallbacks)
+        else:
+            upstream = self._flights.subscribe(key, lambda: self._fetch(kwargs, key, expires, fallbacks))
+        async with aclosing(upstream) as events:
+            async for event in events:
+                yield event
+
+    async def _fetch(
+        self,
+        kwargs: dict[str, Any],
+        key: str,
+        expires: float | None,
+        fallbacks: list[str],
+    ) -> AsyncGenerator[StreamEvent, None]:
+        if self._cache is None:
+            async with aclosing(self._request_with_fallback(kwargs, expires, fallbacks)) as upstream:
+                async for event in upstream:
+                    yield event
+            return
+
+        # Stored once per upstream request, however many callers shared it
+        events: list[StreamEvent] = []
+        async with aclosing(self._request_with_fallback(kwargs, expires, fallbacks)) as upstream:
+            async for event in upstream:
+                events.append(event)
+                yield event
+
+        if is_cacheable(events):
+            await self._cache.set(key, events)
+
+    async def _request_with_fallback(
+        self,
+        kwargs: dict[str, Any],
+        expires: float | None = None,
+        fallbacks: list[str] | None = None,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        models = list(dict.fromkeys([kwargs["model"], *(fallbacks or ()), *config.LLM_FALLBACK_MODELS]))
+
+        for index, model in enumerate(models):
+            stats = self._model_stats.get(model)
+            stats.requests += 1
+            attempt_kwargs = {**kwargs, "model": model}
+            hedge_model = self._hedge_model(model) if kwargs["stream"] else None
+            if hedge_model:
+                events = self._hedged_request(attempt_kwargs, hedge_model, expires)
+            else:
+                events = self._timed_request(attempt_kwargs, expires)
+
+            produced = False
+            failed_over = False
+            async with aclosing(events):
+                async for event in events:
+                    if event.type == StreamEventType.ERROR and not produced:
+                        stats.errors += 1
+                        # Nothing reached the caller yet, so the next model can take over cleanly
+                        if index + 1 < len(models):
+                            stats.fallbacks += 1
+                            failed_over = True
+                            break
+                    produced = True
+                    yield event
+
+            if not failed_over:
+                return
+
+    def _hedge_model(self, model: str) -> str | None:
+        if not config.LLM_HEDGING_ENABLED:
+            return None
+        return next((candidate for candidate in config.LLM_HEDGE_MODELS if candidate != model), None)
+
+    async def _timed_request(
+        self,
+        kwargs: dict[str, Any],
+        expires: float | None = None,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        started = time.perf_counter()
+        first_token: float | None = None
+        timer = get_metrics().start_request(kwargs["model"])
+        max_tokens = kwargs.get("max_tokens")
+        try:
+            async with aclosing(self._request(kwargs, timer, expires)) as events:
+                async for event in events:
+                    if event.type == StreamEventType.TEXT_DELTA or event.type == StreamEventType.TOOL_CALL:
+                        if first_token is None:
+                            first_token = time.perf_counter()
+                            self._model_stats.record_ttft(kwargs["model"], first_token - started)
+                        if timer and event.type == StreamEventType.TEXT_DELTA:
+                            timer.token()
+                    elif event.type == StreamEventType.MESSAGE_COMPLETE:
+                        self._model_stats.record_outcome(kwargs["model"], failed=False)
+                        if event.usage:
+                            self._model_stats.record_usage(kwargs["model"], event.usage)
+                            generating = time.perf_counter() - first_token if first_token is not None else 0.0
+                            if event.usage.completion_tokens > 1 and generating > 0:
+                                self._model_stats.record_throughput(kwargs["model"], event.usage.completion_tokens / generating)
+                        if timer:
+                            timer.finish(event.usage, stop_reason=_stop_reason(event, max_tokens), max_tokens=max_tokens)
+                            timer = None
+                    elif event.type == StreamEventType.ERROR:
+                        self._model_stats.record_outcome(kwargs["model"], failed=True)
+                        if timer:
+                            timer.finish(error=event.error)
+                            timer = None
+                    yield event
+        finally:
+            # Still open here means the consumer stopped reading (or was cancelled) mid-response
+            if timer:
+                timer.finish(stop_reason="cancelled", max_tokens=max_tokens)
+
+    async def _hedged_request(
+        self,
+        kwargs: dict[str, Any],
+        hedge_model: str,
+        expires: float | None = None,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        queue: asyncio.Queue = asyncio.Queue()
+        racers: list[tuple[str, asyncio.Task, float]] = []
+
+        def start(model: str) -> None:
+            index = len(racers)
+
+            async def pump() -> None:
+                try:
+                    async with aclosing(self._timed_request({**kwargs, "model": model}, expires)) as events:
+                        async for event in events:
+                            queue.put_nowait((index, event))
+                finally:
+                    queue.put_nowait((index, _DONE))
+
+            racers.append((model, asyncio.create_task(pump()), time.perf_counter()))
+
+        primary_stats = self._model_stats.get(kwargs["model"])
+        hedge_at = time.perf_counter() + self._model_stats.hedge_delay(kwargs["model"])
+        start(kwargs["model"])
+        winner: int | None = None
+        errors: set[int] = set()
+
+        try:
+            while True:
+                if winner is None and len(racers) == 1 and not errors:
+                    try:
+                        async with asyncio.timeout(max(0.0, hedge_at - time.perf_counter())):
+                            index, event = await queue.get()
+                    except TimeoutError:
+                        # The primary is in its slow tail; race a second model for the first token
+                        primary_stats.hedges += 1
+                        start(hedge_model)
+                        continue
+                else:
+                    index, event = await queue.get()
+
+                if winner is None:
+                    if event is _DONE:
+                        continue
+                    if event.type == StreamEventType.ERROR:
+                        errors.add(index)
+                        if len(errors) == len(racers):
+                            yield event
+                            return
+                        continue
+
+                    winner = index
+                    if winner:
+                        primary_stats.hedge_wins += 1
+                    # Losers never produced a token; their elapsed time is a lower bound on their TTFT
+                    now = time.perf_counter()
+                    for loser, (model, task, started) in enumerate(racers):
+                        if loser != winner and loser not in errors:
+                            self._model_stats.record_ttft(model, now - started)
+                            task.cancel()
+
+                if index != winner:
+                    continue
+                if event is _DONE:
+                    return
+                yield event
+
+        finally:
+            # Cancelling closes the losing upstream stream so it stops generating billed tokens
+            for _, task, _ in racers:
+                task.cancel()
+            await asyncio.gather(*(task for _, task, _ in racers), return_exceptions=True)
+
+    async def _request(
+        self,
+        kwargs: dict[str, Any],
+        timer: RequestTimer | None = None,
+        expires: float | None = None,
+    ) -> AsyncGenerator[StreamEvent, None]:
+        # Imported here rather than at module load; openai is by far the slowest import
+        from openai import APIConnectionError, APIError, APIStatusError, RateLimitError
+
+        client = self.get_client()
+        stream = kwargs["stream"]
+        # Charged up front and settled against the reported usage once the response completes
+        estimated_tokens = sum(estimate_tokens(message.get("content") or "") for message in kwargs["messages"])
 
         for attempt in range(self._max_retries + 1):
+            if expires is not None and asyncio.get_running_loop().time() >= expires:
+                # Spent in backoff; another attempt could only be cut off before its first token
+                yield StreamEvent.create_msg_complete(DEADLINE_FINISH_REASON, None)
+                return
+
+            if not self._breaker.allow():
+                # Fail fast while the provider is down instead of holding the session through retries
+                yield StreamEvent.create_error(
+                    f"Provider unavailable, retry in {self._breaker.retry_in():.0f}s"
+                )
+                return
+
             try:
-                if stream:
-                    async for event in self._stream_response(client, kwargs):
-                        yield event
-                else:
-                    event = await self._non_stream_response(client, kwargs)
-                    yield event
+                # A probe that ends without a verdict (a 4xx, a 429, a cancelled caller) frees the
+                # half-open breaker for the next request instead of blocking it until the timeout
+                with self._breaker.probing():
+                    async with self._limiter.slot(estimated_tokens) as release:
+                        if stream:
+                            async with aclosing(self._stream_response(client, kwargs, expires, release)) as events:
+                                async for event in events:
+                                    if event.type == StreamEventType.MESSAGE_COMPLETE:
+                                        self._settle_usage(event, estimated_tokens)
+                                    yield event
+                        else:
+                            for event in await self._non_stream_response(client, kwargs, expires):
+                                if event.type == StreamEventType.MESSAGE_COMPLETE:
+                                    self._settle_usage(event, estimated_tokens)
+                                yield event
+
+                self._breaker.record_success()
+                await self._limiter.record_success()
                 return 
 
             except RateLimitError as e:
+                retry_after = parse_retry_after(e.response.headers)
+                self._limiter.observe_headers(e.response.headers)
+                self._limiter.record_rate_limited(retry_after)
                 if attempt < self._max_retries:
-                    wait_time = 2**attempt
-                    await asyncio.sleep(wait_time)
+                    if timer:
+                        timer.retry()
+                    await asyncio.sleep(backoff_delay(attempt, retry_after))
                 else:
                     yield StreamEvent.create_error(f"Rate Limit Error: {e}")
                     return
 
             except APIConnectionError as e:
+                self._breaker.record_failure()
                 if attempt < self._max_retries:
-                    wait_time = 2**attempt
-                    await asyncio.sleep(wait_time)
+                    if timer:
+                        timer.retry()
+                    await asyncio.sleep(backoff_delay(attempt))
                 else:
                     yield StreamEvent.create_error(f"Connection error: {e}")
                     return
 
             except APIError as e:
+                if isinstance(e, APIStatusError) and e.status_code >= 500:
+                    self._breaker.record_failure()
                 yield StreamEvent.create_error(f"API error: {e}")
                 return
+
+    def _settle_usage(self, event: StreamEvent, estimated_tokens: int) -> None:
+        if event.usage:
+            self._limiter.record_usage(event.usage.total_tokens - estimated_tokens)
                 
     async def _stream_response(
         self,
         client: AsyncOpenAI,
-        kwargs: dict[str, Any]
+        kwargs: dict[str, Any],
+        expires: float | None = None,
+        on_headers: Callable[[], Awaitable[None]] | None = None,
     ) -> AsyncGenerator[StreamEvent, None]:
-        response = await client.chat.completions.create(**kwargs)
+        try:
+            async with asyncio.timeout_at(expires):
+                raw = await client.chat.completions.with_raw_response.create(**kwargs)
+        except TimeoutError:
+            yield StreamEvent.create_msg_complete(DEADLINE_FINISH_REASON, None)
+            return
+        self._limiter.observe_headers(raw.headers)
+        if on_headers:
+            await on_headers()
+        response = raw.parse()
 
         usage: TokenUsage | None = None
         finish_reason : str | None = None
+        # Only created once a response actually calls tools
+        tool_calls: ToolCallAssembler | None = None
+        chunks = response if expires is None else _until(response, expires)
 
-        async for chunk in response:
-            if hasattr(chunk, "usage") and chunk.usage:
-                usage = TokenUsage(
-                    prompt_tokens=chunk.usage.prompt_tokens,
-                    completion_tokens=chunk.usage.completion_tokens,
-                    total_tokens=chunk.usage.total_tokens,
-                    cached_tokens=chunk.usage.prompt_tokens_details.cached_tokens,
-                )
+        try:
+            async for chunk in chunks:
+                if hasattr(chunk, "usage") and chunk.usage:
+                    usage = TokenUsage(
+                        prompt_tokens=chunk.usage.prompt_tokens,
+                        completion_tokens=chunk.usage.completion_tokens,
+                        total_tokens=chunk.usage.total_tokens,
+                        cached_tokens=_cached_tokens(chunk.usage),
+                    )
+
+                if not chunk.choices:
+                    continue
+
+                choice = chunk.choices[0]
+                delta = choice.delta
+                content = delta.content
 
-            if not chunk.choices:
-                continue
-            
-            choice = chunk.choices[0]
-            delta = choice.delta
-            content = delta.content
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
 
-            if choice.finish_reason:
-                finish_reason = choice.finish_reason
+                if content:
+                    yield StreamEvent.create_delta(content)
 
-            if content:
-                yield StreamEvent.create_delta(content)
+                if delta.tool_calls:
+                    tool_calls = tool_calls or ToolCallAssembler()
+                    # Each call is handed on as soon as its arguments are complete, while the
+                    # model is still streaming the calls after it
+                    for tool_call in tool_calls.feed(delta.tool_calls):
+                        yield StreamEvent.create_tool_call(tool_call)
+        except TimeoutError:
+            finish_reason = DEADLINE_FINISH_REASON
+        finally:
+            if chunks is not response:
+                await chunks.aclose()
+            # Closing stops the upstream generation when the consumer stops reading early
+            await response.close()
 
+        # Past the deadline a call still being streamed is incomplete and is dropped
+        if tool_calls and finish_reason != DEADLINE_FINISH_REASON:
+            for tool_call in tool_calls.finish():
+                yield StreamEvent.create_tool_call(tool_call)
         yield StreamEvent.create_msg_complete(finish_reason, usage)
         
 
     async def _non_stream_response(
         self,
         client: AsyncOpenAI,
-        kwargs: dict[str, Any]
-    ) -> StreamEvent: 
-        response = await client.chat.completions.create(**kwargs)
+        kwargs: dict[str, Any],
+        expires: float | None = None,
+    ) -> list[StreamEvent]:
+        try:
+            async with asyncio.timeout_at(expires):
+                raw = await client.chat.completions.with_raw_response.create(**kwargs)
+        except TimeoutError:
+            return [StreamEvent.create_msg_complete(DEADLINE_FINISH_REASON, None)]
+        self._limiter.observe_headers(raw.headers)
+        response = raw.parse()
         choice = response.choices[0]
         message = choice.message
         content = message.content
@@ -116,9 +538,14 @@ class LLMClient:
                 prompt_tokens=response.usage.prompt_tokens,
                 completion_tokens=response.usage.completion_tokens,
                 total_tokens=response.usage.total_tokens,
-                cached_tokens=response.usage.prompt_tokens_details.cached_tokens,
+                cached_tokens=_cached_tokens(response.usage),
             )
 
-        return StreamEvent.create_msg_complete(finish_reason, usage, content)
+        events = [
+            StreamEvent.create_tool_call(ToolCall(call.id, call.function.name, call.function.arguments))
+            for call in message.tool_calls or []
+        ]
+        events.append(StreamEvent.create_msg_complete(finish_reason, usage, content))
+        return events
       
         
\ No newline at end of file
@@ -0,0 +1,266 @@
+from __future__ import annotations
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable
+from config import config
+from .model_stats import ModelLatencyTracker, get_model_stats
+from .response import TokenUsage
+
+TASK_CLASSES = ("routing", "synthesis", "summarization")
+
+@dataclass(frozen=True)
+class PolicyRule:
+    max_prompt_tokens: int | None  # None matches a prompt of any size
+    tiers: tuple[str, ...]
+    completion_tokens: int  # expected response length, for the latency and cost estimates
+
+
+class ModelPolicy:
+    # Which pool tiers may serve a task, by prompt size. Rules are tried in order and the first
+    # that fits the prompt wins, so a table reads like a routing table.
+    def __init__(self, rules: dict[str, list[PolicyRule]]) -> None:
+        self._rules = rules
+
+    @classmethod
+    def from_table(cls, table: dict[str, list[dict[str, Any]]]) -> ModelPolicy:
+        return cls(
+            {
+                task: [
+                    PolicyRule(
+                        max_prompt_tokens=row.get("max_prompt_tokens"),
+                        tiers=tuple(row.get("tiers") or ()),
+                        completion_tokens=int(row.get("completion_tokens") or 0),
+                    )
+                    for row in rows
+                ]
+                for task, rows in table.items()
+            }
+        )
+
+    def rule(self, task: str, prompt_tokens: int) -> PolicyRule | None:
+        for rule in self._rules.get(task, ()):
+            if rule.max_prompt_tokens is None or prompt_tokens <= rule.max_prompt_tokens:
+                return rule
+        return None
+
+
+@dataclass
+class SelectionDecision:
+    task: str
+    prompt_tokens: int
+    model: str
+    reason: str  # "policy", "pinned" (the caller named a model) or "unmatched" (no rule fit)
+    # Every model considered, best first, with its score; the rest are the fallbacks
+    candidates: tuple[tuple[str, float], ...] = ()
+    estimated_latency: float | None = None
+    estimated_cost: float | None = None
+    at: float = field(default_factory=time.time)
+    # Filled in once the response has been read
+    ttft: float | None = None
+    latency: float | None = None
+    completion_tokens: int | None = None
+    cost: float | None = None
+    failed: bool = False
+
+    @property
+    def fallbacks(self) -> list[str]:
+        return [model for model, _ in self.candidates if model != self.model]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "task": self.task,
+            "prompt_tokens": self.prompt_tokens,
+            "model": self.model,
+            "reason": self.reason,
+            "candidates": [[model, round(score, 4)] for model, score in self.candidates],
+            "estimated_latency": self.estimated_latency,
+            "estimated_cost": self.estimated_cost,
+            "at": self.at,
+            "ttft": self.ttft,
+            "latency": self.latency,
+            "completion_tokens": self.completion_tokens,
+            "cost": self.cost,
+            "failed": self.failed,
+        }
+
+
+@dataclass
+class SelectionStats:
+    selections: int = 0
+    failures: int = 0
+    ttft_sum: float = 0.0
+    ttft_count: int = 0
+    latency_sum: float = 0.0
+    estimated_latency_sum: float = 0.0
+    cost: float = 0.0
+    estimated_cost: float = 0.0
+
+    def to_dict(self) -> dict[str, float | int | None]:
+        # Estimated next to actual, so a policy that routes on wrong numbers shows up
+        return {
+            "selections": self.selections,
+            "failures": self.failures,
+            "ttft_avg": self.ttft_sum / self.ttft_count if self.ttft_count else None,
+            "latency_avg": self.latency_sum / self.selections if self.selections else None,
+            "estimated_latency_avg": self.estimated_latency_sum / self.selections if self.selections else None,
+            "cost": round(self.cost, 6),
+            "estimated_cost": round(self.estimated_cost, 6),
+        }
+
+
+SelectionHook = Callable[[SelectionDecision], None]
+
+class ModelSelector:
+    def __init__(
+        self,
+        pool: dict[str, dict[str, Any]] | None = None,
+        policy: ModelPolicy | None = None,
+        tracker: ModelLatencyTracker | None = None,
+    ) -> None:
+        self._pool = pool
+        self._policy = policy
+        self._tracker = tracker or get_model_stats()
+        # The configured table is parsed once, and again only if it is replaced
+        self._table: dict[str, list[dict[str, Any]]] | None = None
+        self._default_policy: ModelPolicy | None = None
+        self._decisions: deque[SelectionDecision] = deque(maxlen=config.LLM_SELECTION_LOG_SIZE)
+        self._stats: dict[tuple[str, str], SelectionStats] = {}
+        self._hooks: list[SelectionHook] = []
+
+    @property
+    def pool(self) -> dict[str, dict[str, Any]]:
+        return self._pool if self._pool is not None else config.LLM_MODEL_POOL
+
+    def policy(self) -> ModelPolicy:
+        if self._policy is not None:
+            return self._policy
+        if self._table is not config.LLM_SELECTION_POLICY:
+            self._table = config.LLM_SELECTION_POLICY
+            self._default_policy = ModelPolicy.from_table(self._table)
+        return self._default_policy
+
+    def estimate(self, model: str, prompt_tokens: int, completion_tokens: int) -> tuple[float, float, float]:
+        # (expected seconds to the last token, expected USD, recent error rate) from the
+        # model's rolling stats, or the defaults until it has enough of them
+        stats = self._tracker.get(model)
+        ttft = config.LLM_SELECTION_DEFAULT_TTFT
+        if len(stats.ttft_samples) >= config.LLM_SELECTION_MIN_SAMPLES:
+            ttft = stats.ttft_quantile(0.5)
+        tokens_per_second = config.LLM_SELECTION_DEFAULT_TOKENS_PER_SECOND
+        if len(stats.throughput_samples) >= config.LLM_SELECTION_MIN_SAMPLES:
+            tokens_per_second = stats.throughput() or tokens_per_second
+        error_rate = stats.error_rate if len(stats.outcomes) >= config.LLM_SELECTION_MIN_SAMPLES else 0.0
+
+        latency = ttft + completion_tokens / tokens_per_second
+        return latency, self.cost(model, prompt_tokens, completion_tokens), error_rate
+
+    def cost(self, model: str, prompt_tokens: int, completion_tokens: int) -> float:
+        prices = self.pool.get(model) or {}
+        return (
+            prompt_tokens * float(prices.get("prompt_cost", 0.0))
+            + completion_tokens * float(prices.get("completion_cost", 0.0))
+        ) / 1_000_000
+
+    def select(self, task: str, prompt_tokens: int, policy: ModelPolicy | None = None) -> SelectionDecision:
+        pool = self.pool
+        rule = (policy or self.policy()).rule(task, prompt_tokens)
+        reason = "policy"
+        models = [model for model, entry in pool.items() if rule and entry.get("tier") in rule.tiers]
+        if not models:
+            # A task or tier the table doesn't cover still gets the best of the whole pool
+            reason = "unmatched"
+            models = list(pool)
+        # A model whose window the prompt overflows would only fail or truncate
+        fitting = [model for model in models if prompt_tokens <= float(pool[model].get("context") or float("inf"))]
+        models = fitting or models
+        completion_tokens = rule.completion_tokens if rule else 0
+
+        scored: list[tuple[float, str, float, float, float]] = []
+        for model in models:
+            latency, cost, error_rate = self.estimate(model, prompt_tokens, completion_tokens)
+            score = latency * (1 + config.LLM_SELECTION_ERROR_PENALTY * error_rate)
+            score += config.LLM_SELECTION_COST_WEIGHT * cost
+            scored.append((score, model, latency, cost, error_rate))
+        scored.sort(key=lambda entry: entry[0])
+        # Models failing too often right now are tried last, not dropped, so they stay fallbacks
+        healthy = [entry for entry in scored if entry[4] <= config.LLM_SELECTION_MAX_ERROR_RATE]
+        ranked = healthy + [entry for entry in scored if entry not in healthy]
+
+        _, model, latency, cost, _ = ranked[0]
+        return SelectionDecision(
+            task=task,
+            prompt_tokens=prompt_tokens,
+            model=model,
+            reason=reason,
+            candidates=tuple((entry[1], entry[0]) for entry in ranked),
+            estimated_latency=latency,
+            estimated_cost=cost,
+        )
+
+    def pin(self, task: str, prompt_tokens: int, model: str) -> SelectionDecision:
+        # Recorded like a selection so pinned traffic serves as the baseline to compare against
+        return SelectionDecision(task=task, prompt_tokens=prompt_tokens, model=model, reason="pinned")
+
+    def finish(
+        self,
+        decision: SelectionDecision,
+        ttft: float | None,
+        latency: float,
+        usage: TokenUsage | None,
+        failed: bool,
+    ) -> None:
+        decision.ttft = ttft
+        decision.latency = latency
+        decision.failed = failed
+        if usage:
+            decision.completion_tokens = usage.completion_tokens
+            decision.cost = self.cost(decision.model, usage.prompt_tokens, usage.completion_tokens)
+
+        stats = self._stats.get((decision.task, decision.model))
+        if stats is None:
+            stats = self._stats[(decision.task, decision.model)] = SelectionStats()
+        stats.selections += 1
+        stats.failures += failed
+        if ttft is not None:
+            stats.ttft_sum += ttft
+            stats.ttft_count += 1
+        stats.latency_sum += latency
+        stats.estimated_latency_sum += decision.estimated_latency or 0.0
+        stats.cost += decision.cost or 0.0
+        stats.estimated_cost += decision.estimated_cost or 0.0
+
+        self._decisions.append(decision)
+        for hook in self._hooks:
+            try:
+                hook(decision)
+            except Exception:
+                # A decision log failing must never break the request it describes
+                pass
+
+    def add_hook(self, hook: SelectionHook) -> None:
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: SelectionHook) -> None:
+        if hook in self._hooks:
+            self._hooks.remove(hook)
+
+    def decisions(self) -> list[SelectionDecision]:
+        return [replace(decision) for decision in self._decisions]
+
+    def snapshot(self) -> dict[str, dict[str, dict[str, float | int | None]]]:
+        tasks: dict[str, dict[str, dict[str, float | int | None]]] = {}
+        for (task, model), stats in self._stats.items():
+            tasks.setdefault(task, {})[model] = stats.to_dict()
+        return tasks
+
+
+_selector: ModelSelector | None = None
+
+def get_model_selector() -> ModelSelector | None:
+    global _selector
+    if not config.LLM_MODEL_POOL:
+        return None
+    if _selector is None:
+        _selector = ModelSelector()
+    return _selector
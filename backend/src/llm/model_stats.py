@@ -0,0 +1,102 @@
+from __future__ import annotations
+import math
+from collections import deque
+from dataclasses import dataclass, field
+from config import config
+from .response import TokenUsage
+
+@dataclass
+class ModelStats:
+    requests: int = 0
+    errors: int = 0
+    fallbacks: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    usage: TokenUsage = field(default_factory=TokenUsage)
+    ttft_samples: deque[float] = field(default_factory=lambda: deque(maxlen=config.LLM_TTFT_WINDOW), repr=False)
+    # Completion tokens per second after the first token, and whether each recent request failed
+    throughput_samples: deque[float] = field(default_factory=lambda: deque(maxlen=config.LLM_TTFT_WINDOW), repr=False)
+    outcomes: deque[bool] = field(default_factory=lambda: deque(maxlen=config.LLM_TTFT_WINDOW), repr=False)
+
+    def ttft_quantile(self, quantile: float) -> float | None:
+        if not self.ttft_samples:
+            return None
+        ordered = sorted(self.ttft_samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(quantile * len(ordered)) - 1))
+        return ordered[index]
+
+    def throughput(self) -> float | None:
+        if not self.throughput_samples:
+            return None
+        ordered = sorted(self.throughput_samples)
+        return ordered[len(ordered) // 2]
+
+    @property
+    def error_rate(self) -> float:
+        # Over the recent window, unlike errors / requests which never forgets an outage
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
+
+    @property
+    def prompt_cache_ratio(self) -> float:
+        # Share of prompt tokens the provider served from its prefix cache
+        return self.usage.cached_tokens / self.usage.prompt_tokens if self.usage.prompt_tokens else 0.0
+
+    def to_dict(self) -> dict[str, float | int | None]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "fallbacks": self.fallbacks,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "prompt_tokens": self.usage.prompt_tokens,
+            "cached_tokens": self.usage.cached_tokens,
+            "prompt_cache_ratio": round(self.prompt_cache_ratio, 4),
+            "ttft_p50": self.ttft_quantile(0.5),
+            "ttft_p95": self.ttft_quantile(0.95),
+            "tokens_per_second_p50": self.throughput(),
+            "error_rate": round(self.error_rate, 4),
+        }
+
+
+class ModelLatencyTracker:
+    def __init__(self) -> None:
+        self._models: dict[str, ModelStats] = {}
+
+    def get(self, model: str) -> ModelStats:
+        stats = self._models.get(model)
+        if stats is None:
+            stats = self._models[model] = ModelStats()
+        return stats
+
+    def record_ttft(self, model: str, seconds: float) -> None:
+        self.get(model).ttft_samples.append(seconds)
+
+    def record_throughput(self, model: str, tokens_per_second: float) -> None:
+        self.get(model).throughput_samples.append(tokens_per_second)
+
+    def record_outcome(self, model: str, failed: bool) -> None:
+        self.get(model).outcomes.append(failed)
+
+    def record_usage(self, model: str, usage: TokenUsage) -> None:
+        stats = self.get(model)
+        stats.usage = stats.usage + usage
+
+    def hedge_delay(self, model: str) -> float:
+        stats = self.get(model)
+        if len(stats.ttft_samples) < config.LLM_HEDGE_MIN_SAMPLES:
+            return config.LLM_HEDGE_DEFAULT_DELAY
+        # Only the slow tail gets hedged, so the extra spend tracks the model's own latency
+        delay = stats.ttft_quantile(config.LLM_HEDGE_TTFT_QUANTILE)
+        return min(config.LLM_HEDGE_MAX_DELAY, max(config.LLM_HEDGE_MIN_DELAY, delay))
+
+    def snapshot(self) -> dict[str, dict[str, float | int | None]]:
+        return {model: stats.to_dict() for model, stats in self._models.items()}
+
+
+_tracker: ModelLatencyTracker | None = None
+
+def get_model_stats() -> ModelLatencyTracker:
+    global _tracker
+    if _tracker is None:
+        _tracker = ModelLatencyTracker()
+    return _tracker
@@ -0,0 +1,346 @@
+from __future__ import annotations
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, replace
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Mapping
+from config import config
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+@dataclass
+class RateLimiterStats:
+    concurrency_limit: float = 0.0
+    in_flight: int = 0
+    acquires: int = 0
+    throttled: int = 0
+    throttled_seconds: float = 0.0
+    rate_limited: int = 0
+    decreases: int = 0
+    requests_per_minute: float = 0.0
+    tokens_per_minute: float = 0.0
+
+
+@dataclass
+class CircuitBreakerStats:
+    state: str = "closed"
+    consecutive_failures: int = 0
+    opens: int = 0
+    rejected: int = 0
+
+
+def _parse_duration(value: str) -> float | None:
+    # OpenAI-style reset headers look like "1s", "6m0s" or "250ms"
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str] | None) -> float | None:
+    if not headers:
+        return None
+
+    milliseconds = headers.get("retry-after-ms")
+    if milliseconds:
+        try:
+            return max(0.0, float(milliseconds) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    if retry_after is not None:
+        # Spread the herd a little past the moment the provider said to come back
+        return retry_after + random.uniform(0, config.RETRY_BASE_DELAY)
+    # Full jitter so sessions that failed together don't retry together
+    return random.uniform(0, min(config.RETRY_MAX_DELAY, config.RETRY_BASE_DELAY * 2**attempt))
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, burst_seconds: float = config.RATE_LIMIT_BURST_SECONDS) -> None:
+        self._burst_seconds = burst_seconds
+        self._rate = per_minute / 60
+        self._capacity = max(1.0, self._rate * burst_seconds)
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    @property
+    def per_minute(self) -> float:
+        return self._rate * 60
+
+    def set_rate(self, per_minute: float) -> None:
+        self._refill()
+        self._rate = per_minute / 60
+        self._capacity = max(1.0, self._rate * self._burst_seconds)
+        self._tokens = min(self._tokens, self._capacity)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def delay(self, amount: float) -> float:
+        if self._rate <= 0:
+            return 0.0
+        self._refill()
+        # Requests larger than the burst only wait for a full bucket
+        needed = min(amount, self._capacity)
+        if self._tokens >= needed:
+            return 0.0
+        return (needed - self._tokens) / self._rate
+
+    def consume(self, amount: float) -> None:
+        if self._rate > 0:
+            self._refill()
+            # May go negative, which makes later callers wait off the debt
+            self._tokens -= amount
+
+
+class AdaptiveRateLimiter:
+    def __init__(
+        self,
+        requests_per_minute: float = config.RATE_LIMIT_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = config.RATE_LIMIT_TOKENS_PER_MINUTE,
+        initial_concurrency: int = config.RATE_LIMIT_INITIAL_CONCURRENCY,
+        min_concurrency: int = config.RATE_LIMIT_MIN_CONCURRENCY,
+        max_concurrency: int = config.RATE_LIMIT_MAX_CONCURRENCY,
+    ) -> None:
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._limit = float(initial_concurrency)
+        self._min_concurrency = min_concurrency
+        self._max_concurrency = max_concurrency
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+        self._stats = RateLimiterStats()
+
+    def _has_slot(self) -> bool:
+        return self._in_flight < max(self._min_concurrency, int(self._limit))
+
+    def _delay(self, tokens: int) -> float:
+        return max(
+            self._blocked_until - time.monotonic(),
+            self._requests.delay(1),
+            self._tokens.delay(tokens),
+        )
+
+    async def acquire(self, tokens: int = 0) -> None:
+        self._stats.acquires += 1
+        throttled = False
+        started = time.monotonic()
+
+        async with self._condition:
+            while True:
+                if not self._has_slot():
+                    throttled = True
+                    await self._condition.wait_for(self._has_slot)
+
+                delay = self._delay(tokens)
+                if delay <= 0:
+                    break
+
+                # Sleep without the lock so releases and other waiters keep moving
+                throttled = True
+                self._condition.release()
+                try:
+                    await asyncio.sleep(delay * random.uniform(1.0, 1.1))
+                finally:
+                    await self._condition.acquire()
+
+            self._requests.consume(1)
+            self._tokens.consume(tokens)
+            self._in_flight += 1
+
+        if throttled:
+            self._stats.throttled += 1
+            self._stats.throttled_seconds += time.monotonic() - started
+
+    async def release(self) -> None:
+        # Given back before the first await: a release cancelled while it waits for the lock (a
+        # hedge loser is cancelled by the winner and again in cleanup) must not leak the slot,
+        # and the shielded wake-up still reaches a waiter
+        self._in_flight -= 1
+        await asyncio.shield(self._notify())
+
+    async def _notify(self) -> None:
+        async with self._condition:
+            self._condition.notify()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0) -> AsyncIterator[Callable[[], Awaitable[None]]]:
+        # Yields a release the caller can call early, once the provider has accepted the request:
+        # the slot caps requests waiting on the provider, not streams being read
+        await self.acquire(tokens)
+        released = False
+
+        async def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                await self.release()
+
+        try:
+            yield release
+        finally:
+            await release()
+
+    async def record_success(self) -> None:
+        async with self._condition:
+            # Additive increase: roughly one more slot per window of successful requests
+            previous = int(self._limit)
+            self._limit = min(self._max_concurrency, self._limit + 1 / self._limit)
+            if int(self._limit) > previous:
+                self._condition.notify()
+
+    def record_rate_limited(self, retry_after: float | None = None) -> None:
+        now = time.monotonic()
+        self._stats.rate_limited += 1
+
+        # Every session waits out the same Retry-After instead of retrying on its own clock
+        if retry_after is not None:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+        # Multiplicative decrease, once per cooldown so one burst of 429s doesn't collapse the limit
+        if now - self._last_decrease >= config.RATE_LIMIT_DECREASE_COOLDOWN:
+            self._limit = max(self._min_concurrency, self._limit * config.RATE_LIMIT_DECREASE_FACTOR)
+            self._last_decrease = now
+            self._stats.decreases += 1
+
+    def record_usage(self, tokens: int) -> None:
+        # Settles the difference between the up-front estimate and the reported usage
+        if tokens:
+            self._tokens.consume(tokens)
+
+    def observe_headers(self, headers: Mapping[str, str] | None) -> None:
+        if not headers:
+            return
+
+        # Learn the key's real per-minute limits when the provider reports them
+        for name, bucket in (("x-ratelimit-limit-requests", self._requests), ("x-ratelimit-limit-tokens", self._tokens)):
+            value = headers.get(name)
+            if value:
+                try:
+                    limit = float(value)
+                except ValueError:
+                    continue
+                if limit > 0 and limit != bucket.per_minute:
+                    bucket.set_rate(limit)
+
+        # Stop sending once the window is exhausted rather than waiting for the 429
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            reset = headers.get(f"x-ratelimit-reset-{kind}")
+            if remaining == "0" and reset:
+                seconds = _parse_duration(reset)
+                if seconds:
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def stats(self) -> RateLimiterStats:
+        self._stats.concurrency_limit = round(self._limit, 2)
+        self._stats.in_flight = self._in_flight
+        self._stats.requests_per_minute = self._requests.per_minute
+        self._stats.tokens_per_minute = self._tokens.per_minute
+        return replace(self._stats)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = config.CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = config.CIRCUIT_RESET_TIMEOUT,
+    ) -> None:
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probe_started: float | None = None
+        self._stats = CircuitBreakerStats()
+
+    @property
+    def state(self) -> str:
+        return self._stats.state
+
+    def retry_in(self) -> float:
+        return max(0.0, self._opened_at + self._reset_timeout - time.monotonic())
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+
+        if self._stats.state == "open":
+            if now - self._opened_at < self._reset_timeout:
+                self._stats.rejected += 1
+                return False
+            self._stats.state = "half_open"
+            self._probe_started = None
+
+        if self._stats.state == "half_open":
+            # One probe at a time; a probe that never reported back is replaced after the timeout
+            if self._probe_started is not None and now - self._probe_started < self._reset_timeout:
+                self._stats.rejected += 1
+                return False
+            self._probe_started = now
+
+        return True
+
+    @contextmanager
+    def probing(self) -> Iterator[None]:
+        # Wraps a request allow() let through; in half-open that request is the probe
+        probe = self._stats.state == "half_open"
+        try:
+            yield
+        finally:
+            if probe and self._stats.state == "half_open":
+                self._probe_started = None
+
+    def record_success(self) -> None:
+        self._stats.state = "closed"
+        self._stats.consecutive_failures = 0
+        self._probe_started = None
+
+    def record_failure(self) -> None:
+        self._stats.consecutive_failures += 1
+        if self._stats.state == "half_open" or self._stats.consecutive_failures >= self._failure_threshold:
+            if self._stats.state != "open":
+                self._stats.opens += 1
+            self._stats.state = "open"
+            self._opened_at = time.monotonic()
+            self._probe_started = None
+
+    def stats(self) -> CircuitBreakerStats:
+        return replace(self._stats)
+
+
+# Process-wide so every session draws from the same budget
+_rate_limiter: AdaptiveRateLimiter | None = None
+_circuit_breaker: CircuitBreaker | None = None
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = AdaptiveRateLimiter()
+    return _rate_limiter
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
@@ -1,8 +1,10 @@
 from __future__ import annotations
+import json
 from dataclasses import dataclass
 from enum import Enum
+from typing import Any
 
-@dataclass
+@dataclass(slots=True)
 class TextDelta:
     content: str
 
@@ -10,11 +12,34 @@ class TextDelta:
         return self.content
 
 
+@dataclass(slots=True)
+class ToolCall:
+    id: str
+    name: str
+    arguments: str  # JSON text exactly as the model produced it
+
+    def parse_arguments(self) -> dict[str, Any]:
+        # Models send an empty string for calls without parameters
+        if not self.arguments.strip():
+            return {}
+        value = json.loads(self.arguments)
+        if not isinstance(value, dict):
+            raise ValueError("arguments must be a JSON object")
+        return value
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"id": self.id, "type": "function", "function": {"name": self.name, "arguments": self.arguments}}
+
+
 class StreamEventType:
     TEXT_DELTA = "text_delta"
+    TOOL_CALL = "tool_call"
     MESSAGE_COMPLETE = "message_complete"
     ERROR = "error"
 
+# Set on a MESSAGE_COMPLETE when the request's deadline cut the response short
+DEADLINE_FINISH_REASON = "deadline"
+
 @dataclass
 class TokenUsage:
     prompt_tokens: int = 0
@@ -30,13 +55,15 @@ class TokenUsage:
             cached_tokens=self.cached_tokens + other.cached_tokens,
         )
 
-@dataclass
+# One of these is allocated per streamed chunk, so it carries no per-instance __dict__
+@dataclass(slots=True)
 class StreamEvent:
     type: StreamEventType
     text_delta: TextDelta | None = None
     error: str | None = None
     finish_reason: str | None = None
     usage: TokenUsage | None = None
+    tool_call: ToolCall | None = None
 
     @classmethod
     def create_error(cls, error: str) -> StreamEvent:
@@ -52,6 +79,13 @@ class StreamEvent:
             text_delta=TextDelta(content)
         )
 
+    @classmethod
+    def create_tool_call(cls, tool_call: ToolCall) -> StreamEvent:
+        return cls(
+            type=StreamEventType.TOOL_CALL,
+            tool_call=tool_call,
+        )
+
     @classmethod
     def create_msg_complete(
         cls,
@@ -0,0 +1,179 @@
+from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+from config import config
+from .response import DEADLINE_FINISH_REASON, StreamEvent, StreamEventType, TextDelta, TokenUsage, ToolCall
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    stores: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def make_cache_key(kwargs: dict[str, Any]) -> str:
+    # Canonical form: key order and whitespace must not change the hash
+    canonical = json.dumps(kwargs, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _event_to_dict(event: StreamEvent) -> dict[str, Any]:
+    return {
+        "type": event.type,
+        "content": event.text_delta.content if event.text_delta else None,
+        "error": event.error,
+        "finish_reason": event.finish_reason,
+        "usage": event.usage.__dict__ if event.usage else None,
+        "tool_call": [event.tool_call.id, event.tool_call.name, event.tool_call.arguments] if event.tool_call else None,
+    }
+
+
+def _event_from_dict(data: dict[str, Any]) -> StreamEvent:
+    return StreamEvent(
+        type=data["type"],
+        text_delta=TextDelta(data["content"]) if data["content"] is not None else None,
+        error=data["error"],
+        finish_reason=data["finish_reason"],
+        usage=TokenUsage(**data["usage"]) if data["usage"] else None,
+        tool_call=ToolCall(*data["tool_call"]) if data.get("tool_call") else None,
+    )
+
+
+class _SqliteTier:
+    def __init__(self, path: str) -> None:
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache (key TEXT PRIMARY KEY, expires_at REAL, events TEXT)"
+        )
+        self._connection.commit()
+
+    def get(self, key: str) -> tuple[float, list[StreamEvent]] | None:
+        row = self._connection.execute(
+            "SELECT expires_at, events FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], [_event_from_dict(data) for data in json.loads(row[1])]
+
+    def set(self, key: str, expires_at: float, events: list[StreamEvent]) -> None:
+        payload = json.dumps([_event_to_dict(event) for event in events])
+        self._connection.execute(
+            "INSERT OR REPLACE INTO response_cache (key, expires_at, events) VALUES (?, ?, ?)",
+            (key, expires_at, payload),
+        )
+        self._connection.commit()
+
+    def delete(self, key: str) -> None:
+        self._connection.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+        self._connection.commit()
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int = config.RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = config.RESPONSE_CACHE_TTL,
+        sqlite_path: str | None = config.RESPONSE_CACHE_PATH,
+    ) -> None:
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, list[StreamEvent]]] = OrderedDict()
+        self._disk = _SqliteTier(sqlite_path) if sqlite_path else None
+        # sqlite3 connections are not safe for concurrent use from worker threads
+        self._disk_lock = asyncio.Lock()
+        self.stats = CacheStats()
+
+    async def get(self, key: str) -> list[StreamEvent] | None:
+        now = time.monotonic()
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            expires_at, events = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.stats.hits += 1
+                self.stats.memory_hits += 1
+                return events
+            del self._entries[key]
+            self.stats.expirations += 1
+
+        if self._disk:
+            async with self._disk_lock:
+                stored = await asyncio.to_thread(self._disk.get, key)
+            if stored is not None:
+                # Disk entries carry wall-clock expiry so they survive restarts
+                expires_at, events = stored
+                remaining = expires_at - time.time()
+                if remaining > 0:
+                    self._remember(key, now + remaining, events)
+                    self.stats.hits += 1
+                    self.stats.disk_hits += 1
+                    return events
+                self.stats.expirations += 1
+                async with self._disk_lock:
+                    await asyncio.to_thread(self._disk.delete, key)
+
+        self.stats.misses += 1
+        return None
+
+    async def set(self, key: str, events: list[StreamEvent]) -> None:
+        self._remember(key, time.monotonic() + self._ttl, events)
+        self.stats.stores += 1
+
+        if self._disk:
+            async with self._disk_lock:
+                await asyncio.to_thread(self._disk.set, key, time.time() + self._ttl, events)
+
+    def _remember(self, key: str, expires_at: float, events: list[StreamEvent]) -> None:
+        self._entries[key] = (expires_at, events)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def close(self) -> None:
+        if self._disk:
+            self._disk.close()
+            self._disk = None
+
+
+_response_cache: ResponseCache | None = None
+
+def get_response_cache() -> ResponseCache | None:
+    global _response_cache
+    if not config.RESPONSE_CACHE_ENABLED:
+        return None
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+
+def is_cacheable(events: list[StreamEvent]) -> bool:
+    # A response cut off by its deadline is partial and must not be replayed as the answer
+    return (
+        bool(events)
+        and events[-1].type == StreamEventType.MESSAGE_COMPLETE
+        and events[-1].finish_reason != DEADLINE_FINISH_REASON
+    )
@@ -0,0 +1,160 @@
+from __future__ import annotations
+import asyncio
+from contextlib import aclosing
+from dataclasses import dataclass, replace
+from typing import AsyncGenerator, Callable
+from config import config
+from .response import StreamEvent
+
+_DONE = object()
+
+@dataclass
+class SingleFlightStats:
+    started: int = 0  # upstream requests opened
+    joined: int = 0  # requests served by one already in flight, each an upstream stream saved
+    caught_up: int = 0  # subscribers that replayed the buffered prefix, after joining late or falling behind
+    overflows: int = 0  # times a subscriber's buffer filled before it read it
+    abandoned: int = 0  # upstream requests cancelled because every subscriber left
+    active: int = 0
+
+
+class _Subscriber:
+    __slots__ = ("queue", "position", "behind")
+
+    def __init__(self, buffer: int, behind: bool) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(buffer)
+        self.position = 0  # events delivered so far, i.e. its index into the flight's prefix
+        self.behind = behind  # reading from the prefix rather than from its own queue
+
+
+class _Flight:
+    def __init__(self) -> None:
+        # Every event so far: late joiners and subscribers that fell behind replay from it
+        self.events: list[StreamEvent] = []
+        self.subscribers: set[_Subscriber] = set()
+        self.done = False
+        self.error: BaseException | None = None
+        self.task: asyncio.Task | None = None
+
+
+class SingleFlight:
+    # Concurrent identical requests share one upstream stream. It is read by a task of its own,
+    # so any subscriber can leave without ending it for the rest.
+    def __init__(self, buffer: int = config.SINGLE_FLIGHT_BUFFER) -> None:
+        self._buffer = buffer
+        self._flights: dict[str, _Flight] = {}
+        self._stats = SingleFlightStats()
+
+    async def subscribe(
+        self,
+        key: str,
+        start: Callable[[], AsyncGenerator[StreamEvent, None]],
+    ) -> AsyncGenerator[StreamEvent, None]:
+        flight = self._flights.get(key)
+        if flight is None:
+            # Joiners share this request's deadline and limits along with its stream
+            flight = self._flights[key] = _Flight()
+            flight.task = asyncio.create_task(self._pump(key, flight, start))
+            self._stats.started += 1
+            self._stats.active = len(self._flights)
+            subscriber = _Subscriber(self._buffer, behind=False)
+        else:
+            self._stats.joined += 1
+            subscriber = _Subscriber(self._buffer, behind=bool(flight.events))
+            if subscriber.behind:
+                self._stats.caught_up += 1
+        flight.subscribers.add(subscriber)
+
+        try:
+            while True:
+                # Whatever is queued comes first; it precedes anything still to be read from the prefix
+                if not subscriber.queue.empty():
+                    item = subscriber.queue.get_nowait()
+                elif subscriber.behind:
+                    if subscriber.position < len(flight.events):
+                        item = flight.events[subscriber.position]
+                    elif flight.done:
+                        break
+                    else:
+                        # Caught up; live events go to its queue from here on
+                        subscriber.behind = False
+                        continue
+                else:
+                    item = await subscriber.queue.get()
+
+                if item is _DONE:
+                    break
+                subscriber.position += 1
+                yield item
+
+            if isinstance(flight.error, asyncio.CancelledError):
+                yield StreamEvent.create_error("Shared request was cancelled")
+            elif flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers.discard(subscriber)
+            if not flight.subscribers and not flight.done:
+                await self._abandon(key, flight)
+
+    async def _pump(
+        self,
+        key: str,
+        flight: _Flight,
+        start: Callable[[], AsyncGenerator[StreamEvent, None]],
+    ) -> None:
+        try:
+            async with aclosing(start()) as events:
+                async for event in events:
+                    self._publish(flight, event)
+        except BaseException as e:
+            flight.error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            flight.done = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+                self._stats.active = len(self._flights)
+            for subscriber in flight.subscribers:
+                if not subscriber.behind:
+                    try:
+                        subscriber.queue.put_nowait(_DONE)
+                    except asyncio.QueueFull:
+                        subscriber.behind = True
+
+    def _publish(self, flight: _Flight, event: StreamEvent) -> None:
+        flight.events.append(event)
+        for subscriber in flight.subscribers:
+            if subscriber.behind:
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A slow reader never holds up the stream or the others: it stops being fed
+                # and catches up from the prefix once it has drained its queue
+                subscriber.behind = True
+                self._stats.overflows += 1
+                self._stats.caught_up += 1
+
+    async def _abandon(self, key: str, flight: _Flight) -> None:
+        # Nobody is left to read it, so the upstream stream is closed rather than run to the end
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+            self._stats.active = len(self._flights)
+        self._stats.abandoned += 1
+        flight.task.cancel()
+        await asyncio.gather(flight.task, return_exceptions=True)
+
+    def stats(self) -> SingleFlightStats:
+        return replace(self._stats)
+
+
+_single_flight: SingleFlight | None = None
+
+def get_single_flight() -> SingleFlight | None:
+    global _single_flight
+    if not config.SINGLE_FLIGHT_ENABLED:
+        return None
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
@@ -0,0 +1,88 @@
+from __future__ import annotations
+import json
+from typing import Any, Iterable
+from .response import ToolCall
+
+class _PendingCall:
+    __slots__ = ("id", "name", "parts", "depth", "in_string", "escaped", "closed", "emitted")
+
+    def __init__(self) -> None:
+        self.id = ""
+        self.name = ""
+        self.parts: list[str] = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.closed = False
+        self.emitted = False
+
+    def feed(self, fragment: str) -> bool:
+        # Tracks nesting outside of strings, so the object is known to be closed the moment its
+        # last brace arrives instead of when the model moves on to the next call
+        self.parts.append(fragment)
+        if self.closed:
+            return False
+        for char in fragment:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.closed = True
+                    return True
+        return False
+
+    def build(self, index: int) -> ToolCall:
+        self.emitted = True
+        # Some providers omit ids; the turn still needs one to pair the call with its result
+        return ToolCall(id=self.id or f"call_{index}", name=self.name, arguments="".join(self.parts))
+
+
+class ToolCallAssembler:
+    def __init__(self) -> None:
+        self._calls: dict[int, _PendingCall] = {}
+
+    def feed(self, deltas: Iterable[Any]) -> list[ToolCall]:
+        ready: list[ToolCall] = []
+        for delta in deltas:
+            index = delta.index or 0
+            # Calls stream one after another, so a new index also finishes every earlier one
+            for other, call in self._calls.items():
+                if other < index and not call.emitted and call.name:
+                    ready.append(call.build(other))
+
+            call = self._calls.get(index)
+            if call is None:
+                call = self._calls[index] = _PendingCall()
+            if delta.id:
+                call.id = delta.id
+
+            function = delta.function
+            if function is None:
+                continue
+            if function.name:
+                call.name += function.name
+            if function.arguments and call.feed(function.arguments) and not call.emitted and call.name:
+                if _is_json("".join(call.parts)):
+                    ready.append(call.build(index))
+        return ready
+
+    def finish(self) -> list[ToolCall]:
+        return [call.build(index) for index, call in sorted(self._calls.items()) if not call.emitted and call.name]
+
+
+def _is_json(text: str) -> bool:
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
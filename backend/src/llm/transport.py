@@ -0,0 +1,74 @@
+from __future__ import annotations
+import asyncio
+from typing import TYPE_CHECKING, AsyncIterator
+import httpx
+
+if TYPE_CHECKING:
+    from .client_pool import PoolStats
+
+_SSE_DONE = b"data: [DONE]"
+_DRAIN_TIMEOUT = 1.0
+
+class TrackedStream(httpx.AsyncByteStream):
+    # Keeps the request counted as in flight until the (possibly streamed) body is closed
+    def __init__(self, stream: httpx.AsyncByteStream, stats: PoolStats) -> None:
+        self._stream = stream
+        self._stats = stats
+        self._closed = False
+        self._saw_done = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            if _SSE_DONE in chunk:
+                self._saw_done = True
+            yield chunk
+
+    async def aclose(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._stats.in_flight -= 1
+            if self._saw_done:
+                await self._drain()
+        await self._stream.aclose()
+
+    async def _drain(self) -> None:
+        # The openai SDK stops reading at "[DONE]" and closes the response before the
+        # chunked terminator is consumed, which makes httpcore discard the connection.
+        # Reading the few remaining bytes lets the connection go back to the pool.
+        try:
+            async with asyncio.timeout(_DRAIN_TIMEOUT):
+                async for _ in self._stream:
+                    pass
+        except (TimeoutError, httpx.HTTPError):
+            pass
+
+
+class TrackingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: PoolStats, max_connections: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._stats = stats
+        self._max_connections = max_connections
+
+    @property
+    def open_connections(self) -> int:
+        connections = getattr(self._pool, "connections", [])
+        return sum(1 for connection in connections if not connection.is_closed())
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._stats.requests += 1
+        if self._stats.in_flight >= self._max_connections:
+            self._stats.waits += 1
+
+        self._stats.in_flight += 1
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self._stats.in_flight -= 1
+            raise
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=TrackedStream(response.stream, self._stats),
+            extensions=response.extensions,
+        )
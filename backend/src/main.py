@@ -1,7 +1,83 @@
+import argparse
 import asyncio
+import multiprocessing
+import signal
+import socket
+from api import AgentServer
+from config import config
+from llm import close_client_pools, prewarm_client_pool
+from prompts import get_shared_system_prompt
+from utils import warm_up_tokenizer
+
+async def warm_up() -> None:
+    # Load the BPE ranks and open upstream connections before the first request needs them;
+    # the BPE file loads in a thread while the SDK imports and handshakes run on the loop
+    tokenizer = asyncio.create_task(asyncio.to_thread(warm_up_tokenizer, config.DEFAULT_AI_MODEL))
+    await prewarm_client_pool()
+    await tokenizer
+    get_shared_system_prompt(config.DEFAULT_AI_MODEL)
+
+
+async def main(sock: socket.socket) -> None:
+    await warm_up()
+
+    app = AgentServer()
+    server = await asyncio.start_server(app.handle_connection, sock=sock)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            # Signal handlers are unavailable on Windows event loops
+            pass
+
+    async with server:
+        await stop.wait()
+
+    await app.close()
+    await close_client_pools()
+
+
+def _run_worker(sock: socket.socket) -> None:
+    asyncio.run(main(sock))
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.setblocking(False)
+
+    # Workers are forked after binding so every process accepts from the same socket
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        _run_worker(sock)
+        return
+
+    # Modules and BPE ranks loaded before forking are shared copy-on-write, so workers skip both;
+    # clients and connections hold loop state and are still created per worker
+    import openai.resources.chat  # noqa: F401
+    warm_up_tokenizer(config.DEFAULT_AI_MODEL)
+
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_run_worker, args=(sock,)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+    finally:
+        sock.close()
 
-async def main() -> None:
-    # TODO add server functionality to activate backend
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Nexus v2 agent server")
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS)
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.workers)
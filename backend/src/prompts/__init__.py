@@ -1 +1,2 @@
-from .router import get_system_prompt
+from .router import SystemPrompt, get_system_prompt, get_shared_system_prompt
+from .compaction import get_compaction_prompt
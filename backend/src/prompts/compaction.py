@@ -0,0 +1,12 @@
+def get_compaction_prompt() -> str:
+    return """# Conversation Compaction
+
+You are summarizing the earlier part of a conversation between a user and Nexus, an AI event production agent, so it can continue without the full transcript.
+
+Write a concise summary that preserves:
+- The user's goals, decisions and stated preferences
+- Concrete details such as names, companies, dates, amounts, venues and vendors
+- Subagents that were invoked and their results
+- Open questions and anything the user is still waiting on
+
+If a previous summary is provided, merge it with the new messages into a single summary. Do not add information that is not in the conversation. Output only the summary."""
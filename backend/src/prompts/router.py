@@ -1,6 +1,40 @@
+from dataclasses import dataclass, field
+from typing import Any
 from agents.subagents import registry
+from utils import count_tokens
+
+@dataclass(frozen=True)
+class SystemPrompt:
+    content: str
+    token_count: int
+    # One dict reused by every request so the prompt prefix stays byte-identical
+    message: dict[str, Any] = field(repr=False, compare=False)
+
+
+_rendered: tuple[int, str] | None = None
+_shared: dict[str, SystemPrompt] = {}
 
 def get_system_prompt() -> str:
+    global _rendered
+    if _rendered is None or _rendered[0] != registry.version:
+        _rendered = (registry.version, _render_system_prompt())
+        _shared.clear()
+    return _rendered[1]
+
+
+def get_shared_system_prompt(model: str) -> SystemPrompt:
+    content = get_system_prompt()
+    prompt = _shared.get(model)
+    if prompt is None:
+        prompt = _shared[model] = SystemPrompt(
+            content=content,
+            token_count=count_tokens(content, model) if content else 0,
+            message={"role": "system", "content": content},
+        )
+    return prompt
+
+
+def _render_system_prompt() -> str:
     parts = []
 
     # Identity
@@ -77,7 +111,7 @@ If no subagent can fulfill the request:
 "I don't have a specialized agent for that task. [Explain what you can do instead or ask for clarification]"
 
 ### Partial Matches
-If multiple subagents are needed, invoke them sequentially.
+If multiple subagents are needed and their tasks are independent, invoke them together in the same turn so they run concurrently. Invoke them one after another only when a later call depends on an earlier result.
 
 ## Clarification Protocol
 
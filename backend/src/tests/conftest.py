@@ -0,0 +1,44 @@
+import pytest
+from benchmarks.mock_server import MockLLMServer, MockResponseSettings
+from config import config
+from llm import AdaptiveRateLimiter, CircuitBreaker, LLMClient, SingleFlight, close_client_pools
+
+# Command-line scripts that talk to OpenRouter live, not pytest tests
+collect_ignore = ["test_agents.py", "test_llm.py"]
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+async def mock_llm(monkeypatch):
+    # A local server per test; tests change its settings in place. The shared client pools
+    # hold connections bound to this test's loop, so they are closed with it.
+    settings = MockResponseSettings(ttft=0.01, tokens_per_second=0, completion_tokens=8, retry_after=0.05)
+    async with MockLLMServer(settings, seed=0) as server:
+        monkeypatch.setattr(config, "BASE_URL", server.url)
+        monkeypatch.setattr(config, "OPENROUTER_API_KEY", "mock-key")
+        monkeypatch.setattr(config, "RETRY_BASE_DELAY", 0.01)
+        try:
+            yield server
+        finally:
+            await close_client_pools()
+
+
+@pytest.fixture
+async def make_client():
+    # Clients with their own limiter, breaker and flights, so no test sees another's state
+    clients: list[LLMClient] = []
+
+    def make(**parts) -> LLMClient:
+        parts.setdefault("limiter", AdaptiveRateLimiter(requests_per_minute=0))
+        parts.setdefault("breaker", CircuitBreaker())
+        parts.setdefault("flights", SingleFlight())
+        client = LLMClient(**parts)
+        clients.append(client)
+        return client
+
+    yield make
+    for client in clients:
+        await client.close()
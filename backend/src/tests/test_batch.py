@@ -0,0 +1,104 @@
+import json
+import pytest
+from agents import AgentEvent
+from batch import BatchRunner
+from batch.runner import load_checkpoint, read_items
+from llm import TokenUsage
+
+pytestmark = pytest.mark.anyio
+
+class _Agent:
+    # Stands in for BaseAgent: answers with the prompt upper-cased, fails on prompts saying "fail"
+    runs: list[str] = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    async def run(self, message: str):
+        _Agent.runs.append(message)
+        yield AgentEvent.agent_start(message)
+        if "fail" in message:
+            yield AgentEvent.agent_error("the agent failed")
+        yield AgentEvent.agent_end(message.upper(), TokenUsage(prompt_tokens=3, completion_tokens=2, total_tokens=5))
+
+
+@pytest.fixture
+def agent():
+    _Agent.runs = []
+    return _Agent
+
+
+def _write_lines(path, lines: list[str]) -> None:
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def _results(path) -> dict[str, dict]:
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    return {record["id"]: record for record in records}
+
+
+async def test_a_rerun_resumes_where_a_killed_run_stopped(tmp_path, agent):
+    prompts = tmp_path / "prompts.jsonl"
+    output = tmp_path / "results.jsonl"
+    _write_lines(prompts, [json.dumps({"id": f"p{index}", "prompt": f"prompt {index}"}) for index in range(5)])
+    # Two items finished before the kill; a third was cut off mid-line
+    _write_lines(output, [json.dumps({"id": f"p{index}", "response": "old", "error": None}) for index in range(2)])
+    with open(output, "a", encoding="utf-8") as file:
+        file.write('{"id": "p2", "resp')
+
+    stats = await BatchRunner(concurrency=2, agent_factory=agent).run(str(prompts), str(output))
+
+    assert stats.skipped == 2
+    assert stats.completed == 3
+    assert sorted(agent.runs) == ["prompt 2", "prompt 3", "prompt 4"]
+    results = _results(output)
+    assert sorted(results) == ["p0", "p1", "p2", "p3", "p4"]
+    assert results["p0"]["response"] == "old"
+    assert results["p3"]["response"] == "PROMPT 3"
+    assert results["p3"]["usage"]["total_tokens"] == 5
+    assert stats.usage.total_tokens == 15
+
+
+async def test_retry_failed_reruns_only_the_failed_items(tmp_path, agent):
+    prompts = tmp_path / "prompts.jsonl"
+    output = tmp_path / "results.jsonl"
+    _write_lines(prompts, [json.dumps({"id": "ok", "prompt": "fine"}), json.dumps({"id": "bad", "prompt": "fail once"})])
+
+    first = await BatchRunner(agent_factory=agent).run(str(prompts), str(output))
+    assert (first.completed, first.failed) == (1, 1)
+
+    agent.runs = []
+    second = await BatchRunner(retry_failed=True, agent_factory=agent).run(str(prompts), str(output))
+    assert agent.runs == ["fail once"]
+    assert second.skipped == 1
+
+
+async def test_malformed_lines_become_item_errors_without_stopping_the_batch(tmp_path, agent):
+    prompts = tmp_path / "prompts.jsonl"
+    output = tmp_path / "results.jsonl"
+    _write_lines(prompts, ["[1, 2]", "not json", '{"id": "empty"}', '"just a string"', '{"id": "good", "prompt": "hi"}'])
+
+    stats = await BatchRunner(agent_factory=agent).run(str(prompts), str(output))
+
+    assert (stats.completed, stats.failed) == (1, 4)
+    results = _results(output)
+    assert results["1"]["error"] == "Each line must be a JSON object"
+    assert results["2"]["error"].startswith("Invalid JSON")
+    assert results["empty"]["error"] == "'prompt' is required"
+    assert results["good"]["response"] == "HI"
+
+
+def test_read_items_streams_ids_and_prompts(tmp_path):
+    prompts = tmp_path / "prompts.jsonl"
+    _write_lines(prompts, ['{"id": 7, "prompt": "a"}', "", '{"message": "b"}'])
+    assert [(item.id, item.message) for item in read_items(str(prompts))] == [("7", "a"), ("3", "b")]
+
+
+def test_checkpoint_lines_without_an_id_are_skipped(tmp_path):
+    output = tmp_path / "results.jsonl"
+    _write_lines(output, ['{"id": "a", "error": null}', "[3]", '{"response": "no id"}', '{"id": "b", "error": "x"}'])
+    assert load_checkpoint(str(output)) == {"a", "b"}
+    assert load_checkpoint(str(output), retry_failed=True) == {"a"}
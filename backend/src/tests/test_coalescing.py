@@ -0,0 +1,75 @@
+import asyncio
+import pytest
+from agents.coalescing import coalesce_deltas
+from llm import StreamEvent, StreamEventType
+
+pytestmark = pytest.mark.anyio
+
+async def _stream(events, pause: float = 0.0):
+    for event in events:
+        if pause:
+            await asyncio.sleep(pause)
+        yield event
+
+
+async def _collect(stream):
+    return [event async for event in stream]
+
+
+def _texts(events):
+    return [event.text_delta.content if event.type == StreamEventType.TEXT_DELTA else event.type for event in events]
+
+
+async def test_deltas_after_the_first_are_batched_by_size():
+    deltas = [StreamEvent.create_delta(f"t{index} ") for index in range(10)]
+    events = await _collect(coalesce_deltas(_stream([*deltas, StreamEvent.create_msg_complete("stop")]), 10.0, 12))
+
+    texts = _texts(events)
+    # The first token goes out alone so time to first token is unchanged
+    assert texts[0] == "t0 "
+    assert texts[-1] == StreamEventType.MESSAGE_COMPLETE
+    assert "".join(texts[1:-1]) == "".join(f"t{index} " for index in range(1, 10))
+    assert all(len(text.encode()) >= 12 for text in texts[1:-2])
+    assert len(texts) < len(deltas) + 1
+
+
+async def test_a_pending_batch_is_flushed_when_the_window_expires():
+    upstream = asyncio.Queue()
+
+    async def source():
+        while (event := await upstream.get()) is not None:
+            yield event
+
+    stream = coalesce_deltas(source(), 0.02, 0)
+    for text in ("a", "b", "c"):
+        upstream.put_nowait(StreamEvent.create_delta(text))
+    assert (await anext(stream)).text_delta.content == "a"
+    # The provider stalls here; the batch still goes out once the window passes
+    batch = await asyncio.wait_for(anext(stream), 1.0)
+    assert batch.text_delta.content == "bc"
+    upstream.put_nowait(None)
+    assert await _collect(stream) == []
+
+
+async def test_other_events_flush_the_batch_and_keep_their_order():
+    call = StreamEvent.create_error("boom")
+    events = [StreamEvent.create_delta("a"), StreamEvent.create_delta("b"), call, StreamEvent.create_delta("c")]
+    assert _texts(await _collect(coalesce_deltas(_stream(events), 10.0, 0))) == ["a", "b", StreamEventType.ERROR, "c"]
+
+
+async def test_disabled_coalescing_passes_every_event_through():
+    deltas = [StreamEvent.create_delta(text) for text in "abc"]
+    assert _texts(await _collect(coalesce_deltas(_stream(deltas), 0, 0))) == ["a", "b", "c"]
+
+
+async def test_upstream_errors_reach_the_consumer_after_the_buffered_text():
+    async def failing():
+        yield StreamEvent.create_delta("a")
+        yield StreamEvent.create_delta("b")
+        raise RuntimeError("upstream broke")
+
+    seen = []
+    with pytest.raises(RuntimeError, match="upstream broke"):
+        async for event in coalesce_deltas(failing(), 10.0, 0):
+            seen.append(event.text_delta.content)
+    assert "".join(seen) == "ab"
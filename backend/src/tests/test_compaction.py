@@ -0,0 +1,35 @@
+import pytest
+from context.compaction import SUMMARY_PREFIX, summarize_messages
+from context.message_item import MessageItem
+from llm import StreamEvent, TextDelta
+
+pytestmark = pytest.mark.anyio
+
+class _Client:
+    def __init__(self, *events: StreamEvent) -> None:
+        self.events = events
+        self.closed = False
+
+    async def chat_completion(self, messages, stream, **kwargs):
+        try:
+            for event in self.events:
+                yield event
+        finally:
+            self.closed = True
+
+
+async def test_the_summary_stream_is_closed_as_soon_as_the_summary_arrives():
+    complete = StreamEvent.create_msg_complete("stop")
+    complete.text_delta = TextDelta("the venue is booked")
+    client = _Client(complete, StreamEvent.create_error("never read"))
+
+    summary = await summarize_messages(client, [MessageItem("user", "book the venue", 3)])
+
+    assert summary == SUMMARY_PREFIX + "the venue is booked"
+    assert client.closed
+
+
+async def test_a_failed_summary_returns_none():
+    client = _Client(StreamEvent.create_error("provider down"))
+    assert await summarize_messages(client, [MessageItem("user", "hi", 1)]) is None
+    assert client.closed
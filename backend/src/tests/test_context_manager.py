@@ -0,0 +1,81 @@
+import asyncio
+import pytest
+from config import config
+from context import ContextManager, context_manager
+
+pytestmark = pytest.mark.anyio
+
+def _contents(messages) -> list[str]:
+    return [message["content"] for message in messages if message["role"] != "system"]
+
+
+async def test_a_list_from_get_messages_never_changes_afterwards():
+    context = ContextManager()
+    await context.add_user_message_async("first")
+    sent = context.get_messages()
+    before = list(sent)
+
+    await context.add_assistant_message_async("reply")
+    await context.add_user_message_async("second")
+    latest = context.get_messages()
+
+    assert sent == before
+    assert _contents(latest) == ["first", "reply", "second"]
+    assert latest is not sent
+
+
+async def test_history_is_known_before_the_first_message():
+    context = ContextManager()
+    assert not context.has_history
+    await context.add_user_message_async("hello")
+    assert context.has_history
+
+
+async def test_truncation_is_reported_for_the_current_window_only():
+    context = ContextManager()
+    for index in range(6):
+        await context.add_user_message_async(f"message {index} " + "word " * 50)
+    context._context_budget = context.system_prompt_tokens + context.token_count // 4
+
+    context.get_messages()
+    truncated = context.stats.truncated_messages
+    context.get_messages()
+
+    assert 0 < truncated < 6
+    assert context.stats.truncated_messages == truncated
+
+
+class _Client:
+    async def close(self) -> None:
+        pass
+
+
+async def test_messages_are_trimmed_while_a_compaction_runs(monkeypatch):
+    summarizing = asyncio.Event()
+
+    async def summarize(client, items, previous_summary=None):
+        await summarizing.wait()
+        return "summary of " + ", ".join(item.content for item in items)
+
+    monkeypatch.setattr(context_manager, "summarize_messages", summarize)
+    monkeypatch.setattr(context_manager, "LLMClient", _Client)
+    monkeypatch.setattr(config, "CONTEXT_MAX_MESSAGES", 4)
+
+    context = ContextManager()
+    for index in range(4):
+        await context.add_user_message_async(f"m{index}")
+    context._context_budget = context.token_count + 1
+    # m0 and m1 are being summarized while two more messages arrive
+    with monkeypatch.context() as patch:
+        patch.setattr(context, "_window_start", lambda budget: 2)
+        task = context.schedule_compaction()
+    context._context_budget = 100_000
+    await context.add_user_message_async("m4")
+    await context.add_user_message_async("m5")
+
+    assert _contents(context.get_messages()) == ["m2", "m3", "m4", "m5"]
+    summarizing.set()
+    await task
+    # Both summarized messages were already trimmed, so nothing newer is lost
+    assert _contents(context.get_messages()) == ["m2", "m3", "m4", "m5"]
+    assert context.stats.trimmed_messages == 2
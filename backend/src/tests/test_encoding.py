@@ -0,0 +1,69 @@
+import json
+from agents import AgentEvent, AgentEventType
+from api import BINARY_TYPE_CODES, decode_binary, get_encoder, negotiate_encoder
+from llm import TokenUsage
+
+EVENTS = [
+    AgentEvent.agent_start("Plan the launch"),
+    AgentEvent.text_delta(" café"),
+    AgentEvent.text_delta("x" * 300),
+    AgentEvent.text_delta("tagged").tagged("vendor", "call_1"),
+    AgentEvent.text_complete("line one\nline \"two\""),
+    AgentEvent.subagent_error("vendor", "call_1", "Timed out", fatal=True),
+    AgentEvent.agent_end("done", TokenUsage(prompt_tokens=3, completion_tokens=2, total_tokens=5)),
+]
+
+def _expected(event: AgentEvent) -> tuple:
+    return event.type.value, json.loads(json.dumps(event.data, default=str))
+
+
+def test_binary_frames_decode_to_the_events_sent():
+    encoder = get_encoder("binary")
+    frames = b"".join(encoder.encode(event) for event in EVENTS)
+    assert [(event.type.value, event.data) for event in decode_binary(frames)] == [_expected(e) for e in EVENTS]
+
+
+def test_every_event_type_round_trips_through_binary_frames():
+    encoder = get_encoder("binary")
+    events = [AgentEvent(event_type, {"n": index}) for index, event_type in enumerate(AgentEventType)]
+    events += [AgentEvent(event_type, {"content": event_type.value}) for event_type in AgentEventType]
+    frames = b"".join(encoder.encode(event) for event in events)
+    assert [(event.type, event.data) for event in decode_binary(frames)] == [(e.type, e.data) for e in events]
+
+
+def test_binary_type_codes_are_pinned():
+    # Changing a code breaks every deployed client; a new type appends the next one
+    assert {event_type.value: code for event_type, code in BINARY_TYPE_CODES.items()} == {
+        "agent_start": 0,
+        "agent_end": 1,
+        "agent_error": 2,
+        "text_delta": 3,
+        "text_complete": 4,
+        "subagent_start": 5,
+        "subagent_end": 6,
+        "subagent_error": 7,
+    }
+    assert get_encoder("binary").encode(AgentEvent.text_delta("hi")) == bytes((3 | 0x80, 2)) + b"hi"
+
+
+def test_ndjson_lines_parse_to_the_events_sent():
+    encoder = get_encoder("ndjson")
+    lines = b"".join(encoder.encode(event) for event in EVENTS).decode().splitlines()
+    assert [(line["type"], line["data"]) for line in map(json.loads, lines)] == [_expected(e) for e in EVENTS]
+
+
+def test_sse_frames_name_the_event_and_carry_it_on_one_data_line():
+    encoder = get_encoder("sse")
+    for event in EVENTS:
+        frame = encoder.encode(event).decode()
+        assert frame.endswith("\n\n")
+        name, data = frame[:-2].split("\n")
+        assert name == f"event: {event.type.value}"
+        payload = json.loads(data.removeprefix("data: "))
+        assert (payload["type"], payload["data"]) == _expected(event)
+
+
+def test_negotiation_prefers_the_explicit_format_then_accept_then_sse():
+    assert negotiate_encoder("ndjson", "application/x-nexus-events").name == "ndjson"
+    assert negotiate_encoder(None, "application/x-ndjson, text/event-stream").name == "ndjson"
+    assert negotiate_encoder("unknown", "*/*").name == "sse"
@@ -0,0 +1,173 @@
+import asyncio
+import time
+import pytest
+from config import config
+from llm import AdaptiveRateLimiter, CircuitBreaker
+from llm.rate_limiter import TokenBucket, parse_retry_after
+
+pytestmark = pytest.mark.anyio
+
+async def test_slots_cap_the_requests_in_flight():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, initial_concurrency=2, min_concurrency=1)
+    peak = 0
+
+    async def request() -> None:
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.stats().in_flight)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(request() for _ in range(6)))
+    assert peak == 2
+    assert limiter.stats().in_flight == 0
+    assert limiter.stats().throttled > 0
+
+
+async def test_an_early_release_frees_the_slot_for_the_rest_of_the_stream():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, initial_concurrency=1, min_concurrency=1)
+    async with limiter.slot() as release:
+        await release()
+        # Headers are in; another request may start while this one is still being read
+        await asyncio.wait_for(limiter.acquire(), 1.0)
+        await limiter.release()
+    assert limiter.stats().in_flight == 0
+
+
+async def test_a_release_cancelled_while_waiting_for_the_lock_still_frees_the_slot():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, initial_concurrency=1, min_concurrency=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    async with limiter._condition:
+        releasing = asyncio.create_task(limiter.release())
+        await asyncio.sleep(0)
+        # Cancelled twice, like a hedge loser cancelled by the winner and again in cleanup
+        releasing.cancel()
+        await asyncio.sleep(0)
+        releasing.cancel()
+    await asyncio.gather(releasing, return_exceptions=True)
+
+    await asyncio.wait_for(waiter, 1.0)
+    assert limiter.stats().in_flight == 1
+
+
+async def test_a_429_halves_the_limit_once_per_cooldown_and_successes_grow_it_back():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, initial_concurrency=16, min_concurrency=1)
+    limiter.record_rate_limited()
+    limiter.record_rate_limited()
+    assert limiter.stats().concurrency_limit == 8
+    assert limiter.stats().decreases == 1
+
+    for _ in range(8):
+        await limiter.record_success()
+    assert limiter.stats().concurrency_limit == pytest.approx(9, abs=0.1)
+
+
+async def test_retry_after_holds_back_every_caller():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0)
+    limiter.record_rate_limited(retry_after=0.05)
+    started = time.monotonic()
+    await limiter.acquire()
+    assert time.monotonic() - started >= 0.05
+    await limiter.release()
+
+
+def test_response_headers_set_the_request_budget_and_block_an_exhausted_window():
+    limiter = AdaptiveRateLimiter(requests_per_minute=0)
+    limiter.observe_headers(
+        {"x-ratelimit-limit-requests": "120", "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2s"}
+    )
+    assert limiter.stats().requests_per_minute == 120
+    assert limiter._delay(0) > 1.5
+
+
+def test_token_bucket_waits_off_its_debt():
+    bucket = TokenBucket(per_minute=60, burst_seconds=1)
+    assert bucket.delay(1) == 0
+    bucket.consume(3)
+    assert bucket.delay(1) == pytest.approx(3, abs=0.05)
+
+
+def test_retry_after_parsing():
+    assert parse_retry_after({"retry-after-ms": "250"}) == 0.25
+    assert parse_retry_after({"retry-after": "2"}) == 2
+    assert parse_retry_after({"retry-after": "soon"}) is None
+    assert parse_retry_after(None) is None
+
+
+def _open_breaker(reset_timeout: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return breaker
+
+
+def test_an_open_breaker_fails_fast_then_lets_one_probe_through():
+    breaker = _open_breaker()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+
+    with breaker.probing():
+        pass
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_a_failed_probe_reopens_the_breaker():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    with breaker.probing():
+        pass
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+@pytest.mark.parametrize("outcome", [ValueError("400 bad request"), asyncio.CancelledError()])
+def test_a_probe_without_a_verdict_lets_the_next_request_probe(outcome):
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow()
+    with pytest.raises(type(outcome)):
+        with breaker.probing():
+            raise outcome
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+async def test_the_client_fails_fast_while_the_breaker_is_open(mock_llm, make_client):
+    breaker = _open_breaker(reset_timeout=60)
+    client = make_client(breaker=breaker)
+    events = [event async for event in client.chat_completion([{"role": "user", "content": "hi"}], True)]
+    assert [event.type for event in events] == ["error"]
+    assert events[0].error.startswith("Provider unavailable")
+    assert mock_llm.stats.requests == 0
+
+
+async def test_the_client_retries_a_429_and_reports_it_to_the_limiter(mock_llm, make_client, monkeypatch):
+    monkeypatch.setattr(config, "RATE_LIMIT_DECREASE_COOLDOWN", 0.0)
+    mock_llm.settings.rate_limit_rate = 1.0
+
+    async def recover() -> None:
+        while mock_llm.stats.rate_limited < 2:
+            await asyncio.sleep(0.001)
+        mock_llm.settings.rate_limit_rate = 0.0
+
+    limiter = AdaptiveRateLimiter(requests_per_minute=0, initial_concurrency=16, min_concurrency=1)
+    client = make_client(limiter=limiter)
+    recovering = asyncio.create_task(recover())
+    events = [event async for event in client.chat_completion([{"role": "user", "content": "hi"}], True)]
+    await recovering
+
+    assert events[-1].type == "message_complete"
+    assert mock_llm.stats.requests == 3
+    assert limiter.stats().rate_limited == 2
+    assert limiter.stats().concurrency_limit < 16
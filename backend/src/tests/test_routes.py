@@ -0,0 +1,47 @@
+import asyncio
+import json
+import pytest
+from api import AgentServer
+from context import SessionStore
+from context.session_store import SqliteSessionBackend
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def server_port(tmp_path):
+    app = AgentServer(session_store=SessionStore(SqliteSessionBackend(str(tmp_path / "sessions.db"))))
+    server = await asyncio.start_server(app.handle_connection, "127.0.0.1", 0)
+    try:
+        yield server.sockets[0].getsockname()[1]
+    finally:
+        server.close()
+        await server.wait_closed()
+        await app.close()
+
+
+async def _post(port: int, body: bytes) -> tuple[int, dict]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        b"POST /v1/agent/run HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+        b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body) + body
+    )
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+@pytest.mark.parametrize(
+    ("body", "error"),
+    [
+        (b"not json", "Request body must be JSON"),
+        (b"[1, 2]", "Request body must be a JSON object"),
+        (b'{"session_id": "s"}', "'message' is required"),
+        (b'{"message": "hi", "session_id": {"a": 1}}', "'session_id' must be a string"),
+        (b'{"message": "hi", "format": 5}', "'format' must be a string"),
+        (b'{"message": "hi", "max_tokens": 0}', "'max_tokens' must be a positive integer"),
+    ],
+)
+async def test_invalid_run_requests_get_a_400(server_port, body, error):
+    assert await _post(server_port, body) == (400, {"error": error})
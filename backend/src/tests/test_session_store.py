@@ -0,0 +1,130 @@
+import asyncio
+import pytest
+from config import config
+from context import SessionStore
+from context.session_store import SqliteSessionBackend
+from llm import ToolCall
+
+pytestmark = pytest.mark.anyio
+
+def _history(context) -> list[tuple]:
+    return [
+        (message["role"], message["content"], message.get("tool_calls"), message.get("tool_call_id"))
+        for message in context.get_messages()
+        if message["role"] != "system"
+    ]
+
+
+async def test_a_session_is_restored_from_disk_by_a_new_store(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    call = ToolCall(id="call_1", name="vendor", arguments='{"request": "caterers"}')
+
+    store = SessionStore(SqliteSessionBackend(path))
+    context = await store.acquire("s1")
+    await context.add_user_message_async("plan the launch")
+    await context.add_tool_calls_async("", [call])
+    await context.add_tool_result_async("call_1", "three caterers")
+    await context.add_assistant_message_async("booked the first one")
+    written = _history(context)
+    await store.release("s1")
+    await store.close()
+
+    store = SessionStore(SqliteSessionBackend(path))
+    context = await store.acquire("s1")
+    assert _history(context) == written
+    assert written[1][2] == [call.to_dict()]
+    assert written[2][3] == "call_1"
+    assert store.stats.restores == 1
+
+    # Turns after the restore are appended to the same log
+    await context.add_user_message_async("and the venue?")
+    await store.release("s1")
+    await store.close()
+
+    store = SessionStore(SqliteSessionBackend(path))
+    context = await store.acquire("s1")
+    assert _history(context)[-1][:2] == ("user", "and the venue?")
+    await store.release("s1")
+    await store.close()
+
+
+async def test_an_unknown_session_starts_empty(tmp_path):
+    store = SessionStore(SqliteSessionBackend(str(tmp_path / "sessions.db")))
+    context = await store.acquire("new")
+    assert _history(context) == []
+    assert store.stats.restores == 0
+    await store.release("new")
+    await store.close()
+
+
+async def test_acquiring_a_session_while_another_release_evicts_it(tmp_path):
+    store = SessionStore(SqliteSessionBackend(str(tmp_path / "sessions.db")), max_resident=1)
+    await store.acquire("A")
+    await store.release("A")
+    await store.acquire("B")
+
+    # Releasing B evicts idle sessions over the cap while A is being acquired again
+    releasing = asyncio.create_task(store.release("B"))
+    context = await store.acquire("A")
+    await releasing
+
+    assert context is not None
+    assert store._resident["A"].leases == 1
+    await store.release("A")
+    await store.close()
+
+
+async def test_idle_sessions_beyond_the_cap_are_evicted(tmp_path):
+    store = SessionStore(SqliteSessionBackend(str(tmp_path / "sessions.db")), max_resident=2)
+    for session_id in ("A", "B", "C"):
+        context = await store.acquire(session_id)
+        await context.add_user_message_async(f"hello from {session_id}")
+        await store.release(session_id)
+
+    assert store.stats.resident == 2
+    assert store.stats.evictions == 1
+    # The evicted session was flushed before it left memory
+    context = await store.acquire("A")
+    assert _history(context) == [("user", "hello from A", None, None)]
+    await store.release("A")
+    await store.close()
+
+
+async def test_a_second_worker_waits_for_the_turn_in_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SESSION_LEASE_POLL_INTERVAL", 0.01)
+    path = str(tmp_path / "sessions.db")
+    first, second = SessionStore(SqliteSessionBackend(path)), SessionStore(SqliteSessionBackend(path))
+
+    context = await first.acquire("s1")
+    await context.add_user_message_async("from the first worker")
+    waiting = asyncio.create_task(second.acquire("s1"))
+    await asyncio.sleep(0.05)
+    assert not waiting.done()
+
+    await context.add_assistant_message_async("done")
+    await first.release("s1")
+    # The second worker sees the whole turn and appends after it
+    context = await waiting
+    assert [content for _, content, _, _ in _history(context)] == ["from the first worker", "done"]
+    assert second.stats.lease_waits == 1
+    await context.add_user_message_async("from the second worker")
+    await second.release("s1")
+
+    await first.close()
+    await second.close()
+    store = SessionStore(SqliteSessionBackend(path))
+    context = await store.acquire("s1")
+    assert [content for _, content, _, _ in _history(context)][-1] == "from the second worker"
+    await store.release("s1")
+    await store.close()
+
+
+async def test_a_lease_left_by_a_dead_worker_expires(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    SqliteSessionBackend(path).try_lease("s1", "gone", ttl=-1)
+
+    store = SessionStore(SqliteSessionBackend(path))
+    await store.acquire("s1")
+    assert store.stats.lease_waits == 0
+    await store.release("s1")
+    await store.close()
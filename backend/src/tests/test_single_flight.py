@@ -0,0 +1,91 @@
+import asyncio
+from contextlib import aclosing
+from dataclasses import replace
+import pytest
+from llm import SingleFlight, StreamEventType
+
+pytestmark = pytest.mark.anyio
+
+async def _read(client, messages, stop_after: int | None = None):
+    text: list[str] = []
+    usage = None
+    async with aclosing(client.chat_completion(messages, True)) as events:
+        async for event in events:
+            if event.type == StreamEventType.TEXT_DELTA:
+                text.append(event.text_delta.content)
+                if stop_after is not None and len(text) >= stop_after:
+                    break
+            elif event.type == StreamEventType.MESSAGE_COMPLETE:
+                usage = event.usage
+            elif event.type == StreamEventType.ERROR:
+                raise AssertionError(event.error)
+    return "".join(text), usage
+
+
+async def test_identical_requests_share_one_upstream_stream(mock_llm, make_client):
+    flights = SingleFlight()
+    client = make_client(flights=flights)
+    messages = [{"role": "user", "content": "hello"}]
+
+    first, second = await asyncio.gather(_read(client, messages), _read(client, messages))
+
+    assert first == second
+    assert first[0] == " tok" * 8
+    assert mock_llm.stats.streams == 1
+    assert flights.stats().joined == 1
+    assert flights.stats().active == 0
+
+
+async def test_different_requests_do_not_share(mock_llm, make_client):
+    client = make_client()
+    await asyncio.gather(
+        _read(client, [{"role": "user", "content": "hello"}]),
+        _read(client, [{"role": "user", "content": "goodbye"}]),
+    )
+    assert mock_llm.stats.streams == 2
+
+
+async def test_a_leaving_subscriber_does_not_end_the_stream_for_the_rest(mock_llm, make_client):
+    mock_llm.settings = replace(mock_llm.settings, tokens_per_second=400, completion_tokens=20)
+    flights = SingleFlight()
+    client = make_client(flights=flights)
+    messages = [{"role": "user", "content": "hello"}]
+
+    partial, full = await asyncio.gather(_read(client, messages, stop_after=2), _read(client, messages))
+
+    assert partial[0] == " tok" * 2
+    assert full[0] == " tok" * 20
+    assert flights.stats().abandoned == 0
+
+
+async def test_the_upstream_stream_is_abandoned_when_every_subscriber_leaves(mock_llm, make_client):
+    mock_llm.settings = replace(mock_llm.settings, tokens_per_second=100, completion_tokens=50)
+    flights = SingleFlight()
+    client = make_client(flights=flights)
+    messages = [{"role": "user", "content": "hello"}]
+
+    await asyncio.gather(_read(client, messages, stop_after=1), _read(client, messages, stop_after=2))
+
+    assert flights.stats().abandoned == 1
+    assert flights.stats().active == 0
+
+
+async def test_a_retry_sends_the_messages_the_request_started_with(mock_llm, make_client):
+    # The first attempt is rate limited; while it backs off the session moves on
+    mock_llm.settings = replace(mock_llm.settings, rate_limit_rate=1.0)
+    wire = [{"role": "user", "content": "hello"}]
+
+    async def move_on() -> None:
+        while mock_llm.stats.rate_limited == 0:
+            await asyncio.sleep(0.001)
+        mock_llm.settings = replace(mock_llm.settings, rate_limit_rate=0.0)
+        wire[0]["content"] = "edited " * 40
+        wire.append({"role": "user", "content": "SECRET follow-up " * 40})
+
+    session = asyncio.create_task(move_on())
+    text, usage = await _read(make_client(), wire)
+    await session
+
+    assert mock_llm.stats.requests == 2
+    # The mock counts prompt tokens from the characters it received: only "hello" was sent
+    assert usage.prompt_tokens == 1
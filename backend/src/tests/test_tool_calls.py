@@ -0,0 +1,58 @@
+import json
+from types import SimpleNamespace
+from llm import ToolCallAssembler
+
+def _delta(index: int, arguments: str | None = None, name: str | None = None, id: str | None = None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+def test_a_call_is_emitted_as_soon_as_its_arguments_close():
+    assembler = ToolCallAssembler()
+    assert assembler.feed([_delta(0, name="vendor", id="call_a")]) == []
+    assert assembler.feed([_delta(0, '{"request": "cat')]) == []
+
+    ready = assembler.feed([_delta(0, 'erers"}')])
+
+    assert [(call.id, call.name, json.loads(call.arguments)) for call in ready] == [
+        ("call_a", "vendor", {"request": "caterers"})
+    ]
+    assert assembler.finish() == []
+
+
+def test_braces_inside_strings_do_not_close_the_call():
+    assembler = ToolCallAssembler()
+    assembler.feed([_delta(0, name="note", id="call_a")])
+    assert assembler.feed([_delta(0, '{"text": "a } and \\" {"')]) == []
+    ready = assembler.feed([_delta(0, ', "n": [1, {"x": 2}]}')])
+    assert json.loads(ready[0].arguments) == {"text": 'a } and " {', "n": [1, {"x": 2}]}
+
+
+def test_consecutive_calls_in_one_chunk_come_out_in_order():
+    assembler = ToolCallAssembler()
+    ready = assembler.feed(
+        [
+            _delta(0, name="vendor", id="call_a"),
+            _delta(0, '{"request":'),
+            _delta(0, ' "x"}'),
+            _delta(1, name="budget", id="call_b"),
+            _delta(1, '{"category": "food"'),
+        ]
+    )
+    assert [call.id for call in ready] == ["call_a"]
+    ready = assembler.feed([_delta(1, "}")])
+    assert [(call.id, json.loads(call.arguments)) for call in ready] == [("call_b", {"category": "food"})]
+
+
+def test_finish_emits_calls_without_a_closing_brace_and_fills_missing_ids():
+    assembler = ToolCallAssembler()
+    assembler.feed([_delta(0, name="ping"), _delta(0, "")])
+    calls = assembler.finish()
+    assert [(call.id, call.name, call.parse_arguments()) for call in calls] == [("call_0", "ping", {})]
+
+
+def test_a_new_index_finishes_the_call_before_it():
+    assembler = ToolCallAssembler()
+    assembler.feed([_delta(0, name="first", id="call_a"), _delta(0, "")])
+    ready = assembler.feed([_delta(1, name="second", id="call_b")])
+    assert [call.name for call in ready] == ["first"]
+    assert [call.name for call in assembler.finish()] == ["second"]
@@ -0,0 +1,21 @@
+from .slack import (
+    SlackClient,
+    SlackError,
+    SlackMessage,
+    SlackMessageStream,
+    SlackStats,
+    close_slack_client,
+    get_slack_client,
+    stream_agent_events,
+)
+
+__all__ = [
+    "SlackClient",
+    "SlackError",
+    "SlackMessage",
+    "SlackMessageStream",
+    "SlackStats",
+    "close_slack_client",
+    "get_slack_client",
+    "stream_agent_events",
+]
@@ -0,0 +1,384 @@
+from __future__ import annotations
+import asyncio
+import time
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Any, AsyncIterable
+from agents.events import AgentEvent, AgentEventType
+from config import config
+from llm.rate_limiter import TokenBucket, backoff_delay, parse_retry_after
+
+if TYPE_CHECKING:
+    import httpx
+
+class SlackError(Exception):
+    def __init__(self, method: str, error: str) -> None:
+        super().__init__(f"{method} failed: {error}")
+        self.method = method
+        self.error = error
+
+
+@dataclass
+class SlackMessage:
+    channel: str
+    ts: str
+
+
+@dataclass
+class SlackStats:
+    requests: int = 0
+    posted: int = 0
+    updated: int = 0
+    rate_limited: int = 0
+    retries: int = 0
+    errors: int = 0
+    throttled: int = 0
+    throttled_seconds: float = 0.0
+    deltas: int = 0
+    active_channels: int = 0
+
+
+@dataclass
+class _Call:
+    method: str
+    payload: dict[str, Any]
+    future: asyncio.Future
+
+
+class _MethodLimit:
+    # A workspace-wide budget for one method, paused outright after a 429
+    def __init__(self, per_minute: float, burst_seconds: float) -> None:
+        self.bucket = TokenBucket(per_minute, burst_seconds)
+        self.blocked_until = 0.0
+
+    def delay(self) -> float:
+        return max(self.blocked_until - time.monotonic(), self.bucket.delay(1))
+
+
+class _Channel:
+    def __init__(self, messages_per_second: float) -> None:
+        self.queue: asyncio.Queue[_Call] = asyncio.Queue(config.SLACK_CHANNEL_QUEUE_SIZE)
+        # No burst: Slack only tolerates short ones and a 429 costs far more than waiting
+        self.posts = _MethodLimit(messages_per_second * 60, 1 / messages_per_second if messages_per_second else 0.0)
+        self.worker: asyncio.Task | None = None
+
+
+class SlackClient:
+    def __init__(
+        self,
+        token: str | None = config.SLACK_BOT_TOKEN,
+        base_url: str = config.SLACK_API_URL,
+        channel_messages_per_second: float = config.SLACK_CHANNEL_MESSAGES_PER_SECOND,
+        method_tiers: dict[str, int] | None = None,
+        max_connections: int = config.SLACK_MAX_CONNECTIONS,
+    ) -> None:
+        self._token = token
+        self._base_url = base_url.rstrip("/")
+        self._channel_rate = channel_messages_per_second
+        self._method_tiers = config.SLACK_METHOD_TIERS if method_tiers is None else method_tiers
+        self._max_connections = max_connections
+        self._http: httpx.AsyncClient | None = None
+        self._channels: dict[str, _Channel] = {}
+        self._methods: dict[str, _MethodLimit] = {}
+        self._stats = SlackStats()
+
+    def _client(self) -> httpx.AsyncClient:
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.AsyncClient(
+                headers={"Authorization": f"Bearer {self._token}"} if self._token else {},
+                limits=httpx.Limits(
+                    max_connections=self._max_connections,
+                    max_keepalive_connections=self._max_connections,
+                ),
+                timeout=config.SLACK_TIMEOUT,
+                http2=config.HTTP2_ENABLED,
+            )
+        return self._http
+
+    def _method_limit(self, method: str) -> _MethodLimit | None:
+        tier = self._method_tiers.get(method)
+        if tier is None:
+            return None
+        limit = self._methods.get(method)
+        if limit is None:
+            per_minute = config.SLACK_TIER_LIMITS[tier]
+            # A single call of burst: Slack tolerates short bursts but doesn't say how short
+            limit = self._methods[method] = _MethodLimit(per_minute, 60 / per_minute)
+        return limit
+
+    async def _wait(self, limit: _MethodLimit | None) -> None:
+        if limit is None:
+            return
+        waited = 0.0
+        while (delay := limit.delay()) > 0:
+            await asyncio.sleep(delay)
+            waited += delay
+        limit.bucket.consume(1)
+        if waited:
+            self._stats.throttled += 1
+            self._stats.throttled_seconds += waited
+
+    async def call(self, method: str, payload: dict[str, Any] | None = None) -> dict[str, Any]:
+        payload = payload or {}
+        channel = payload.get("channel")
+        if channel is None:
+            return await self._send(method, payload)
+
+        # Calls for one channel go out in order through its queue, at the channel's pace
+        state = self._channels.get(channel)
+        if state is None:
+            state = self._channels[channel] = _Channel(self._channel_rate)
+            state.worker = asyncio.create_task(self._drain(channel, state))
+            self._stats.active_channels = len(self._channels)
+
+        future = asyncio.get_running_loop().create_future()
+        await state.queue.put(_Call(method, payload, future))
+        return await future
+
+    async def _drain(self, channel: str, state: _Channel) -> None:
+        while True:
+            try:
+                call = await asyncio.wait_for(state.queue.get(), config.SLACK_CHANNEL_IDLE_TIMEOUT)
+            except TimeoutError:
+                # Checked and removed without yielding, so no caller can enqueue in between
+                if state.queue.empty():
+                    del self._channels[channel]
+                    self._stats.active_channels = len(self._channels)
+                    return
+                continue
+
+            if call.future.cancelled():
+                continue
+            try:
+                if call.method == "chat.postMessage":
+                    await self._wait(state.posts)
+                result = await self._send(call.method, call.payload)
+            except Exception as e:
+                if not call.future.cancelled():
+                    call.future.set_exception(e)
+            else:
+                if not call.future.cancelled():
+                    call.future.set_result(result)
+
+    async def _send(self, method: str, payload: dict[str, Any]) -> dict[str, Any]:
+        import httpx
+
+        limit = self._method_limit(method)
+        for attempt in range(config.SLACK_MAX_RETRIES + 1):
+            await self._wait(limit)
+            self._stats.requests += 1
+            if attempt:
+                self._stats.retries += 1
+
+            try:
+                response = await self._client().post(f"{self._base_url}/{method}", json=payload)
+            except httpx.TransportError as e:
+                error = type(e).__name__
+                retry_after = None
+            else:
+                if response.status_code == 429:
+                    self._stats.rate_limited += 1
+                    retry_after = parse_retry_after(response.headers)
+                    if limit is not None and retry_after is not None:
+                        limit.blocked_until = max(limit.blocked_until, time.monotonic() + retry_after)
+                    error = "ratelimited"
+                elif response.status_code >= 500:
+                    error = f"http_{response.status_code}"
+                    retry_after = None
+                else:
+                    is_json = response.headers.get("content-type", "").startswith("application/json")
+                    body = response.json() if is_json else {}
+                    if body.get("ok"):
+                        return body
+                    # Request-level failures (bad channel, bad token) won't succeed on retry
+                    self._stats.errors += 1
+                    raise SlackError(method, body.get("error", f"http_{response.status_code}"))
+
+            if attempt == config.SLACK_MAX_RETRIES:
+                break
+            await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+        self._stats.errors += 1
+        raise SlackError(method, error)
+
+    async def post_message(self, channel: str, text: str, thread_ts: str | None = None, **fields: Any) -> SlackMessage:
+        payload = {"channel": channel, "text": text, **fields}
+        if thread_ts:
+            payload["thread_ts"] = thread_ts
+        body = await self.call("chat.postMessage", payload)
+        self._stats.posted += 1
+        return SlackMessage(channel=body.get("channel", channel), ts=body["ts"])
+
+    async def update_message(self, message: SlackMessage, text: str, **fields: Any) -> None:
+        await self.call("chat.update", {"channel": message.channel, "ts": message.ts, "text": text, **fields})
+        self._stats.updated += 1
+
+    async def post_many(self, channels: list[str], text: str, **fields: Any) -> list[SlackMessage | Exception]:
+        # Every channel has its own queue and budget, so they all proceed at once
+        return await asyncio.gather(
+            *(self.post_message(channel, text, **fields) for channel in channels),
+            return_exceptions=True,
+        )
+
+    def stream(
+        self,
+        channel: str,
+        thread_ts: str | None = None,
+        interval: float = config.SLACK_UPDATE_INTERVAL,
+    ) -> SlackMessageStream:
+        return SlackMessageStream(self, channel, thread_ts, interval)
+
+    def record_delta(self) -> None:
+        # Called by the streams this client hands out, once per chunk of text written
+        self._stats.deltas += 1
+
+    def stats(self) -> SlackStats:
+        return replace(self._stats)
+
+    async def close(self) -> None:
+        for state in list(self._channels.values()):
+            if state.worker:
+                state.worker.cancel()
+        await asyncio.gather(
+            *(state.worker for state in self._channels.values() if state.worker),
+            return_exceptions=True,
+        )
+        # Callers still waiting on queued calls get a cancellation instead of hanging
+        for state in self._channels.values():
+            while not state.queue.empty():
+                state.queue.get_nowait().future.cancel()
+        self._channels.clear()
+        if self._http:
+            await self._http.aclose()
+            self._http = None
+
+
+class SlackMessageStream:
+    # Streamed text becomes one message edited in place, at most once per interval.
+    # Whatever arrives while an edit is in flight or throttled is folded into the next.
+    def __init__(
+        self,
+        client: SlackClient,
+        channel: str,
+        thread_ts: str | None = None,
+        interval: float = config.SLACK_UPDATE_INTERVAL,
+        max_chars: int = config.SLACK_MAX_MESSAGE_CHARS,
+    ) -> None:
+        self._client = client
+        self._channel = channel
+        self._thread_ts = thread_ts
+        self._interval = interval
+        self._max_chars = max_chars
+        self._parts: list[str] = []
+        self._offset = 0  # where the current message starts within the whole text
+        self._current: SlackMessage | None = None
+        self._sent = ""
+        self._dirty = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.messages: list[SlackMessage] = []
+
+    def write(self, text: str) -> None:
+        if not text:
+            return
+        self._parts.append(text)
+        self._client.record_delta()
+        self._dirty.set()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            await self._flush()
+            if self._closing.is_set() and not self._dirty.is_set():
+                return
+            try:
+                # Closing cuts the wait short so the final text isn't held back
+                await asyncio.wait_for(self._closing.wait(), self._interval)
+            except TimeoutError:
+                pass
+
+    async def _flush(self) -> None:
+        text = "".join(self._parts)
+        self._parts = [text]
+
+        # Past the size limit the current message is finished and the rest continues in a new one
+        while len(text) - self._offset > self._max_chars:
+            end = self._offset + self._max_chars
+            cut = text.rfind("\n", self._offset, end)
+            cut = cut + 1 if cut > self._offset else end
+            await self._send(text[self._offset:cut])
+            self._current, self._sent, self._offset = None, "", cut
+
+        rest = text[self._offset:]
+        if rest and rest != self._sent:
+            await self._send(rest)
+
+    async def _send(self, text: str) -> None:
+        if self._current is None:
+            self._current = await self._client.post_message(self._channel, text, self._thread_ts)
+            self.messages.append(self._current)
+        elif text != self._sent:
+            await self._client.update_message(self._current, text)
+        self._sent = text
+
+    async def close(self) -> list[SlackMessage]:
+        self._closing.set()
+        if self._task:
+            self._dirty.set()
+            await self._task
+        return self.messages
+
+    async def __aenter__(self) -> SlackMessageStream:
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        try:
+            await self.close()
+        except Exception:
+            # The agent failed; still show what it produced, but don't mask its error
+            if exc_type is None:
+                raise
+
+
+async def stream_agent_events(
+    events: AsyncIterable[AgentEvent],
+    channel: str,
+    thread_ts: str | None = None,
+    client: SlackClient | None = None,
+) -> list[SlackMessage]:
+    streamed = False
+    async with (client or get_slack_client()).stream(channel, thread_ts) as stream:
+        async for event in events:
+            # Subagent events are tagged; their raw output is for the agent, not the channel
+            if "subagent" in event.data:
+                continue
+            if event.type == AgentEventType.TEXT_DELTA:
+                streamed = True
+                stream.write(event.data["content"])
+            elif event.type == AgentEventType.TEXT_COMPLETE and not streamed:
+                # The fast path's answer arrives whole rather than as deltas
+                stream.write(event.data["content"])
+            elif event.type == AgentEventType.AGENT_ERROR:
+                stream.write(f"\n:warning: {event.data.get('error')}")
+    return stream.messages
+
+
+# Process-wide client so every workflow shares the connection pool and the rate budgets
+_client: SlackClient | None = None
+
+def get_slack_client() -> SlackClient:
+    global _client
+    if _client is None:
+        _client = SlackClient()
+    return _client
+
+
+async def close_slack_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
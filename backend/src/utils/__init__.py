@@ -1,3 +1,25 @@
-from .text import count_tokens
+from .text import (
+    count_tokens,
+    count_tokens_async,
+    count_tokens_batch,
+    count_tokens_batch_async,
+    get_encoding,
+    load_encoding_file,
+    warm_up_tokenizer,
+)
+from .http import HttpRequest, ChunkedResponse, read_request, write_response, write_json
 
-__all__ = ["count_tokens"]
\ No newline at end of file
+__all__ = [
+    "count_tokens",
+    "count_tokens_async",
+    "count_tokens_batch",
+    "count_tokens_batch_async",
+    "get_encoding",
+    "load_encoding_file",
+    "warm_up_tokenizer",
+    "HttpRequest",
+    "ChunkedResponse",
+    "read_request",
+    "write_response",
+    "write_json",
+]
@@ -0,0 +1,135 @@
+from __future__ import annotations
+import asyncio
+import json
+from dataclasses import dataclass, field
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+STATUS_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Guards against a misbehaving client holding a worker hostage with a huge body
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+@dataclass
+class HttpRequest:
+    method: str
+    path: str
+    query: dict[str, str] = field(default_factory=dict)
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    @property
+    def keep_alive(self) -> bool:
+        return self.headers.get("connection", "").lower() != "close"
+
+    def json(self) -> Any:
+        return json.loads(self.body) if self.body else {}
+
+
+async def read_request(reader: asyncio.StreamReader) -> HttpRequest | None:
+    try:
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return None
+
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+        headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY_BYTES:
+            return None
+        body = await reader.readexactly(length) if length else b""
+
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        return None
+
+    url = urlsplit(target)
+    query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    return HttpRequest(method.upper(), url.path, query, headers, body)
+
+
+def _encode_head(status: int, headers: dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {STATUS_REASONS.get(status, 'Unknown')}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def write_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    body: bytes = b"",
+    content_type: str = "application/json",
+    headers: dict[str, str] | None = None,
+    keep_alive: bool = True,
+) -> None:
+    head = {
+        "Content-Type": content_type,
+        "Content-Length": str(len(body)),
+        "Connection": "keep-alive" if keep_alive else "close",
+        **(headers or {}),
+    }
+    writer.write(_encode_head(status, head) + body)
+    await writer.drain()
+
+
+async def write_json(
+    writer: asyncio.StreamWriter,
+    status: int,
+    payload: Any,
+    headers: dict[str, str] | None = None,
+    keep_alive: bool = True,
+) -> None:
+    body = json.dumps(payload).encode()
+    await write_response(writer, status, body, headers=headers, keep_alive=keep_alive)
+
+
+class ChunkedResponse:
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self._writer = writer
+
+    async def start(
+        self,
+        status: int,
+        content_type: str,
+        headers: dict[str, str] | None = None,
+        keep_alive: bool = True,
+    ) -> None:
+        head = {
+            "Content-Type": content_type,
+            "Transfer-Encoding": "chunked",
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive" if keep_alive else "close",
+            **(headers or {}),
+        }
+        self._writer.write(_encode_head(status, head))
+        await self._writer.drain()
+
+    async def write(self, data: bytes) -> None:
+        if not data:
+            return
+        self._writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        await self._writer.drain()
+
+    async def end(self, data: bytes = b"") -> None:
+        # Sending the last chunk together with the terminator lets clients that stop
+        # reading at an end-of-stream marker still see a complete body
+        if data:
+            self._writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self._writer.write(b"0\r\n\r\n")
+        await self._writer.drain()
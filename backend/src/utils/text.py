@@ -1,21 +1,193 @@
-import tiktoken
+from __future__ import annotations
+import asyncio
+import logging
+import types
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable
+from config import config
 
-def get_tokenizer(model: str):
-    try: 
-        encoding = tiktoken.encoding_for_model(model)
-        return encoding.encode
+if TYPE_CHECKING:
+    import tiktoken
+
+FALLBACK_ENCODING = "cl100k_base"
+
+logger = logging.getLogger(__name__)
+
+# Encodings built from local BPE files, consulted before tiktoken's own (networked) loader
+_local_encodings: dict[str, tiktoken.Encoding] = {}
+# Models whose encoding lookup has already run, so counting them can't block on a BPE load
+_resolved_models: set[str] = set()
+_executor: ThreadPoolExecutor | None = None
+
+def _encoding_name(model: str) -> str:
+    from tiktoken.model import encoding_name_for_model
+
+    try:
+        return encoding_name_for_model(model)
+    except KeyError:
+        return FALLBACK_ENCODING
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str) -> tiktoken.Encoding | None:
+    # Resolved once per model: unknown OpenRouter names would otherwise take the
+    # encoding_for_model exception path on every call. tiktoken itself is imported
+    # here so importing this module stays cheap.
+    try:
+        name = _encoding_name(model)
+        if name in _local_encodings:
+            return _local_encodings[name]
+
+        import tiktoken
+        return tiktoken.get_encoding(name)
     except Exception:
-        encoding = tiktoken.get_encoding("cl100k_base")
-        return encoding.encode
+        # BPE ranks unavailable (e.g. offline without a cache); callers estimate instead
+        return None
+    finally:
+        _resolved_models.add(model)
 
-def count_tokens(text: str, model: str) -> int:
+
+def _encoding_parameters(name: str, mergeable_ranks: dict[bytes, int]) -> dict[str, Any]:
+    import tiktoken_ext.openai_public as public
+
+    constructor = public.ENCODING_CONSTRUCTORS.get(name)
+    if constructor is None:
+        raise ValueError(f"tiktoken has no encoding named {name!r}")
+    # The published constructor knows the pattern and special tokens but downloads its ranks. A
+    # copy of it with its own globals gets the local ranks instead; the module itself is untouched.
+    loaders = {
+        "load_tiktoken_bpe": lambda *args, **kwargs: mergeable_ranks,
+        "data_gym_to_mergeable_bpe_ranks": lambda *args, **kwargs: mergeable_ranks,
+    }
+    local = types.FunctionType(
+        constructor.__code__,
+        {**constructor.__globals__, **loaders},
+        constructor.__name__,
+        constructor.__defaults__,
+        constructor.__closure__,
+    )
+    return local()
+
+
+def load_encoding_file(path: str, name: str = FALLBACK_ENCODING) -> tiktoken.Encoding:
+    import tiktoken
+    from tiktoken.load import load_tiktoken_bpe
+
+    encoding = tiktoken.Encoding(**_encoding_parameters(name, load_tiktoken_bpe(path)))
+    _local_encodings[name] = encoding
+    # Anything resolved or counted before this (possibly by estimate) is stale now
+    get_encoding.cache_clear()
+    _resolved_models.clear()
+    _count_tokens_cached.cache_clear()
+    return encoding
+
+
+def warm_up_tokenizer(model: str, encoding_file: str | None = config.TOKENIZER_ENCODING_FILE) -> bool:
+    # Pays the BPE load up front instead of on the first message; blocking, so run it in a thread
+    if encoding_file:
+        name = _encoding_name(model)
+        try:
+            load_encoding_file(encoding_file, name)
+        except (ValueError, AssertionError) as e:
+            # tiktoken asserts on a vocabulary size mismatch; counting still works without the file, through tiktoken's loader or the estimate
+            reason = str(e) or "vocabulary size mismatch"
+            logger.warning("Not using %s for %s (%s); falling back to the default encoding", encoding_file, name, reason)
+
+    encoding = get_encoding(model)
+    if encoding is None:
+        return False
+    encoding.encode_ordinary("warm up")
+    return True
+
+
+def get_tokenizer(model: str) -> Callable[[str], list[int]] | None:
+    encoding = get_encoding(model)
+    return encoding.encode_ordinary if encoding else None
+
+
+@lru_cache(maxsize=config.TOKEN_COUNT_CACHE_SIZE)
+def _count_tokens_cached(text: str, model: str) -> int:
+    return _count_tokens(text, model)
+
+
+def _count_tokens(text: str, model: str) -> int:
     tokenizer = get_tokenizer(model)
 
     if tokenizer:
         return len(tokenizer(text))
-        
+
     return estimate_tokens(text)
-    
+
+
+def count_tokens(text: str, model: str) -> int:
+    # Short strings repeat a lot (canned prompts, clarifications); long ones rarely do
+    if len(text) <= config.TOKEN_COUNT_CACHE_MAX_CHARS:
+        return _count_tokens_cached(text, model)
+    return _count_tokens(text, model)
+
+
+def count_tokens_batch(texts: list[str], model: str) -> list[int]:
+    encoding = get_encoding(model)
+
+    if encoding is None:
+        return [estimate_tokens(text) for text in texts]
+
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(config.TOKEN_COUNT_WORKERS, thread_name_prefix="count-tokens")
+    return _executor
+
+
+def _count_tokens_each(texts: list[str], model: str) -> list[int]:
+    # encode_ordinary_batch starts a thread pool per call; chunks already run on ours
+    tokenizer = get_tokenizer(model)
+    if tokenizer is None:
+        return [estimate_tokens(text) for text in texts]
+    return [len(tokenizer(text)) for text in texts]
+
+
+def _counts_inline(chars: int, model: str) -> bool:
+    # Short texts take microseconds, less than the thread handoff; long ones would
+    # stall every other session's stream for as long as they take to encode. Without
+    # BPE ranks the count is an estimate, which is cheap at any length.
+    if model not in _resolved_models:
+        return False
+    return chars <= config.TOKEN_COUNT_INLINE_MAX_CHARS or get_encoding(model) is None
+
+
+async def count_tokens_async(text: str, model: str) -> int:
+    if _counts_inline(len(text), model):
+        return count_tokens(text, model)
+    return await asyncio.get_running_loop().run_in_executor(_get_executor(), count_tokens, text, model)
+
+
+async def count_tokens_batch_async(texts: list[str], model: str) -> list[int]:
+    total_chars = sum(len(text) for text in texts)
+    if _counts_inline(total_chars, model):
+        return _count_tokens_each(texts, model)
+
+    # Contiguous chunks of roughly equal size, one per worker, keep the results in order
+    chunks: list[list[str]] = [[]]
+    chunk_chars = 0
+    target = max(config.TOKEN_COUNT_INLINE_MAX_CHARS, total_chars // config.TOKEN_COUNT_WORKERS + 1)
+    for text in texts:
+        if chunk_chars >= target:
+            chunks.append([])
+            chunk_chars = 0
+        chunks[-1].append(text)
+        chunk_chars += len(text)
+
+    loop = asyncio.get_running_loop()
+    counts = await asyncio.gather(
+        *(loop.run_in_executor(_get_executor(), _count_tokens_each, chunk, model) for chunk in chunks)
+    )
+    return [count for chunk_counts in counts for count in chunk_counts]
+
 
 def estimate_tokens(text: str) -> int:
-    return max(1, len(text) // 4)
\ No newline at end of file
+    return max(1, len(text) // 4)